@@ -0,0 +1,137 @@
+"""
+Measures user and project membership lookups on a large account store, against the
+linear scan of the account groups they replaced, and the removal of a project from the
+lists of all its members.
+
+A synthetic account_data.hdf5 is written into a temporary directory, every user with a
+few projects and all sharing one placeholder password hash. Lookups pick users at random.
+The index is timed cold (first lookup of each user, read from the file), warm (cached
+set lookups), and after a write to each user's project list, which updates their entry.
+A project is then shared with a growing number of members and removed from all of them,
+which should cost the same per member whatever the length of the members' lists.
+
+Run from the backend directory:
+
+    python -m benchmarks.account_benchmark [--users 100000] [--projects 5] [--lookups 2000] [--scans 5] [--members 10 100 1000]
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+import h5py
+
+from utilities.account_index import Account_Index
+from utilities.account_utilities import Account_Utilities
+from utilities.storage_manager import Storage_Manager
+
+def populate(users: int, projects: int):
+    """
+    Write synthetic accounts, each with a list of projects, and their membership table
+    into the account store.
+
+    Args:
+        users (int): The number of accounts to create.
+        projects (int): The number of projects of each account.
+    """
+    Storage_Manager.truncate('account')
+    Account_Index.clear()
+    string_dtype = h5py.string_dtype(encoding='utf-8')
+    with Storage_Manager.write('account') as account_data:
+        for i in range(users):
+            user_group = account_data.create_group(f"user{i}")
+            user_group.attrs['Password'] = b"synthetic-hash"
+            names = [f"project{i}-{j}" for j in range(projects)]
+            user_group.create_dataset('Projects', data=names, maxshape=(None,), dtype=string_dtype)
+        member_table = account_data.create_group(Account_Utilities._MEMBER_INDEX)
+        columns = {
+            "project": [f"project{i}-{j}" for i in range(users) for j in range(projects)],
+            "member": [f"user{i}" for i in range(users) for j in range(projects)],
+            "slot": [j for i in range(users) for j in range(projects)],
+        }
+        for column, values in columns.items():
+            member_table.create_dataset(column, data=values, maxshape=(None,), chunks=(1024,), dtype="int64" if column == "slot" else string_dtype)
+    Storage_Manager.flush('account')
+
+def scan_user_has_project(username: str, project_name: str):
+    """
+    The lookup this benchmark compares against: a scan of the account groups for the user,
+    then a decode of their whole project list.
+    """
+    with Storage_Manager.read('account') as account_data:
+        for user in account_data:
+            if user == username:
+                project_list = [project.decode('utf-8') for project in account_data[user]['Projects']]
+                return project_name in project_list
+        return False
+
+def time_calls(function, arguments: list):
+    """
+    Return the median and 99th percentile wall-clock time of a call per argument, in microseconds.
+    """
+    timings = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(*argument)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000, help="Number of accounts in the store.")
+    parser.add_argument("--projects", type=int, default=5, help="Number of projects of each account.")
+    parser.add_argument("--lookups", type=int, default=2000, help="Number of timed index lookups.")
+    parser.add_argument("--scans", type=int, default=5, help="Number of timed linear scans.")
+    parser.add_argument("--members", type=int, nargs="+", default=[10, 100, 1000], help="Member counts of the removed projects.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random user choice.")
+    args = parser.parse_args()
+
+    Storage_Manager.DATABASE_DIR = tempfile.mkdtemp(prefix="honeydue-account-")
+    Account_Index.MAX_USERS = max(Account_Index.MAX_USERS, args.lookups)
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    populate(args.users, args.projects)
+    print(f"populated {args.users} users in {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    Account_Index.start()
+    print(f"loaded usernames in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def lookups(count):
+        users = rng.sample(range(args.users), count)
+        return [(f"user{i}", f"project{i}-{rng.randrange(args.projects)}") for i in users]
+
+    sample = lookups(args.lookups)
+    results = [
+        ("scan user_has_project", time_calls(scan_user_has_project, lookups(args.scans))),
+        ("username_exists", time_calls(lambda username, project: Account_Utilities.username_exists(username), sample)),
+        ("user_has_project cold", time_calls(Account_Utilities.user_has_project, sample)),
+        ("user_has_project warm", time_calls(Account_Utilities.user_has_project, sample)),
+    ]
+    for username, project_name in sample:
+        Account_Utilities.add_project("extra", username)
+    results.append(("user_has_project after write", time_calls(Account_Utilities.user_has_project, sample)))
+
+    print(f"{'lookup':<30} {'median (us)':>12} {'p99 (us)':>12}")
+    for name, (median, p99) in results:
+        print(f"{name:<30} {median:>12.1f} {p99:>12.1f}")
+    print(Account_Index.stats())
+
+    print(f"{'members':>10} {'remove_project_members (ms)':>28} {'per member (us)':>16}")
+    for members in args.members:
+        project_name = f"shared-{members}"
+        for i in rng.sample(range(args.users), members):
+            Account_Utilities.add_project(project_name, f"user{i}")
+        start = time.perf_counter()
+        removed = Account_Utilities.remove_project_members(project_name)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{len(removed):>10} {elapsed:>28.1f} {elapsed * 1000 / members:>16.1f}")
+
+    Storage_Manager.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compares Project_Codec with pickle on encode time, decode time and encoded size.
+
+Run from the backend directory:
+
+    python -m benchmarks.codec_benchmark [--sizes 10 1000 20000] [--repeat 5]
+"""
+
+import argparse
+import pickle
+import random
+import time
+
+from libraries.task import Task
+from libraries.project import Project
+from utilities.project_codec import Project_Codec
+
+def build_project(task_count: int, seed: int = 0):
+    """
+    Build a project with the given number of tasks and realistic field values.
+
+    Args:
+        task_count (int): The number of tasks to create.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        Project: The generated project.
+    """
+    rng = random.Random(seed)
+    project = Project(f"Project{task_count}", "owner")
+    for i in range(8):
+        project.add_collaborator(f"user{i}", rng.choice(["Member", "Guest"]))
+    project.categories += [f"Category{i}" for i in range(6)]
+    for i in range(task_count):
+        project.tasks.append(Task(
+            name=f"Task {i}",
+            description=" ".join(rng.choice(["fix", "write", "review", "the", "login", "page", "tests", "docs"]) for _ in range(rng.randint(3, 30))),
+            priority=str(rng.randint(1, 5)),
+            deadline=f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            category=rng.choice(project.categories),
+            status=rng.choice(["TODO", "DOING", "DONE"]),
+            assignee=rng.choice(list(project.collaborators.keys()))
+        ))
+    return project
+
+def best_time(function, repeat: int):
+    """
+    Return the best wall-clock time of several calls to a function, in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 20000], help="Task counts to benchmark.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs; the best one is reported.")
+    args = parser.parse_args()
+
+    print(f"{'tasks':>8} {'format':>8} {'size (B)':>12} {'encode (ms)':>12} {'decode (ms)':>12} {'header (ms)':>12}")
+    for size in args.sizes:
+        project = build_project(size)
+
+        pickled = pickle.dumps(project)
+        encode = best_time(lambda: pickle.dumps(project), args.repeat)
+        decode = best_time(lambda: pickle.loads(pickled), args.repeat)
+        print(f"{size:>8} {'pickle':>8} {len(pickled):>12} {encode:>12.3f} {decode:>12.3f} {decode:>12.3f}")
+
+        encoded = Project_Codec.encode(project)
+        encode = best_time(lambda: Project_Codec.encode(project), args.repeat)
+        decode = best_time(lambda: Project_Codec.decode(encoded), args.repeat)
+        header = best_time(lambda: Project_Codec.decode_header(encoded), args.repeat)
+        print(f"{size:>8} {'codec':>8} {len(encoded):>12} {encode:>12.3f} {decode:>12.3f} {header:>12.3f}")
+
+if __name__ == "__main__":
+    main()
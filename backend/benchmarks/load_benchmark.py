@@ -0,0 +1,442 @@
+"""
+Load-tests the API with concurrent clients replaying the requests of the frontend pages,
+and reports the latency percentiles and throughput of every route.
+
+A database is generated into a temporary directory by tools/generate_dataset.py, with
+password hashes of bcrypt cost BCRYPT_ROUNDS as logins are not timed, and each client
+logs in, with the password the generator gives its user, as one of the users who belong
+to a project, then runs scenarios drawn from
+the mix until the duration is over, each on one of its user's projects:
+
+- tasks_page: the task management page, the sidebar's project list, then the user's role,
+  the categories, the tasks and the collaborators of the project.
+- calendar_page: the sidebar's project list and the tasks due in three months.
+- my_tasks: the first page of the tasks assigned to the user.
+- save: a full task list save to task_updates, with the status of one task changed.
+- patch: a save of one changed task with PATCH /task, as the data editor does.
+- add_task: a new task.
+
+The scenarios that change a project, save, patch and add_task, run on one of the projects
+where the user is not a Guest, as the frontend only offers them there and the API refuses
+them to Guests; a user who is a Guest everywhere loads the task page instead.
+
+Saves work on the task list of the client's last tasks_page, so a save of a stale list
+drops the tasks added by other clients since, and a patch of such a task fails; both are
+counted under the failures of their route.
+
+The app runs in this process by default: requests are passed straight to its ASGI
+interface, with its lifespan, so the latencies are those of the app without a network.
+With --uvicorn, the app is served by uvicorn with --workers processes and the requests
+are sent over keep-alive connections, one per client. Every concurrency level runs on
+the same database, one after another, so later levels see the tasks added by earlier ones.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_benchmark [--concurrency 1 8 32] [--duration 10] [--users 200] [--projects 100] [--tasks 200]
+                                        [--mix tasks_page=50 save=10] [--uvicorn] [--workers 1] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import http.client
+import json
+import os
+import random
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+from benchmarks.worker_benchmark import wait_for_port
+from tools.generate_dataset import BASE_DATE, generate, user_password
+
+PASSWORD = "password"
+BCRYPT_ROUNDS = 4
+DEFAULT_MIX = {"tasks_page": 50, "calendar_page": 15, "my_tasks": 10, "save": 10, "patch": 10, "add_task": 5}
+STATUSES = ("TODO", "DOING", "DONE")
+
+### TRANSPORTS ###
+
+def asgi_transport(app):
+    """
+    Return a function sending a request straight to an ASGI app, in this process.
+    """
+    async def transport(method: str, path: str, query: str, headers: dict, body: bytes):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": urllib.parse.quote(path).encode(),
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+        }
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        response = {"status": None, "body": []}
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # The client never disconnects
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await app(scope, receive, send)
+        return response["status"], b"".join(response["body"])
+
+    return transport
+
+def http_transport(port: int, executor: concurrent.futures.Executor):
+    """
+    Return a function sending a request to a local server over its own keep-alive
+    connection, in a thread of the executor.
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+
+    def blocking(method: str, path: str, query: str, headers: dict, body: bytes):
+        url = urllib.parse.quote(path) + (f"?{query}" if query else "")
+        connection.request(method, url, body=body or None, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    async def transport(method: str, path: str, query: str, headers: dict, body: bytes):
+        return await asyncio.get_running_loop().run_in_executor(executor, blocking, method, path, query, headers, body)
+
+    return transport
+
+### CLIENTS ###
+
+def client_sender(transport, session: dict, records: list):
+    """
+    Return a function sending a request of a client's session and recording its route,
+    latency and status.
+
+    The route is a path template, filled in with the session's user and project, so the
+    latencies of the same endpoint are grouped whatever the user and project.
+    """
+    async def send(method: str, route: str, params: dict = None, body=None):
+        path = route.format(username=session["username"], project_name=session.get("project", ""))
+        headers = {"Authorization": f"Bearer {session['token']}"} if "token" in session else {}
+        data = b""
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            data = json.dumps(body).encode()
+        start = time.perf_counter()
+        status, payload = await transport(method, path, urllib.parse.urlencode(params or {}), headers, data)
+        if records is not None:
+            records.append((f"{method} {route}", (time.perf_counter() - start) * 1000, status))
+        return status, json.loads(payload or b"null")
+
+    return send
+
+async def tasks_page(send, session: dict, rng: random.Random):
+    """
+    Load the task management page, and keep the task list for the saves of the project.
+    """
+    project_name = session["project"]
+    await send("GET", "/{username}", {"username": session["username"]})
+    await send("GET", "/{username}/{project_name}/role", {"project_name": project_name})
+    await send("GET", "/{username}/{project_name}/category", {"project_name": project_name})
+    status, tasks = await send("GET", "/{username}/{project_name}/task", {"project_name": project_name})
+    if status == 200:
+        session.setdefault("tasks", {})[project_name] = tasks
+    await send("GET", "/{username}/{project_name}/collaborators", {"project_name": project_name})
+
+async def calendar_page(send, session: dict, rng: random.Random):
+    """
+    Load the calendar of a month, with the months before and after it.
+    """
+    month = BASE_DATE.astype("datetime64[M]") + rng.randrange(-6, 13)
+    await send("GET", "/{username}", {"username": session["username"]})
+    await send("GET", "/{username}/{project_name}/calendar", {"start": str(month - 1) + "-01", "end": str(month + 2) + "-01"})
+
+async def my_tasks(send, session: dict, rng: random.Random):
+    """
+    Load the first page of the tasks assigned to the user.
+    """
+    await send("GET", "/{username}/tasks", {"limit": 50})
+
+async def save(send, session: dict, rng: random.Random):
+    """
+    Save the full task list of the project with one status changed, loading the page first
+    if the client has not seen the project yet.
+    """
+    tasks = [dict(task) for task in session.get("tasks", {}).get(session["project"], [])]
+    if not tasks:
+        return await tasks_page(send, session, rng)
+    rng.choice(tasks)["status"] = rng.choice(STATUSES)
+    await send("POST", "/{username}/{project_name}/task_updates", body={"project_name": session["project"], "updated_tasks": tasks})
+
+async def patch(send, session: dict, rng: random.Random):
+    """
+    Save one changed status with a patch, loading the page first if the client has not
+    seen the project yet.
+    """
+    tasks = session.get("tasks", {}).get(session["project"], [])
+    if not tasks:
+        return await tasks_page(send, session, rng)
+    await send("PATCH", "/{username}/{project_name}/task", body={"updates": [{"id": rng.choice(tasks)["id"], "status": rng.choice(STATUSES)}]})
+
+async def add_task(send, session: dict, rng: random.Random):
+    """
+    Add a task assigned to the user.
+    """
+    body = {"task_name": f"load {rng.randrange(10 ** 6)}", "description": "Added by the load benchmark", "priority": str(rng.randint(1, 5)),
+            "deadline": str(BASE_DATE + rng.randrange(-30, 60)), "category": "None", "status": "TODO",
+            "assignee": session["username"], "project_name": session["project"]}
+    await send("POST", "/{username}/{project_name}/task", body=body)
+
+SCENARIOS = {"tasks_page": tasks_page, "calendar_page": calendar_page, "my_tasks": my_tasks, "save": save, "patch": patch, "add_task": add_task}
+EDITING_SCENARIOS = ("save", "patch", "add_task")
+
+async def log_in(transports: list, sessions: list):
+    """
+    Log every session in, one login per user over the transport of its first session, and
+    store the tokens in the sessions.
+
+    Raises:
+        RuntimeError: If a login fails.
+    """
+    async def one(username: str, transport):
+        status, response = await client_sender(transport, {"username": username}, None)("POST", "/login", {"username": username, "password": user_password(PASSWORD, username)})
+        if status != 200:
+            raise RuntimeError(f"Login of {username} failed: {response}")
+        return username, response["token"]
+
+    first_transports = {}
+    for session, transport in zip(sessions, transports):
+        first_transports.setdefault(session["username"], transport)
+    tokens = dict(await asyncio.gather(*(one(username, transport) for username, transport in first_transports.items())))
+    for session in sessions:
+        session["token"] = tokens[session["username"]]
+
+async def run_level(transports: list, sessions: list, mix: dict, duration: float, seed: int):
+    """
+    Run the clients for a fixed duration after one unrecorded tasks_page each.
+
+    Returns:
+        tuple: The (route, latency in milliseconds, status) of every request, the
+               (scenario, latency in milliseconds) of every scenario, and the elapsed seconds.
+    """
+    records = []
+    scenario_records = []
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    async def client(index: int, deadline: float):
+        rng = random.Random(seed * 7919 + index)
+        session = sessions[index]
+        send = client_sender(transports[index], session, records)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            projects = session["editable"] if name in EDITING_SCENARIOS else session["projects"]
+            if not projects:
+                name, projects = "tasks_page", session["projects"]
+            session["project"] = rng.choice(projects)
+            start = time.perf_counter()
+            await SCENARIOS[name](send, session, rng)
+            scenario_records.append((name, (time.perf_counter() - start) * 1000))
+
+    await asyncio.gather(*(tasks_page(client_sender(transports[index], sessions[index], None), sessions[index], random.Random(index))
+                           for index in range(len(sessions))))
+    start = time.perf_counter()
+    await asyncio.gather(*(client(index, start + duration) for index in range(len(sessions))))
+    return records, scenario_records, time.perf_counter() - start
+
+### REPORT ###
+
+def percentile(ordered: list, fraction: float):
+    """
+    Return the nearest-rank percentile of sorted values.
+    """
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+def summarize(concurrency: int, records: list, scenario_records: list, elapsed: float):
+    """
+    Return the count, failures, throughput and latency percentiles of every route and
+    scenario of a concurrency level.
+    """
+    groups = {}
+    for route, latency, status in records:
+        groups.setdefault(("route", route), []).append((latency, status))
+    for name, latency in scenario_records:
+        groups.setdefault(("scenario", name), []).append((latency, 200))
+    rows = []
+    for (kind, name), values in sorted(groups.items()):
+        latencies = sorted(latency for latency, _ in values)
+        rows.append({
+            "concurrency": concurrency,
+            "kind": kind,
+            "name": name,
+            "requests": len(values),
+            "failures": sum(not 200 <= status < 300 for _, status in values),
+            "throughput": len(values) / elapsed,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "max_ms": latencies[-1],
+        })
+    latencies = sorted(latency for _, latency, _ in records)
+    rows.append({"concurrency": concurrency, "kind": "total", "name": "all routes", "requests": len(records),
+                 "failures": sum(not 200 <= status < 300 for _, _, status in records), "throughput": len(records) / elapsed,
+                 "p50_ms": percentile(latencies, 0.50), "p95_ms": percentile(latencies, 0.95), "p99_ms": percentile(latencies, 0.99),
+                 "max_ms": latencies[-1] if latencies else 0.0})
+    return rows
+
+def print_rows(rows: list):
+    print(f"{'name':<48} {'requests':>9} {'failures':>9} {'req/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9}")
+    for row in rows:
+        label = row["name"] if row["kind"] != "scenario" else f"[{row['name']}]"
+        print(f"{label:<48} {row['requests']:>9} {row['failures']:>9} {row['throughput']:>9.1f} {row['p50_ms']:>9.1f} "
+              f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}")
+
+### SETUP ###
+
+def member_sessions(users: int, clients: int):
+    """
+    Return a session for each client, holding the name and projects of a user, and the
+    projects where the user is not a Guest, read from the generated database. Users who
+    belong to no project are skipped; with more clients than such users, users are shared
+    by several clients.
+    """
+    from libraries.user import Role
+    from utilities.account_utilities import Account_Utilities
+    from utilities.project_utilities import Project_Utilities
+    from utilities.storage_manager import Storage_Manager
+
+    members = []
+    for user in range(users):
+        username = f"user{user + 1}"
+        projects = Account_Utilities.get_project_list(username)
+        if projects:
+            editable = [project_name for project_name in projects if Project_Utilities.get_user_role(project_name, username) != Role.GUEST.value]
+            members.append({"username": username, "projects": projects, "editable": editable, "project": projects[0]})
+        if len(members) == clients:
+            break
+    Storage_Manager.stop()
+    if not members:
+        raise RuntimeError("No user belongs to a project")
+    return [dict(members[index % len(members)]) for index in range(clients)]
+
+async def run_in_process(database_dir: str, shards: int, levels: list, args):
+    """
+    Serve the app in this process, with its lifespan, and run every concurrency level.
+    """
+    os.environ["HONEYDUE_SEED"] = "0"
+    from main import app
+    from utilities.storage_manager import Storage_Manager
+
+    Storage_Manager.DATABASE_DIR = database_dir
+    Storage_Manager.set_project_shards(shards)
+    rows = []
+    async with app.router.lifespan_context(app):
+        transport = asgi_transport(app)
+        for concurrency, sessions in levels:
+            transports = [transport] * concurrency
+            await log_in(transports, sessions)
+            records, scenario_records, elapsed = await run_level(transports, sessions, args.mix, args.duration, args.seed)
+            level_rows = summarize(concurrency, records, scenario_records, elapsed)
+            rows.extend(level_rows)
+            print(f"\n{concurrency} clients, {args.duration:.0f} s, in process")
+            print_rows(level_rows)
+    return rows
+
+async def run_uvicorn(database_dir: str, shards: int, levels: list, args):
+    """
+    Serve the app with uvicorn and run every concurrency level over HTTP.
+    """
+    environment = dict(os.environ, HONEYDUE_DATABASE_DIR=database_dir, HONEYDUE_PROJECT_SHARDS=str(shards),
+                       HONEYDUE_WORKERS=str(args.workers), HONEYDUE_SEED="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+        env=environment,
+    )
+    rows = []
+    try:
+        wait_for_port(args.port, 60)
+        for concurrency, sessions in levels:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+                transports = [http_transport(args.port, executor) for _ in range(concurrency)]
+                await log_in(transports, sessions)
+                records, scenario_records, elapsed = await run_level(transports, sessions, args.mix, args.duration, args.seed)
+            level_rows = summarize(concurrency, records, scenario_records, elapsed)
+            rows.extend(level_rows)
+            print(f"\n{concurrency} clients, {args.duration:.0f} s, uvicorn with {args.workers} workers")
+            print_rows(level_rows)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    return rows
+
+def parse_mix(values: list):
+    """
+    Parse the scenario weights given as name=weight.
+
+    Raises:
+        ValueError: If a value is not name=weight, a name is not a scenario or a weight is negative.
+    """
+    mix = {}
+    for value in values:
+        name, _, weight = value.partition("=")
+        if name not in SCENARIOS or not weight or float(weight) < 0:
+            raise ValueError(f"Invalid scenario weight {value!r}; the scenarios are {', '.join(SCENARIOS)}")
+        mix[name] = float(weight)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Numbers of concurrent clients to run, in turn.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per concurrency level.")
+    parser.add_argument("--mix", nargs="+", default=[f"{name}={weight}" for name, weight in DEFAULT_MIX.items()],
+                        help="Weights of the scenarios, as name=weight.")
+    parser.add_argument("--users", type=int, default=200, help="Number of users of the generated database.")
+    parser.add_argument("--projects", type=int, default=100, help="Number of projects of the generated database.")
+    parser.add_argument("--tasks", type=int, default=200, help="Number of tasks of each generated project.")
+    parser.add_argument("--shards", type=int, default=1, help="Number of project stores.")
+    parser.add_argument("--uvicorn", action="store_true", help="Serve the app with uvicorn instead of in this process.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of uvicorn worker processes.")
+    parser.add_argument("--port", type=int, default=8767, help="Port to serve on with --uvicorn.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the database and of the request mix.")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+    # The database is thrown away afterwards, so any secret key will do
+    os.environ.setdefault("HONEYDUE_SECRET_KEY", secrets.token_hex(32))
+    try:
+        args.mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(f"{e}")
+    if min(args.concurrency) < 1 or not any(args.mix.values()):
+        parser.error("--concurrency must be at least 1 and a scenario must have a weight")
+
+    database_dir = tempfile.mkdtemp(prefix="honeydue-load-")
+    try:
+        start = time.perf_counter()
+        generate(database_dir, args.users, args.projects, args.tasks, args.seed, args.shards, PASSWORD, BCRYPT_ROUNDS)
+        levels = [(concurrency, member_sessions(args.users, concurrency)) for concurrency in args.concurrency]
+        print(f"generated {args.users} users, {args.projects} projects x {args.tasks} tasks in {time.perf_counter() - start:.1f} s; "
+              f"{os.cpu_count()} CPUs")
+        runner = run_uvicorn if args.uvicorn else run_in_process
+        rows = asyncio.run(runner(database_dir, args.shards, levels, args))
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"cpus": os.cpu_count(), "arguments": vars(args), "results": rows}, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Measures how the project store fragments under edits, and what a rewrite by the
+Store_Compactor reclaims, while the store keeps being read.
+
+Projects with a list of tasks are written into a temporary project store, then their
+task lists are rewritten a number of times, with the operation log folded into the store
+and the file closed after each round, which is how the store grows in service: HDF5 only
+reuses freed space until the file is closed. The fragmentation is measured,
+then the store is rewritten while a reader thread keeps loading projects straight from
+the store; the reader's errors and slowest load are reported with the bytes reclaimed.
+A cold read of every project, from a freshly opened file, is timed before and after.
+
+Run from the backend directory:
+
+    python -m benchmarks.reclaim_benchmark [--projects 200] [--tasks 50] [--rounds 10]
+"""
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+
+from libraries.project import Project
+from utilities.operation_log import Operation_Log
+from utilities.project_cache import Project_Cache
+from utilities.project_store import Project_Store
+from utilities.project_utilities import Project_Utilities
+from utilities.storage_manager import Storage_Manager
+from utilities.store_compactor import Store_Compactor
+
+def task_list(count: int, rng: random.Random):
+    """
+    Return a list of task dictionaries with random contents.
+    """
+    return [{
+        "name": f"task {rng.randrange(10 ** 6)}",
+        "description": "x" * rng.randrange(20, 200),
+        "priority": rng.choice(["Low", "Medium", "High"]),
+        "deadline": f"2030-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+        "category": "None",
+        "status": rng.choice(["To Do", "In Progress", "Done"]),
+        "assignee": f"user{rng.randrange(50)}",
+    } for _ in range(count)]
+
+def contents(names: list):
+    """
+    Return the task list of every project, as dictionaries, read from the project store.
+    """
+    Project_Cache.clear()
+    return {name: [task.to_dict() for task in Project_Utilities.get_task_list(name)] for name in names}
+
+def read_all(names: list):
+    """
+    Read every project from a freshly opened project store and return the time taken in milliseconds.
+    """
+    Storage_Manager.stop()
+    start = time.perf_counter()
+    with Storage_Manager.read('project') as project_data:
+        for name in names:
+            Project_Store.read_project(project_data, name)
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=200, help="Number of projects.")
+    parser.add_argument("--tasks", type=int, default=50, help="Number of tasks of each project.")
+    parser.add_argument("--rounds", type=int, default=10, help="Number of times every task list is rewritten.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the task contents.")
+    args = parser.parse_args()
+
+    Storage_Manager.DATABASE_DIR = tempfile.mkdtemp(prefix="honeydue-reclaim-")
+    Storage_Manager.set_project_shards(1)
+    rng = random.Random(args.seed)
+    names = [f"Project{i}" for i in range(args.projects)]
+
+    start = time.perf_counter()
+    for name in names:
+        Project_Utilities.add_project(Project(name, "owner"))
+    for _ in range(args.rounds):
+        for name in names:
+            Project_Utilities.update_task_list(name, task_list(args.tasks, rng))
+        Operation_Log.compact()
+        Storage_Manager.stop()
+    print(f"wrote {args.projects} projects x {args.rounds} rounds in {time.perf_counter() - start:.1f} s")
+
+    before = contents(names)
+    start = time.perf_counter()
+    measurement = Store_Compactor.measure('project')
+    print(f"measured in {(time.perf_counter() - start) * 1000:.0f} ms: {measurement}")
+    cold_before = read_all(names)
+
+    stop = threading.Event()
+    reads = {"count": 0, "errors": 0, "max_ms": 0.0}
+
+    def reader():
+        reader_rng = random.Random(args.seed + 1)
+        while not stop.is_set():
+            name = reader_rng.choice(names)
+            read_start = time.perf_counter()
+            try:
+                with Storage_Manager.read('project') as project_data:
+                    Project_Store.read_project(project_data, name)
+            except Exception:
+                reads["errors"] += 1
+            reads["count"] += 1
+            reads["max_ms"] = max(reads["max_ms"], (time.perf_counter() - read_start) * 1000)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    result = Store_Compactor.compact('project')
+    stop.set()
+    thread.join()
+    print(f"compacted: {result}")
+    print(f"concurrent reads: {reads['count']}, errors {reads['errors']}, slowest {reads['max_ms']:.1f} ms")
+    print(f"after: {Store_Compactor.measure('project')}")
+
+    cold_after = read_all(names)
+    print(f"cold read of every project: {cold_before:.0f} ms before, {cold_after:.0f} ms after")
+    print(f"contents unchanged: {before == contents(names)}")
+    Operation_Log.stop()
+    Storage_Manager.stop()
+
+if __name__ == "__main__":
+    main()
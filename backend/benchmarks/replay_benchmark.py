@@ -0,0 +1,183 @@
+"""
+Replays the requests recorded by a server started with HONEYDUE_CAPTURE_FILE against a
+fresh copy of a database, and compares the latencies and responses with the capture.
+
+For the responses to be comparable, the database given with --database-dir must be a copy
+of the server's database taken when the capture started; it is copied again into a
+temporary directory, so it can be replayed any number of times. HONEYDUE_SECRET_KEY must
+be set to the key of that server, or its password index is rebuilt. The app runs in this
+process, and the requests are passed straight to its ASGI interface.
+
+Captures hold no credentials, so the replay signs requests itself:
+- Every request under /{username} is sent with a session token issued for that user.
+- A login issues a new token instead of checking a password. It is not compared.
+- A signup is sent with a password derived from its username, REPLAY_PASSWORD followed by
+  the username, so the replayed passwords are unique, as the default PASSWORD_POLICY
+  requires.
+
+By default the requests are sent one after another, as fast as possible, in the order
+they were captured. With --timing original, each request is sent at its original offset
+from the first, whether or not the earlier ones have finished. Requests that overlapped
+in the capture may then complete in another order, and their responses can differ.
+
+A request matches when the replay returns the same status and a response with the same
+digest. For every route, the number of requests, the mismatches, and the p50/p95/p99
+latency of the capture and the replay are printed. --output writes them, with the first
+mismatches, as JSON.
+
+Run from the backend directory:
+
+    python -m benchmarks.replay_benchmark CAPTURE_FILE --database-dir DIR [--shards 1] [--timing fast|original] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import urllib.parse
+
+from benchmarks.load_benchmark import asgi_transport, percentile
+from utilities.request_capture import Request_Capture
+
+REPLAY_PASSWORD = "replayed password"
+MAX_MISMATCHES = 50
+
+def request_of(entry: dict, tokens: dict):
+    """
+    Return the method, path, query string, headers and body to replay a captured request,
+    or None for a login, which only issues a new token for its user.
+    """
+    from utilities.session_tokens import Session_Tokens
+
+    query = entry["q"]
+    if entry["r"] == "/login":
+        username = dict(urllib.parse.parse_qsl(query)).get("username")
+        tokens[username] = Session_Tokens.issue(username)[0]
+        return None
+    if entry["r"] == "/signup":
+        parameters = urllib.parse.parse_qsl(query, keep_blank_values=True)
+        password = f"{REPLAY_PASSWORD} {dict(parameters).get('username', '')}"
+        query = urllib.parse.urlencode([(name, password if value == Request_Capture.REDACTED else value) for name, value in parameters])
+
+    headers = {}
+    if entry["r"].startswith("/{username}"):
+        username = entry["p"].split("/")[1]
+        if username not in tokens:
+            tokens[username] = Session_Tokens.issue(username)[0]
+        headers["Authorization"] = f"Bearer {tokens[username]}"
+    body = entry["b"].encode('utf-8')
+    if body:
+        headers["Content-Type"] = "application/json"
+    return entry["m"], entry["p"], query, headers, body
+
+async def replay(entries: list, timing: str):
+    """
+    Replay captured requests against the app, served in this process with its lifespan.
+
+    Returns:
+        list: For every replayed request, its captured entry, and the status, latency in
+              milliseconds and digest of the replayed response.
+    """
+    from main import app
+
+    results = []
+    tokens = {}
+    async with app.router.lifespan_context(app):
+        transport = asgi_transport(app)
+
+        async def send(entry: dict, request: tuple):
+            start = time.perf_counter()
+            status, body = await transport(*request)
+            results.append((entry, status, (time.perf_counter() - start) * 1000, Request_Capture.digest(body)))
+
+        if timing == "fast":
+            for entry in entries:
+                request = request_of(entry, tokens)
+                if request is not None:
+                    await send(entry, request)
+        else:
+            first = entries[0]["t"] if entries else 0.0
+            start = time.perf_counter()
+            pending = []
+            for entry in entries:
+                delay = entry["t"] - first - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                request = request_of(entry, tokens)
+                if request is not None:
+                    pending.append(asyncio.ensure_future(send(entry, request)))
+            await asyncio.gather(*pending)
+    return results
+
+def compare(results: list):
+    """
+    Return the per-route comparison of the capture with the replay, and the first mismatches.
+    """
+    routes = {}
+    mismatches = []
+    for entry, status, latency, digest in results:
+        route = routes.setdefault(f"{entry['m']} {entry['r']}", {"captured": [], "replayed": [], "status_mismatches": 0, "body_mismatches": 0})
+        route["captured"].append(entry["d"])
+        route["replayed"].append(latency)
+        if status != entry["s"] or digest != entry["h"]:
+            route["status_mismatches" if status != entry["s"] else "body_mismatches"] += 1
+            if len(mismatches) < MAX_MISMATCHES:
+                mismatches.append({"method": entry["m"], "path": entry["p"], "query": entry["q"], "captured_status": entry["s"], "replayed_status": status})
+
+    rows = []
+    for name, route in sorted(routes.items()):
+        captured = sorted(route["captured"])
+        replayed = sorted(route["replayed"])
+        row = {"route": name, "requests": len(captured), "status_mismatches": route["status_mismatches"], "body_mismatches": route["body_mismatches"]}
+        for label, values in (("captured", captured), ("replayed", replayed)):
+            for fraction in (0.50, 0.95, 0.99):
+                row[f"{label}_p{round(fraction * 100)}_ms"] = percentile(values, fraction)
+        rows.append(row)
+    return rows, mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="The capture file written by the server.")
+    parser.add_argument("--database-dir", required=True, help="A copy of the database taken when the capture started.")
+    parser.add_argument("--shards", type=int, default=1, help="Number of project stores of the database.")
+    parser.add_argument("--timing", choices=("fast", "original"), default="fast", help="Send the requests one after another, or at their original offsets.")
+    parser.add_argument("--output", default=None, help="Write the comparison as JSON to this file.")
+    args = parser.parse_args()
+
+    entries = Request_Capture.read(args.capture)
+    database_dir = tempfile.mkdtemp(prefix="honeydue-replay-")
+    try:
+        shutil.copytree(args.database_dir, database_dir, dirs_exist_ok=True)
+        # The replay itself is not captured, and starts from the copied database as it is
+        Request_Capture.CAPTURE_FILE = ""
+        os.environ["HONEYDUE_SEED"] = "0"
+        from utilities.storage_manager import Storage_Manager
+        Storage_Manager.DATABASE_DIR = database_dir
+        Storage_Manager.set_project_shards(args.shards)
+
+        start = time.perf_counter()
+        results = asyncio.run(replay(entries, args.timing))
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+
+    rows, mismatches = compare(results)
+    captured_span = entries[-1]["t"] - entries[0]["t"] if entries else 0.0
+    print(f"replayed {len(results)} of {len(entries)} captured requests in {elapsed:.1f} s (captured over {captured_span:.1f} s), timing {args.timing}")
+    print(f"{'route':<48} {'requests':>9} {'status diff':>12} {'body diff':>10} {'p50 (ms)':>17} {'p95 (ms)':>17} {'p99 (ms)':>17}")
+    print(f"{'':<48} {'':>9} {'':>12} {'':>10} {'capture  replay':>17} {'capture  replay':>17} {'capture  replay':>17}")
+    for row in rows:
+        print(f"{row['route']:<48} {row['requests']:>9} {row['status_mismatches']:>12} {row['body_mismatches']:>10} "
+              + " ".join(f"{row[f'captured_p{p}_ms']:>8.1f} {row[f'replayed_p{p}_ms']:>8.1f}" for p in (50, 95, 99)))
+    for mismatch in mismatches[:10]:
+        print(f"mismatch: {mismatch}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"arguments": vars(args), "replayed": len(results), "captured": len(entries), "results": rows, "mismatches": mismatches}, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Measures the cost of the password uniqueness check and of a full signup as the number of
+accounts grows, against the bcrypt scan it replaced.
+
+Synthetic accounts are written straight into a temporary account store, all sharing one
+precomputed bcrypt hash, with the fingerprints of their passwords in the password index.
+The bcrypt scan is timed on the real store for small account counts and estimated from
+the cost of a single bcrypt check for larger ones.
+
+Run from the backend directory:
+
+    python -m benchmarks.signup_benchmark [--sizes 100 1000 10000] [--signups 5] [--scan-max 20]
+"""
+
+import argparse
+import os
+import secrets
+import statistics
+import tempfile
+import time
+
+import bcrypt
+import h5py
+
+from utilities.account_index import Account_Index
+from utilities.account_utilities import Account_Utilities
+from utilities.storage_manager import Storage_Manager
+
+def populate(count: int, password_hash: bytes):
+    """
+    Write synthetic accounts into the account store and add their passwords to the index.
+
+    Args:
+        count (int): The number of accounts to create.
+        password_hash (bytes): The bcrypt hash stored for every account.
+    """
+    Storage_Manager.truncate('account')
+    Account_Index.clear()
+    Account_Utilities._fingerprints = None
+    usernames = [f"synthetic{i}" for i in range(count)]
+    fingerprints = [Account_Utilities._password_fingerprint(f"synthetic-password-{i}") for i in range(count)]
+    with Storage_Manager.write('account') as account_data:
+        # The index is created while the store is empty, so no account is pending
+        index_group = Account_Utilities._password_index(account_data)
+        for username in usernames:
+            user_group = account_data.create_group(username)
+            user_group.attrs['Password'] = password_hash
+            user_group.create_dataset('Projects', shape=(0,), maxshape=(None,), dtype=h5py.string_dtype(encoding='utf-8'))
+        Account_Utilities._append(index_group['fingerprints'], fingerprints)
+        Account_Utilities._append(index_group['accounts'], usernames)
+    Storage_Manager.flush('account')
+
+def scan_password_exists(password: str):
+    """
+    The uniqueness check this benchmark compares against: one bcrypt check per account.
+    """
+    with Storage_Manager.read('account') as account_data:
+        for user in account_data:
+            if user.startswith(Account_Utilities.RESERVED_PREFIX):
+                continue
+            stored_hash = account_data[user].attrs['Password']
+            if isinstance(stored_hash, str):
+                stored_hash = stored_hash.encode('utf-8')
+            if bcrypt.checkpw(password.encode('utf-8'), stored_hash):
+                return True
+        return False
+
+def median_time(function, repeat: int):
+    """
+    Return the median wall-clock time of several calls to a function, in milliseconds.
+    """
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function(i)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Account counts to benchmark.")
+    parser.add_argument("--signups", type=int, default=5, help="Number of signups timed at each size.")
+    parser.add_argument("--scan-max", type=int, default=20, help="Largest account count at which the bcrypt scan is run instead of estimated.")
+    args = parser.parse_args()
+    # The database is thrown away afterwards, so any secret key will do
+    os.environ.setdefault("HONEYDUE_SECRET_KEY", secrets.token_hex(32))
+
+    Storage_Manager.DATABASE_DIR = tempfile.mkdtemp(prefix="honeydue-signup-")
+    password_hash = bcrypt.hashpw(b"synthetic-password", bcrypt.gensalt())
+    single_check = median_time(lambda i: bcrypt.checkpw(b"another-password", password_hash), 3)
+
+    print(f"{'accounts':>10} {'check (ms)':>12} {'signup (ms)':>12} {'bcrypt scan (ms)':>18}")
+    for size in args.sizes:
+        populate(size, password_hash)
+        Account_Utilities.password_exists("warm-up")
+        check = median_time(lambda i: Account_Utilities.password_exists(f"new-password-{size}-{i}"), args.signups)
+        signup = median_time(lambda i: Account_Utilities.add_user(f"new{size}_{i}", f"new-password-{size}-{i}"), args.signups)
+        if size <= args.scan_max:
+            scan = f"{median_time(lambda i: scan_password_exists('new-password'), 1):>18.1f}"
+        else:
+            scan = f"{'~' + format(single_check * size, '.0f'):>18}"
+        print(f"{size:>10} {check:>12.3f} {signup:>12.1f} {scan}")
+
+    Storage_Manager.stop()
+
+if __name__ == "__main__":
+    main()
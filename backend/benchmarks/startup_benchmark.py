@@ -0,0 +1,144 @@
+"""
+Measures the cold start of the API: the time from launching uvicorn until it serves its
+first request, and the time of the first requests that read the stores.
+
+Each run starts uvicorn on a fresh copy of a database directory, polls GET
+/__internal/stats until it answers, then times a login of user1 and a read of Project1's
+tasks, which open the stores and build the indexes they use. The time to import main is
+measured in a separate interpreter. Runs are repeated for the existing database (a copy of --database-dir, by
+default the sample data snapshot) and for an empty directory seeded from the snapshot with
+HONEYDUE_SEED=1.
+
+With --max-ms, the exit status is 1 when the median time to the first response of a
+scenario is above that many milliseconds, so a startup regression fails a build.
+
+Run from the backend directory:
+
+    python -m benchmarks.startup_benchmark [--runs 5] [--database-dir fixtures/sample] [--max-ms 3000]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import secrets
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "sample")
+INTERNAL_TOKEN = secrets.token_hex(16)
+
+def request(port: int, method: str, path: str, token: str = None):
+    """
+    Send a request on a new connection and return the status and the decoded JSON response.
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        headers = {} if token is None else {"Authorization": f"Bearer {token}"}
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        connection.close()
+
+def wait_for_response(port: int, server: subprocess.Popen, timeout: float):
+    """
+    Poll GET /__internal/stats until the server answers.
+
+    Raises:
+        RuntimeError: If the server exits or does not answer before the timeout.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited with status {server.returncode}")
+        try:
+            status, _ = request(port, "GET", "/__internal/stats", INTERNAL_TOKEN)
+            if status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"No response on port {port} after {timeout} s")
+
+def import_ms(environment: dict):
+    """
+    Return the time to import main in a fresh interpreter, in milliseconds.
+    """
+    code = "import time; start = time.perf_counter(); import main; print((time.perf_counter() - start) * 1000)"
+    output = subprocess.run([sys.executable, "-c", code], env=environment, check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+def measure(port: int, source_dir: str, seed: bool):
+    """
+    Start uvicorn on a fresh copy of a database directory and time its first requests.
+
+    Returns:
+        dict: The import time, the time to the first response, and the times of the first
+              login and task read, in milliseconds.
+    """
+    database_dir = tempfile.mkdtemp(prefix="honeydue-startup-")
+    try:
+        if not seed:
+            shutil.copytree(source_dir, database_dir, dirs_exist_ok=True)
+        environment = dict(os.environ, HONEYDUE_DATABASE_DIR=database_dir, HONEYDUE_SEED="1" if seed else "0", HONEYDUE_INTERNAL_TOKEN=INTERNAL_TOKEN)
+        imported = import_ms(environment)
+
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            env=environment,
+        )
+        try:
+            wait_for_response(port, server, 120)
+            first_response = (time.perf_counter() - start) * 1000
+
+            login_start = time.perf_counter()
+            status, response = request(port, "POST", "/login?username=user1&password=password1")
+            if status != 200:
+                raise RuntimeError(f"Login failed: {response}")
+            login = (time.perf_counter() - login_start) * 1000
+
+            read_start = time.perf_counter()
+            status, response = request(port, "GET", "/user1/Project1/task", response["token"])
+            if status != 200:
+                raise RuntimeError(f"Reading the tasks failed: {response}")
+            first_read = (time.perf_counter() - read_start) * 1000
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+        return {"import_ms": imported, "first_response_ms": first_response, "login_ms": login, "first_read_ms": first_read}
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of starts per scenario.")
+    parser.add_argument("--database-dir", default=SNAPSHOT_DIR, help="The database started from in the existing-database scenario.")
+    parser.add_argument("--port", type=int, default=8766, help="Port to serve on.")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if a median time to the first response is above this.")
+    args = parser.parse_args()
+    # The database is thrown away afterwards, so any secret key will do
+    os.environ.setdefault("HONEYDUE_SECRET_KEY", secrets.token_hex(32))
+
+    columns = ("import_ms", "first_response_ms", "login_ms", "first_read_ms")
+    print(f"{'scenario':<10} {'import (ms)':>12} {'first response (ms)':>20} {'login (ms)':>11} {'first read (ms)':>16}   (medians of {args.runs} runs)")
+    failed = False
+    for scenario, seed in (("existing", False), ("seeded", True)):
+        results = [measure(args.port, args.database_dir, seed) for _ in range(args.runs)]
+        medians = {column: statistics.median(result[column] for result in results) for column in columns}
+        slowest = max(result["first_response_ms"] for result in results)
+        print(f"{scenario:<10} {medians['import_ms']:>12.0f} {medians['first_response_ms']:>20.0f} {medians['login_ms']:>11.0f} "
+              f"{medians['first_read_ms']:>16.0f}   slowest first response {slowest:.0f} ms")
+        if args.max_ms is not None and medians["first_response_ms"] > args.max_ms:
+            print(f"{scenario}: the median time to the first response is above {args.max_ms:.0f} ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Micro-benchmarks of the storage layer: the public operations of Project_Utilities and
+Account_Utilities at a range of project sizes and user counts, each size against a fresh
+database in a temporary directory.
+
+Project operations run against a project of --tasks tasks, in a database written with the
+bulk path of tools/generate_dataset.py, with password hashes of bcrypt cost BCRYPT_ROUNDS. Account operations run against an account store of
+--users users with a few projects each, written with Account_Utilities.add_users. The
+maintenance operations (migrate, reset, load_snapshot) are left out.
+
+Each operation is called up to --repeats times, stopping early once --budget seconds have
+been spent on it, and the median, minimum and 90th percentile of the call times are kept.
+Project writes are only appended to the operation log by the call; the log is then folded
+into the project store, and the fold time per call is reported as fold_us. Reads run with
+the caches warm; get_task_list and get_project_list are also timed cold.
+
+Results are printed as a table and, with --output, written as JSON. With --baseline, every
+result is compared with the same operation at the same size in a saved results file, and
+the exit status is 1 when an operation is slower than the baseline by more than
+--tolerance. The comparison uses the minimum call time by default, which varies least
+between runs on a busy machine; --metric median_us compares the medians.
+
+Run from the backend directory:
+
+    python -m benchmarks.storage_benchmark [--tasks 10 100 1000 10000 100000] [--users 10 100 1000 10000 100000]
+        [--repeats 20] [--budget 2] [--output results.json] [--baseline baseline.json] [--tolerance 0.25] [--metric min_us]
+"""
+
+import argparse
+import json
+import os
+import platform
+import secrets
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import h5py
+
+from libraries.project import Project
+from libraries.task import Task
+from tools.generate_dataset import generate
+from utilities.account_index import Account_Index
+from utilities.account_utilities import Account_Utilities
+from utilities.assignee_index import Assignee_Index
+from utilities.operation_log import Operation_Log
+from utilities.password_hashing import Password_Hashing
+from utilities.project_cache import Project_Cache
+from utilities.project_utilities import Project_Utilities
+from utilities.storage_manager import Storage_Manager
+
+PASSWORD = "password"
+BCRYPT_ROUNDS = 4
+USER_PROJECTS = 5
+
+def use_database(database_dir: str):
+    """
+    Close the stores and the log, drop every cache, and point the storage at a directory.
+    """
+    Operation_Log.stop()
+    Storage_Manager.stop()
+    Storage_Manager.DATABASE_DIR = database_dir
+    Storage_Manager.set_project_shards(1)
+    Project_Cache.clear()
+    Assignee_Index.clear()
+    Account_Index.clear()
+    Account_Utilities._fingerprints = None
+
+def time_calls(function, repeats: int, budget: float, setup=None):
+    """
+    Call function(i) up to repeats times, at least once, until budget seconds are spent.
+    setup(i), when given, runs untimed before each call.
+
+    Returns:
+        list: The time of each call in microseconds.
+    """
+    times = []
+    deadline = time.perf_counter() + budget
+    for i in range(repeats):
+        if setup is not None:
+            setup(i)
+        start = time.perf_counter()
+        function(i)
+        times.append((time.perf_counter() - start) * 1e6)
+        if time.perf_counter() > deadline:
+            break
+    return times
+
+def result(suite: str, size: int, operation: str, times: list, fold_us: float = None):
+    """
+    Summarize the call times of an operation.
+    """
+    ordered = sorted(times)
+    summary = {
+        "suite": suite,
+        "size": size,
+        "operation": operation,
+        "calls": len(times),
+        "median_us": statistics.median(ordered),
+        "min_us": ordered[0],
+        "p90_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+    }
+    if fold_us is not None:
+        summary["fold_us"] = fold_us
+    return summary
+
+def project_suite(tasks: int, repeats: int, budget: float, seed: int):
+    """
+    Time the Project_Utilities operations against a project of a given number of tasks.
+
+    Returns:
+        list: The result of each operation.
+    """
+    database_dir = tempfile.mkdtemp(prefix="honeydue-storage-")
+    use_database(database_dir)
+    generate(database_dir, 50, 2, tasks, seed, 1, PASSWORD, BCRYPT_ROUNDS)
+    use_database(database_dir)
+    # Users to add as collaborators, with no projects yet
+    hashed_password = Password_Hashing.hash_password(PASSWORD)
+    Account_Utilities.add_users([(f"bench{i}", hashed_password, []) for i in range(repeats)])
+
+    project_name = "Project1"
+    collaborators = Project_Utilities.get_collaborators(project_name)
+    owner = next(iter(collaborators))
+    categories = Project_Utilities.get_category_list(project_name)
+    task_list = [dict(task.to_dict(), id=task.task_id) for task in Project_Utilities.get_task_list(project_name)]
+    results = []
+
+    def read(operation, function, setup=None):
+        results.append(result("project", tasks, operation, time_calls(function, repeats, budget, setup)))
+
+    # Returns the number of calls, so an operation undoing another is called as many times
+    def write(operation, function, calls=repeats):
+        times = time_calls(function, calls, budget)
+        start = time.perf_counter()
+        Operation_Log.compact()
+        results.append(result("project", tasks, operation, times, (time.perf_counter() - start) * 1e6 / len(times)))
+        return len(times)
+
+    read("project_exists", lambda i: Project_Utilities.project_exists(project_name))
+    read("get_task_list[cold]", lambda i: Project_Utilities.get_task_list(project_name), lambda i: Project_Cache.clear())
+    read("get_task_list", lambda i: Project_Utilities.get_task_list(project_name))
+    read("find_tasks", lambda i: Project_Utilities.find_tasks(project_name, status="TODO"))
+    read("get_tasks_due", lambda i: Project_Utilities.get_tasks_due(project_name, "2025-01-01", "2025-03-01"))
+    read("get_assigned_tasks", lambda i: Project_Utilities.get_assigned_tasks(owner, limit=50))
+    read("get_collaborators", lambda i: Project_Utilities.get_collaborators(project_name))
+    read("get_category_list", lambda i: Project_Utilities.get_category_list(project_name))
+    read("category_exists", lambda i: Project_Utilities.category_exists(categories[0] if categories else "None", project_name))
+    read("get_user_role", lambda i: Project_Utilities.get_user_role(project_name, owner))
+
+    write("add_task", lambda i: Project_Utilities.add_task(Task(f"Bench task {i}", "Added by the benchmark", "3", "2025-06-01", "None", "TODO", owner), project_name))
+    write("patch_tasks", lambda i: Project_Utilities.patch_tasks(project_name, [{"id": task_list[i % len(task_list)]["id"], "status": "DONE"}], [], []))
+    write("apply_batch", lambda i: Project_Utilities.apply_batch(project_name, [{"op": "update_task", "task_id": task_list[i % len(task_list)]["id"], "fields": {"priority": "2"}}]))
+    write("update_task_list", lambda i: Project_Utilities.update_task_list(project_name, task_list))
+    added = write("add_category", lambda i: Project_Utilities.add_category(f"Bench category {i}", project_name))
+    write("remove_category", lambda i: Project_Utilities.remove_category(project_name, f"Bench category {i}"), added)
+    added = write("add_collaborator", lambda i: Project_Utilities.add_collaborator(f"bench{i}", "Member", project_name))
+    write("update_user_role", lambda i: Project_Utilities.update_user_role(project_name, f"bench{i}", "Guest"), added)
+    write("remove_collaborator", lambda i: Project_Utilities.remove_collaborator(project_name, f"bench{i}"), added)
+    added = write("add_project", lambda i: Project_Utilities.add_project(Project(f"Bench project {i}", owner)))
+    write("delete_project", lambda i: Project_Utilities.delete_project(f"Bench project {i}"), added)
+    write("delete_project[full]", lambda i: Project_Utilities.delete_project("Project2"), 1)
+
+    use_database(database_dir)
+    shutil.rmtree(database_dir, ignore_errors=True)
+    return results
+
+def account_suite(users: int, repeats: int, budget: float, seed: int):
+    """
+    Time the Account_Utilities operations against an account store of a given number of users.
+
+    Returns:
+        list: The result of each operation.
+    """
+    database_dir = tempfile.mkdtemp(prefix="honeydue-storage-")
+    use_database(database_dir)
+    hashed_password = Password_Hashing.hash_password(PASSWORD)
+    pool = max(1, users // 2)
+    Account_Utilities.add_users([(f"user{user}", hashed_password, [f"Project{(user * 7 + k * 13 + seed) % pool}" for k in range(USER_PROJECTS)])
+                                 for user in range(users)])
+    use_database(database_dir)
+    username = "user0"
+    project_name = Account_Utilities.get_project_list(username)[0]
+    results = []
+
+    # Returns the number of calls, so an operation undoing another is called as many times
+    def run(operation, function, setup=None, calls=repeats):
+        times = time_calls(function, calls, budget, setup)
+        results.append(result("account", users, operation, times))
+        return len(times)
+
+    def share(i):
+        for member in range(min(10, users)):
+            Account_Utilities.add_project(f"Shared {i}", f"user{member}")
+
+    run("username_exists", lambda i: Account_Utilities.username_exists(f"user{users // 2}"))
+    run("password_exists", lambda i: Account_Utilities.password_exists(f"unused-{i}"))
+    run("account_exists", lambda i: Account_Utilities.account_exists(username, PASSWORD))
+    run("get_password_hash", lambda i: Account_Utilities.get_password_hash(username))
+    run("index_password", lambda i: Account_Utilities.index_password(f"indexed-{i}", f"indexed-{i}"))
+    run("add_user", lambda i: Account_Utilities.add_user(f"bench{i}", f"bench-password-{i}", hashed_password))
+    run("add_users[100]", lambda i: Account_Utilities.add_users([(f"bulk{i}-{k}", hashed_password, []) for k in range(100)]))
+    run("user_has_project", lambda i: Account_Utilities.user_has_project(username, project_name))
+    added = run("add_project", lambda i: Account_Utilities.add_project(f"Bench project {i}", username))
+    run("delete_project", lambda i: Account_Utilities.delete_project(f"Bench project {i}", username), calls=added)
+    added = run("add_projects[5]", lambda i: Account_Utilities.add_projects(username, [f"Bench batch {i}-{k}" for k in range(5)]))
+    run("remove_projects[5]", lambda i: Account_Utilities.remove_projects(username, [f"Bench batch {i}-{k}" for k in range(5)]), calls=added)
+    run("get_members", lambda i: Account_Utilities.get_members(project_name))
+    run("remove_project_members", lambda i: Account_Utilities.remove_project_members(f"Shared {i}"), share)
+    run("get_project_list[cold]", lambda i: Account_Utilities.get_project_list(username), lambda i: Account_Index.clear())
+    run("get_project_list", lambda i: Account_Utilities.get_project_list(username))
+
+    use_database(database_dir)
+    shutil.rmtree(database_dir, ignore_errors=True)
+    return results
+
+def compare(results: list, baseline: dict, tolerance: float, metric: str):
+    """
+    Add the baseline value of the metric and the ratio to it to each result found in the
+    baseline.
+
+    Returns:
+        list: The results slower than the baseline by more than the tolerance.
+    """
+    previous = {(entry["suite"], entry["size"], entry["operation"]): entry for entry in baseline["results"]}
+    slower = []
+    for entry in results:
+        match = previous.get((entry["suite"], entry["size"], entry["operation"]))
+        if match is None or match[metric] <= 0:
+            continue
+        entry["baseline_" + metric] = match[metric]
+        entry["ratio"] = entry[metric] / match[metric]
+        if entry["ratio"] > 1 + tolerance:
+            slower.append(entry)
+    return slower
+
+def print_results(results: list, tolerance: float):
+    """
+    Print the results as a table.
+    """
+    print(f"{'suite':<8} {'size':>7} {'operation':<24} {'calls':>5} {'median (us)':>12} {'min (us)':>10} {'p90 (us)':>10} {'fold (us)':>10} {'vs baseline':>13}")
+    for entry in results:
+        fold = f"{entry['fold_us']:>10.0f}" if "fold_us" in entry else f"{'':>10}"
+        ratio = ""
+        if "ratio" in entry:
+            flag = " slower" if entry["ratio"] > 1 + tolerance else " faster" if entry["ratio"] < 1 / (1 + tolerance) else ""
+            ratio = f"{entry['ratio']:.2f}x{flag}"
+        print(f"{entry['suite']:<8} {entry['size']:>7} {entry['operation']:<24} {entry['calls']:>5} {entry['median_us']:>12.0f} "
+              f"{entry['min_us']:>10.0f} {entry['p90_us']:>10.0f} {fold} {ratio:>13}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, nargs="*", default=[10, 100, 1000, 10000, 100000], help="Project sizes, in tasks.")
+    parser.add_argument("--users", type=int, nargs="*", default=[10, 100, 1000, 10000, 100000], help="Account store sizes, in users.")
+    parser.add_argument("--repeats", type=int, default=20, help="Maximum number of calls of each operation.")
+    parser.add_argument("--budget", type=float, default=2.0, help="Seconds after which an operation is not called again.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated data.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare with the results in this JSON file.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against the baseline, as a fraction.")
+    parser.add_argument("--metric", choices=["min_us", "median_us"], default="min_us", help="The call time compared with the baseline.")
+    args = parser.parse_args()
+    # The database is thrown away afterwards, so any secret key will do
+    os.environ.setdefault("HONEYDUE_SECRET_KEY", secrets.token_hex(32))
+
+    results = []
+    for tasks in args.tasks:
+        results += project_suite(tasks, args.repeats, args.budget, args.seed)
+    for users in args.users:
+        results += account_suite(users, args.repeats, args.budget, args.seed)
+
+    slower = []
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            slower = compare(results, json.load(baseline_file), args.tolerance, args.metric)
+    print_results(results, args.tolerance)
+
+    if args.output:
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "h5py": h5py.__version__,
+                "hdf5": h5py.version.hdf5_version,
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "log_fsync": Operation_Log.FSYNC,
+            },
+            "arguments": vars(args),
+            "results": results,
+        }
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"wrote {len(results)} results to {args.output}")
+    if slower:
+        print(f"{len(slower)} operation(s) slower than the baseline by more than {args.tolerance:.0%}")
+    sys.exit(1 if slower else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Measures request throughput of the API served by uvicorn with a growing number of worker
+processes sharing one database directory.
+
+For each worker count, uvicorn is started on a fresh temporary database, seeded with the
+sample data (HONEYDUE_SEED=1), a session is opened for user1, and client threads send
+requests over keep-alive connections for a fixed duration: mostly reads of a project's
+tasks and of the user's assigned tasks, and a share of task additions, which are serialized across
+the workers by the operation log lock. The throughput, the latencies, and the number of
+tasks found in the project at the end (which must equal the number of tasks added) are
+printed per worker count. Throughput can only grow with the workers while there are
+spare cores.
+
+Run from the backend directory:
+
+    python -m benchmarks.worker_benchmark [--workers 1 2 4] [--clients 16] [--duration 10] [--writes 0.1]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import secrets
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+def wait_for_port(port: int, timeout: float):
+    """
+    Wait until something listens on a local port.
+
+    Raises:
+        RuntimeError: If nothing listens before the timeout.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout} s")
+
+def request(connection: http.client.HTTPConnection, method: str, path: str, token: str = None, body: dict = None):
+    """
+    Send a request over a connection and return the status and the decoded JSON response.
+    """
+    headers = {"Content-Type": "application/json"}
+    if token is not None:
+        headers["Authorization"] = f"Bearer {token}"
+    connection.request(method, path, body=None if body is None else json.dumps(body), headers=headers)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read() or b"null")
+
+def run_clients(port: int, token: str, clients: int, duration: float, writes: float, seed: int):
+    """
+    Send requests from client threads for a fixed duration.
+
+    Returns:
+        tuple: The latency of each successful request in milliseconds, the number of failed
+               requests, and the number of tasks added.
+    """
+    latencies = []
+    failures = [0]
+    added = [0]
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client(index: int):
+        rng = random.Random(seed + index)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local_latencies = []
+        local_failures = 0
+        local_added = 0
+        while time.time() < deadline:
+            start = time.perf_counter()
+            if rng.random() < writes:
+                body = {"task_name": f"bench-{index}-{local_added}", "description": "", "priority": "Low", "deadline": "2030-01-01",
+                        "category": "None", "status": "To Do", "assignee": "user1", "project_name": "Project1"}
+                status, _ = request(connection, "POST", "/user1/Project1/task", token, body)
+                local_added += status == 200
+            elif rng.random() < 0.5:
+                status, _ = request(connection, "GET", "/user1/Project1/task", token)
+            else:
+                status, _ = request(connection, "GET", "/user1/tasks", token)
+            if status == 200:
+                local_latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                local_failures += 1
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            failures[0] += local_failures
+            added[0] += local_added
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures[0], added[0]
+
+def measure(workers: int, port: int, args):
+    """
+    Start uvicorn with a number of workers on a fresh database and measure its throughput.
+
+    Returns:
+        dict: The results of the run.
+    """
+    database_dir = tempfile.mkdtemp(prefix="honeydue-workers-")
+    environment = dict(os.environ, HONEYDUE_DATABASE_DIR=database_dir, HONEYDUE_WORKERS=str(workers), HONEYDUE_SEED="1")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=environment,
+    )
+    try:
+        wait_for_port(port, 60)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        # Every worker must be up before timing, so log in until the login has succeeded a few times
+        for _ in range(workers * 4):
+            status, response = request(connection, "POST", "/login?username=user1&password=password1")
+            if status != 200:
+                raise RuntimeError(f"Login failed: {response}")
+        token = response["token"]
+        _, before = request(connection, "GET", "/user1/Project1/task", token)
+        connection.close()
+
+        start = time.perf_counter()
+        latencies, failures, added = run_clients(port, token, args.clients, args.duration, args.writes, args.seed)
+        elapsed = time.perf_counter() - start
+
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        _, after = request(connection, "GET", "/user1/Project1/task", token)
+        connection.close()
+        latencies.sort()
+        return {
+            "workers": workers,
+            "requests": len(latencies),
+            "failures": failures,
+            "throughput": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies) if latencies else 0.0,
+            "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0,
+            "added": added,
+            "found": len(after) - len(before),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+        shutil.rmtree(database_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to measure.")
+    parser.add_argument("--clients", type=int, default=16, help="Number of concurrent client threads.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per worker count.")
+    parser.add_argument("--writes", type=float, default=0.1, help="Share of requests that add a task.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to serve on.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the request mix.")
+    args = parser.parse_args()
+    # The database is thrown away afterwards, so any secret key will do
+    os.environ.setdefault("HONEYDUE_SECRET_KEY", secrets.token_hex(32))
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} clients, {args.writes:.0%} writes, {args.duration:.0f} s per run")
+    print(f"{'workers':>8} {'requests':>9} {'failures':>9} {'req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'added':>7} {'found':>7}")
+    for workers in args.workers:
+        result = measure(workers, args.port, args)
+        print(f"{result['workers']:>8} {result['requests']:>9} {result['failures']:>9} {result['throughput']:>9.1f} "
+              f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['added']:>7} {result['found']:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+import copy
+
+from bisect import bisect_left, insort
+
 from libraries.user import Role
 
 class Project:
@@ -10,6 +14,10 @@ class Project:
         collaborators (dict): A dictionary of collaborators and their roles in the project.
         tasks (list): A list of tasks associated with the project.
         categories (list): A list of task categories for the project.
+        next_task_id (int): The identifier given to the next task added to the project.
+        task_index (dict): A dictionary mapping task identifiers to their position in tasks.
+        field_indexes (dict): For each field in INDEXED_FIELDS, a dictionary mapping each value to the set of task identifiers with that value.
+        deadline_index (list): A list of (deadline, task identifier) pairs sorted by deadline.
 
     Methods:
         add_collaborator(collaborator, role):
@@ -20,7 +28,23 @@ class Project:
             Removes a collaborator from the project.
         remove_category(category):
             Removes a category from the project's category list.
+        add_task(task):
+            Adds a task to the project, assigning it an identifier if it has none.
+        set_tasks(tasks):
+            Replaces every task of the project.
+        get_task(task_id):
+            Returns the task with the given identifier.
+        remove_task(task_id):
+            Removes the task with the given identifier.
+        update_task(task_id, field, value):
+            Changes one field of a task and updates the indexes.
+        find_tasks(status, assignee, category, priority, deadline_start, deadline_end):
+            Returns the tasks matching every given filter, using the indexes.
+        deadline_range(start, end):
+            Returns the identifiers of the tasks whose deadline falls in [start, end).
     """
+
+    INDEXED_FIELDS = ("status", "assignee", "category", "priority")
     
     def __init__(self, name, owner):
         """
@@ -35,6 +59,10 @@ class Project:
         self.collaborators = {owner : Role.OWNER}
         self.tasks = []
         self.categories = ["None"]
+        self.next_task_id = 1
+        self.task_index = {}
+        self.field_indexes = {field: {} for field in Project.INDEXED_FIELDS}
+        self.deadline_index = []
     
     def add_collaborator(self, collaborator: str, role: Role):
         """
@@ -73,3 +101,162 @@ class Project:
             category (str): The name of the category to remove.
         """
         self.categories.remove(category)
+
+    def add_task(self, task):
+        """
+        Adds a task to the project. A task without an identifier is given the next one.
+
+        Args:
+            task (Task): The task to add.
+        """
+        if task.task_id is None:
+            task.task_id = self.next_task_id
+        self.next_task_id = max(self.next_task_id, task.task_id + 1)
+        self.task_index[task.task_id] = len(self.tasks)
+        self.tasks.append(task)
+        self._index_task(task)
+
+    def set_tasks(self, tasks: list):
+        """
+        Replaces every task of the project and rebuilds the task index.
+
+        Args:
+            tasks (list): The new list of tasks.
+        """
+        self.tasks = []
+        self.task_index = {}
+        self.field_indexes = {field: {} for field in Project.INDEXED_FIELDS}
+        self.deadline_index = []
+        for task in tasks:
+            self.add_task(task)
+
+    def get_task(self, task_id: int):
+        """
+        Returns the task with the given identifier.
+
+        Args:
+            task_id (int): The identifier of the task.
+
+        Returns:
+            Task: The task.
+
+        Raises:
+            KeyError: If the project has no task with this identifier.
+        """
+        return self.tasks[self.task_index[task_id]]
+
+    def remove_task(self, task_id: int):
+        """
+        Removes the task with the given identifier. The last task is moved into its
+        position, so removal does not shift the other tasks.
+
+        Args:
+            task_id (int): The identifier of the task.
+
+        Raises:
+            KeyError: If the project has no task with this identifier.
+        """
+        position = self.task_index.pop(task_id)
+        self._unindex_task(self.tasks[position])
+        last_task = self.tasks.pop()
+        if last_task.task_id != task_id:
+            self.tasks[position] = last_task
+            self.task_index[last_task.task_id] = position
+
+    def update_task(self, task_id: int, field: str, value):
+        """
+        Changes one field of a task, moving the task between index entries if the field is indexed.
+        The task is replaced by an updated copy, so task objects handed out earlier do not change.
+
+        Args:
+            task_id (int): The identifier of the task.
+            field (str): The name of the field to change.
+            value: The new value of the field.
+
+        Raises:
+            KeyError: If the project has no task with this identifier.
+        """
+        position = self.task_index[task_id]
+        task = copy.copy(self.tasks[position])
+        if field in self.field_indexes or field == "deadline":
+            self._unindex_task(task)
+            setattr(task, field, value)
+            self._index_task(task)
+        else:
+            setattr(task, field, value)
+        self.tasks[position] = task
+
+    def find_tasks(self, status=None, assignee=None, category=None, priority=None, deadline_start=None, deadline_end=None):
+        """
+        Returns the tasks matching every given filter. Filters left as None are ignored.
+        Only the index entries of the filters are read, so the cost depends on the number
+        of matching tasks rather than on the size of the project.
+
+        Args:
+            status (str, optional): The status of the tasks.
+            assignee (str, optional): The username of the assignee of the tasks.
+            category (str, optional): The category of the tasks.
+            priority (str, optional): The priority of the tasks.
+            deadline_start (str, optional): The earliest deadline, included (format: YYYY-MM-DD).
+            deadline_end (str, optional): The latest deadline, excluded (format: YYYY-MM-DD).
+
+        Returns:
+            list: The matching tasks, in task list order.
+        """
+        candidates = []
+        filters = {"status": status, "assignee": assignee, "category": category, "priority": priority}
+        for field, value in filters.items():
+            if value is not None:
+                candidates.append(self.field_indexes[field].get(Project._index_key(value), set()))
+        if deadline_start is not None or deadline_end is not None:
+            candidates.append(set(self.deadline_range(deadline_start, deadline_end)))
+
+        if not candidates:
+            return list(self.tasks)
+        candidates.sort(key=len)
+        task_ids = set(candidates[0]).intersection(*candidates[1:])
+        return [self.tasks[position] for position in sorted(self.task_index[task_id] for task_id in task_ids)]
+
+    def deadline_range(self, start=None, end=None):
+        """
+        Returns the identifiers of the tasks whose deadline falls in [start, end), in deadline order.
+
+        Args:
+            start (str, optional): The earliest deadline, included. Unbounded if None.
+            end (str, optional): The latest deadline, excluded. Unbounded if None.
+
+        Returns:
+            list: The task identifiers.
+        """
+        low = bisect_left(self.deadline_index, (start,)) if start is not None else 0
+        high = bisect_left(self.deadline_index, (end,)) if end is not None else len(self.deadline_index)
+        return [task_id for _, task_id in self.deadline_index[low:high]]
+
+    def _index_task(self, task):
+        """
+        Adds a task to the secondary indexes.
+        """
+        for field, index in self.field_indexes.items():
+            index.setdefault(Project._index_key(getattr(task, field)), set()).add(task.task_id)
+        insort(self.deadline_index, (Project._index_key(task.deadline), task.task_id))
+
+    def _unindex_task(self, task):
+        """
+        Removes a task from the secondary indexes.
+        """
+        for field, index in self.field_indexes.items():
+            key = Project._index_key(getattr(task, field))
+            index[key].discard(task.task_id)
+            if not index[key]:
+                del index[key]
+        entry = (Project._index_key(task.deadline), task.task_id)
+        position = bisect_left(self.deadline_index, entry)
+        del self.deadline_index[position]
+
+    @staticmethod
+    def _index_key(value):
+        """
+        Returns the key a field value is indexed under. Values are compared as strings, the
+        way they are stored, and a missing value is indexed as an empty string.
+        """
+        return "" if value is None else str(value)
@@ -10,9 +10,10 @@ class Task:
         category (str): The name of the category of the task.
         status (str): The current status of the task (TODO, DOING, DONE).
         assignee (str): The username of the user responsible for the task.
+        task_id (int): The stable, server-assigned identifier of the task within its project.
     """
 
-    def __init__(self, name, description, priority, deadline, category, status, assignee):
+    def __init__(self, name, description, priority, deadline, category, status, assignee, task_id=None):
         """
         Initializes a Task instance.
 
@@ -24,6 +25,7 @@ class Task:
             category (str): The category of the task.
             status (str): The current status of the task.
             assignee (str): The name of the person assigned to the task.
+            task_id (int, optional): The identifier of the task. Assigned by the project when omitted.
         """
         self.name = name
         self.description = description
@@ -32,6 +34,7 @@ class Task:
         self.category = category
         self.status = status
         self.assignee = assignee
+        self.task_id = task_id
 
     def to_dict(self):
         """
@@ -41,4 +44,4 @@ class Task:
             dict: A dictionary representation of the task.
         """
 
-        return {"name": self.name, "description": self.description, "priority": self.priority, "deadline": self.deadline, "category": self.category, "status": self.status, "assignee": self.assignee,}
+        return {"id": self.task_id, "name": self.name, "description": self.description, "priority": self.priority, "deadline": self.deadline, "category": self.category, "status": self.status, "assignee": self.assignee,}
@@ -1,23 +1,231 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
 
-from typing import List
+import hmac
+import os
+import time
+
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import List, Optional
 
 from libraries.task import Task
 from libraries.project import Project
+from libraries.user import Role
+from utilities.account_index import Account_Index
 from utilities.account_utilities import Account_Utilities
+from utilities.assignee_index import Assignee_Index
+from utilities.async_facade import Async_Facade
+from utilities.metrics import Metrics
+from utilities.operation_log import Operation_Log
+from utilities.project_cache import Project_Cache
 from utilities.project_utilities import Project_Utilities
+from utilities.request_capture import Request_Capture
+from utilities.server_secret import Server_Secret
+from utilities.session_tokens import Session_Tokens
+from utilities.storage_manager import Storage_Manager
+from utilities.store_compactor import Store_Compactor
+from utilities.worker_coordinator import Worker_Coordinator
+
+# IF HONEYDUE_SEED IS SET TO 1, THE DATABASE IS REPLACED WITH THE SAMPLE DATA SNAPSHOT ON START
+SEED_DATABASE = os.environ.get("HONEYDUE_SEED", "0") == "1"
+SEED_SNAPSHOT = os.environ.get("HONEYDUE_SEED_SNAPSHOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sample"))
+
+# THE OPERATIONAL ENDPOINTS LIVE UNDER A PREFIX NO USERNAME CAN TAKE, AND ARE ONLY SERVED WITH HONEYDUE_INTERNAL_TOKEN SET
+INTERNAL_PREFIX = "/" + Account_Utilities.RESERVED_PREFIX + "internal"
+INTERNAL_TOKEN = os.environ.get("HONEYDUE_INTERNAL_TOKEN", "")
+
+def seed_database():
+    """
+    Replace the account and project stores with the sample data snapshot, written by
+    tools/build_fixture.py.
+    """
+    Account_Utilities.load_snapshot(SEED_SNAPSHOT)
+    Project_Utilities.load_snapshot(SEED_SNAPSHOT)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Refuses to start without a secret key, seeds the database if HONEYDUE_SEED is set,
+    keeps the storage files open, the operation log compacting and the store files checked
+    for reclaimable space while the app is running, and starts the worker pools. The stores
+    are opened and the account and assignee indexes built on first use, so the app serves
+    as soon as the log is recovered. On shutdown the worker pools are drained and every
+    pending operation is folded into the project store before the files are flushed and
+    closed, and the request capture file, if any, is closed.
+    """
+    Server_Secret.start()
+    if SEED_DATABASE:
+        # With several workers, only the first one to start seeds the database
+        Worker_Coordinator.once("database_seed", seed_database)
+    Storage_Manager.start()
+    Operation_Log.start()
+    Async_Facade.start()
+    Store_Compactor.start()
+    yield
+    Store_Compactor.stop()
+    Async_Facade.stop()
+    Operation_Log.stop()
+    Storage_Manager.stop()
+    Request_Capture.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+async def capture_request(request: Request, call_next):
+    """
+    Middleware recording each request and a digest of its response with Request_Capture,
+    added only when HONEYDUE_CAPTURE_FILE is set.
+    """
+    if request.url.path in Request_Capture.SKIPPED_PATHS:
+        return await call_next(request)
+    started = time.time()
+    start = time.perf_counter()
+    body = await request.body()
+    response = await call_next(request)
+    response_body = b"".join([chunk async for chunk in response.body_iterator])
+    duration_ms = (time.perf_counter() - start) * 1000
+    route = getattr(request.scope.get("route"), "path", request.scope["path"])
+    Request_Capture.record(started, request.method, route, request.scope["path"], request.scope["query_string"].decode('latin-1'),
+                           body, response.status_code, duration_ms, response_body)
+
+    # The response is sent as it came, with every header, from the body already read
+    async def read_body():
+        yield response_body
+    response.body_iterator = read_body()
+    return response
+
+if Request_Capture.enabled():
+    app.middleware("http")(capture_request)
+
+def route_timing(app):
+    """
+    ASGI middleware recording the time of every request in the Metrics, by method, route
+    template and status. Unmatched paths share the route "unmatched", so the number of
+    series stays bounded. Added unless HONEYDUE_METRICS is 0.
+    """
+    async def timed_app(scope, receive, send):
+        if scope["type"] != "http":
+            return await app(scope, receive, send)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await app(scope, receive, send_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            Metrics.observe("honeydue_http_request_duration_seconds", time.perf_counter() - start,
+                            (("method", scope["method"]), ("route", route), ("status", str(status[0]))))
+    return timed_app
+
+if Metrics.ENABLED:
+    app.add_middleware(route_timing)
+
+def bearer_token(authorization: Optional[str]):
+    """
+    Return the token of a 'Bearer <token>' Authorization header, or an empty string.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else ""
+
+async def require_session(username: str, authorization: Optional[str] = Header(None)):
+    """
+    Dependency of every endpoint under /{username}: the request must carry a session token
+    issued to that user by /login.
+
+    Raises:
+        HTTPException: Returns a 401 status code if the token is missing, invalid, expired,
+                       revoked or issued to another user.
+    """
+    if not Session_Tokens.validate(bearer_token(authorization), username):
+        raise HTTPException(status_code=401, detail="Invalid or expired session", headers={"WWW-Authenticate": "Bearer"})
+
+def require_project_role(*roles: Role):
+    """
+    Return a dependency of the endpoints of a project: the user of the path must be a
+    member of the project, found in the membership table of the account store, with one of
+    the given roles if any are given. The project is taken from the path, or from the query
+    string for the endpoints outside /{username}/{project_name}. It must come after
+    require_session, which checks that the request is made by that user.
+
+    Args:
+        *roles (Role): The roles allowed to use the endpoint, or none to allow every member.
+
+    Returns:
+        callable: The dependency, which returns the role of the user in the project.
+    """
+    async def require_role(username: str, project_name: str):
+        """
+        Raises:
+            HTTPException: Returns a 404 status code if the user is not a member of the
+                           project, and a 403 status code if their role is not allowed.
+        """
+        try:
+            role = await Async_Facade.storage(Project_Utilities.get_user_role, project_name, username)
+        except (KeyError, ValueError):
+            raise HTTPException(status_code=404, detail="Project not found")
+        role = Role(getattr(role, "value", role))
+        if roles and role not in roles:
+            raise HTTPException(status_code=403, detail=f"The {role.value} role is not allowed to do this")
+        return role
+    return require_role
+
+# EVERY MEMBER CAN READ A PROJECT, GUESTS CANNOT CHANGE IT, AND ONLY OWNERS MANAGE ITS COLLABORATORS OR DELETE IT
+require_member = require_project_role()
+require_editor = require_project_role(Role.OWNER, Role.MEMBER)
+require_owner = require_project_role(Role.OWNER)
+COLLABORATOR_OPERATIONS = ("add_collaborator", "update_role", "remove_collaborator")
+
+async def require_internal(authorization: Optional[str] = Header(None)):
+    """
+    Dependency of the endpoints under INTERNAL_PREFIX: the request must carry the token of
+    HONEYDUE_INTERNAL_TOKEN.
+
+    Raises:
+        HTTPException: Returns a 404 status code if HONEYDUE_INTERNAL_TOKEN is not set, and a
+                       401 status code if the token is missing or wrong.
+    """
+    if not INTERNAL_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(bearer_token(authorization).encode('utf-8'), INTERNAL_TOKEN.encode('utf-8')):
+        raise HTTPException(status_code=401, detail="Invalid internal token", headers={"WWW-Authenticate": "Bearer"})
 
-app = FastAPI()
+@app.get(INTERNAL_PREFIX + "/stats", response_model=dict, dependencies=[Depends(require_internal)])
+async def get_stats():
+    """
+    Endpoint exposing internal counters used to size and tune the backend.
 
-# IF SET TO TRUE, THE FOLLOWING FLAG WILL RESET THE DATABASE 
-database_reset = True
-if database_reset:
-    Account_Utilities.reset()
-    Project_Utilities.reset()
+    Returns:
+        dict: The counters of each instrumented component, keyed by component name.
+    """
+    return {"project_cache": Project_Cache.stats(), "account_index": Account_Index.stats(), "password_index": Account_Utilities.stats(), "assignee_index": Assignee_Index.stats(), "executors": Async_Facade.stats(), "sessions": Session_Tokens.stats(), "store_compactor": Store_Compactor.stats(), "request_capture": Request_Capture.stats()}
+
+@app.get(INTERNAL_PREFIX + "/metrics", dependencies=[Depends(require_internal)])
+async def get_metrics():
+    """
+    Endpoint exposing the Metrics of this worker in the Prometheus text format, with the
+    size of each store file measured at the time of the scrape.
+
+    Returns:
+        Response: The metrics as text/plain; version=0.0.4.
+
+    Raises:
+        HTTPException: Returns a 404 status code if HONEYDUE_METRICS is 0.
+    """
+    if not Metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    for store in Storage_Manager.STORES:
+        path = Storage_Manager.path(store)
+        if os.path.exists(path):
+            Metrics.set("honeydue_store_file_bytes", os.path.getsize(path), (("store", store),))
+    return Response(content=Metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Post to signup a user 
 @app.post("/signup")
-def signup(username: str, password: str):
+async def signup(username: str, password: str):
     """
     Endpoint for user signup.
 
@@ -33,7 +241,7 @@ def signup(username: str, password: str):
                        with the error message in the detail field.
     """
     try:
-        Account_Utilities.add_user(username, password)
+        await Async_Facade.signup(username, password)
         return {"message": "User created successfully"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"{e}")
@@ -48,17 +256,31 @@ async def login(username: str, password: str):
         password (str): The password of the user attempting to log in.
 
     Returns:
-        dict: A success message if the username exists and the password is valid.
+        dict: A success message, the session token to send as 'Authorization: Bearer <token>'
+              with every request under /{username}, and its expiry as a Unix timestamp, if
+              the username exists and the password is valid.
 
     Raises:
         HTTPException: Returns a 400 status code with a message indicating 
                        invalid credentials if the login attempt fails.
     """
-    if Account_Utilities.account_exists(username, password):
-        return {"message": "Login successful"}
+    if await Async_Facade.login(username, password):
+        token, expires = Session_Tokens.issue(username)
+        return {"message": "Login successful", "token": token, "expires": expires}
     raise HTTPException(status_code=400, detail="Invalid username or password")
 
-@app.post("/{username}", response_model=dict)
+@app.post("/{username}/logout", response_model=dict, dependencies=[Depends(require_session)])
+async def logout(authorization: Optional[str] = Header(None)):
+    """
+    Endpoint to end the session of the token sent with the request.
+
+    Returns:
+        dict: A success message indicating the session was ended.
+    """
+    Session_Tokens.revoke(bearer_token(authorization))
+    return {"message": "Logout successful"}
+
+@app.post("/{username}", response_model=dict, dependencies=[Depends(require_session)])
 async def add_project(username: str, project_name: str):
     """
     Endpoint to add a new project for a specified user.
@@ -72,17 +294,23 @@ async def add_project(username: str, project_name: str):
 
     Raises:
         HTTPException: Returns a 400 status code with a message if the project name 
-                       already exists.
+                       already exists, or the project cannot be added to the user.
     """
-    if Project_Utilities.project_exists(project_name):
+    # The project is created first, under the operation log lock that checks its name, so
+    # of two concurrent creates only one gets to add the project to its user
+    project = Project(project_name, username)
+    try:
+        await Async_Facade.storage(Project_Utilities.add_project, project)
+    except ValueError:
         raise HTTPException(status_code=400, detail="Project name already exists")
-    else:
-        project = Project(project_name, username)
-        Account_Utilities.add_project(project_name, username)
-        Project_Utilities.add_project(project)
-        return {"message": "Project added successfully."}
+    try:
+        await Async_Facade.storage(Account_Utilities.add_project, project_name, username)
+    except ValueError as e:
+        await Async_Facade.storage(Project_Utilities.delete_project, project_name)
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Project added successfully."}
 
-@app.get("/{username}", response_model = List[str])
+@app.get("/{username}", response_model = List[str], dependencies=[Depends(require_session)])
 async def get_projects(username: str):
     """
     Endpoint to retrieve the list of projects associated with a specified user.
@@ -93,13 +321,41 @@ async def get_projects(username: str):
     Returns:
         List[str]: A list of project names associated with the given username.
     """
-    project_list = Account_Utilities.get_project_list(username)
+    project_list = await Async_Facade.storage(Account_Utilities.get_project_list, username)
     return project_list
 
-@app.post("/{username}/delete_project")
+@app.get("/{username}/tasks", response_model=dict, dependencies=[Depends(require_session)])
+async def get_assigned_tasks(username: str, sort_by: str = "deadline", order: str = "asc", offset: int = 0, limit: Optional[int] = None):
+    """
+    Endpoint to retrieve the tasks assigned to a user across all of their projects.
+
+    Args:
+        username (str): The username of the assignee.
+        sort_by (str): The field to sort the tasks by (deadline or priority).
+        order (str): The sort order (asc or desc).
+        offset (int): The number of sorted tasks to skip.
+        limit (int, optional): The maximum number of tasks to return.
+
+    Returns:
+        dict: The total number of tasks assigned to the user, and the requested page of tasks.
+              Each task dictionary also holds the name of its project.
+
+    Raises:
+        HTTPException: Returns a 400 status code if the sort field, order or page is invalid.
+    """
+    if order not in ("asc", "desc") or offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="Invalid sort order or page")
+    try:
+        total, page = await Async_Facade.storage(Project_Utilities.get_assigned_tasks, username, sort_by, order == "desc", offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}")
+    return {"total": total, "tasks": [{"project": project_name, **task.to_dict()} for project_name, task in page]}
+
+@app.post("/{username}/delete_project", dependencies=[Depends(require_session), Depends(require_owner)])
 async def delete_project(project_name: str):
     """
-    Endpoint to delete a project. 
+    Endpoint to delete a project. The project is removed from the project list of every
+    member in one write, with the members found in the reverse index of the account store.
 
     Args:
         project_name (str): The name of the project to be deleted.
@@ -111,23 +367,20 @@ async def delete_project(project_name: str):
         HTTPException: Occurs if the project does not exist or if an error occurs during deletion 
     """
     try:
-        collaborator_list = Project_Utilities.get_collaborators(project_name)
-        if Project_Utilities.project_exists(project_name):
-            Project_Utilities.delete_project(project_name)
-
-            for user in collaborator_list.keys():
-                Account_Utilities.delete_project(project_name, user)
-            return {"message": "Project removed successfully"}
+        await Async_Facade.storage(Project_Utilities.delete_project, project_name)
+        await Async_Facade.storage(Account_Utilities.remove_project_members, project_name)
+        return {"message": "Project removed successfully"}
     except:
         raise HTTPException(status_code=400, detail="An error occured while deleting the project.")
 
 # Post to "{username}/{project_name}/task API endpoint"
-@app.post("/{username}/{project_name}/task", response_model=dict)
-async def add_task(request: Request):
+@app.post("/{username}/{project_name}/task", response_model=dict, dependencies=[Depends(require_session), Depends(require_editor)])
+async def add_task(project_name: str, request: Request):
     """
     Endpoint to add a new task to a specified project.
 
     Args:
+        project_name (str): The name of the project to which the task is being added.
         request (Request): The HTTP request object containing the task details in JSON format.
 
     Request Body:
@@ -139,10 +392,10 @@ async def add_task(request: Request):
         - category (str): Category or type of task.
         - status (str): Current status of the task (TODO, DOING, DONE).
         - assignee (str): Name of the person assigned to the task.
-        - project_name (str): Name of the project to which the task is being added.
+        A project_name key is ignored; the task is added to the project of the path.
 
     Returns:
-        dict: A dictionary containing a success message.
+        dict: A dictionary containing a success message and the identifier of the new task.
     """
     task_info = await request.json()
     new_task = Task(
@@ -154,19 +407,28 @@ async def add_task(request: Request):
         status=task_info.get("status"),
         assignee=task_info.get("assignee")
     )
-    Project_Utilities.add_task(new_task, task_info.get("project_name"))
-    return {"message": "Task added successfully."}
+    task_id = await Async_Facade.storage(Project_Utilities.add_task, new_task, project_name)
+    return {"message": "Task added successfully.", "id": task_id}
 
-@app.get("/{username}/{project_name}/task", response_model=List[dict])
-async def get_tasks(project_name: str):
+@app.get("/{username}/{project_name}/task", response_model=List[dict], dependencies=[Depends(require_session), Depends(require_member)])
+async def get_tasks(project_name: str, status: Optional[str] = None, assignee: Optional[str] = None, category: Optional[str] = None,
+                    priority: Optional[str] = None, deadline_start: Optional[str] = None, deadline_end: Optional[str] = None):
     """
-    Endpoint to retrieve the list of tasks for a specified project.
+    Endpoint to retrieve the list of tasks for a specified project. The optional filters are
+    served from the project's secondary indexes; only tasks matching every given filter are returned.
 
     Args:
         project_name (str): The name of the project for which tasks are to be retrieved.
+        status (str, optional): Only return tasks with this status (TODO, DOING, DONE).
+        assignee (str, optional): Only return tasks assigned to this user.
+        category (str, optional): Only return tasks in this category.
+        priority (str, optional): Only return tasks with this priority (1-5).
+        deadline_start (str, optional): Only return tasks due on or after this date (format: YYYY-MM-DD).
+        deadline_end (str, optional): Only return tasks due before this date (format: YYYY-MM-DD).
 
     Returns:
         List[dict]: A list of dictionaries, where each dictionary represents a task and contains task details such as:
+        - id (int): The stable identifier of the task within the project.
         - name (str): Task name.
         - description (str): Task description.
         - priority (str): Priority level of the task (1-5).
@@ -178,11 +440,35 @@ async def get_tasks(project_name: str):
     Raises:
         HTTPException: Could be added for cases where the project does not exist.
     """
-    task_list = Project_Utilities.get_task_list(project_name)
+    task_list = await Async_Facade.storage(Project_Utilities.find_tasks, project_name, status, assignee, category, priority, deadline_start, deadline_end)
     task_dicts = [task.to_dict() for task in task_list]
     return task_dicts
 
-@app.post("/{username}/{project_name}/category", response_model=dict)
+@app.get("/{username}/{project_name}/calendar", response_model=List[dict], dependencies=[Depends(require_session), Depends(require_member)])
+async def get_tasks_due(project_name: str, start: str, end: str):
+    """
+    Endpoint to retrieve the tasks of a project due in a date range, such as the month shown by the calendar.
+
+    Args:
+        project_name (str): The name of the project.
+        start (str): The first day of the range, included (format: YYYY-MM-DD).
+        end (str): The day after the range, excluded (format: YYYY-MM-DD).
+
+    Returns:
+        List[dict]: The tasks whose deadline falls in [start, end), in deadline order.
+
+    Raises:
+        HTTPException: Returns a 400 status code if a date is invalid or the range is empty.
+    """
+    try:
+        if date.fromisoformat(start) >= date.fromisoformat(end):
+            raise HTTPException(status_code=400, detail="The start of the range must be before its end")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must use the format YYYY-MM-DD")
+    task_list = await Async_Facade.storage(Project_Utilities.get_tasks_due, project_name, start, end)
+    return [task.to_dict() for task in task_list]
+
+@app.post("/{username}/{project_name}/category", response_model=dict, dependencies=[Depends(require_session), Depends(require_editor)])
 async def add_category(project_name: str, category_name: str):
     """
     Endpoint to add a new category to a specific project.
@@ -197,13 +483,13 @@ async def add_category(project_name: str, category_name: str):
     Raises:
         HTTPException (status_code=400): If the category already exists for the specified project.
     """
-    if Project_Utilities.category_exists(category_name, project_name):
+    if await Async_Facade.storage(Project_Utilities.category_exists, category_name, project_name):
         raise HTTPException(status_code=400, detail="Category already exists")
     else:
-        Project_Utilities.add_category(category_name, project_name)
+        await Async_Facade.storage(Project_Utilities.add_category, category_name, project_name)
         return {"message": "Category added successfully."}
 
-@app.get("/{username}/{project_name}/category", response_model=list)
+@app.get("/{username}/{project_name}/category", response_model=list, dependencies=[Depends(require_session), Depends(require_member)])
 async def get_categories(project_name: str):
     """
     Endpoint to retrieve a list of categories for a specific project.
@@ -214,27 +500,93 @@ async def get_categories(project_name: str):
     Returns:
         list: A list of category names associated with the given project.
     """
-    category_list = Project_Utilities.get_category_list(project_name)
+    category_list = await Async_Facade.storage(Project_Utilities.get_category_list, project_name)
     return category_list
 
-@app.post("/{username}/{project_name}/task_updates", response_model=dict)
-async def update_tasks(request: Request):
+@app.post("/{username}/{project_name}/task_updates", response_model=dict, dependencies=[Depends(require_session), Depends(require_editor)])
+async def update_tasks(project_name: str, request: Request):
     """
     Endpoint to update the task list for a specific project.
 
     Args:
-        request (Request): The HTTP request containing the JSON body with updated tasks.
+        project_name (str): The name of the project whose task list is updated.
+        request (Request): The HTTP request containing the JSON body with updated tasks. A
+                           project_name key is ignored; the project of the path is updated.
 
     Returns:
         dict: A success message indicating the task list was updated.
     """
     body = await request.json()
-    project_name = body['project_name']
     updated_tasks = body['updated_tasks']
-    Project_Utilities.update_task_list(project_name, updated_tasks)
+    await Async_Facade.storage(Project_Utilities.update_task_list, project_name, updated_tasks)
     return {"message": "Tasks updated successfully."}
 
-@app.post("/{username}/{project_name}/remove_category", response_model=dict)
+@app.patch("/{username}/{project_name}/task", response_model=dict, dependencies=[Depends(require_session), Depends(require_editor)])
+async def patch_tasks(project_name: str, request: Request):
+    """
+    Endpoint to apply a patch to the task list of a project. Only the changed tasks are sent,
+    instead of the full task list.
+
+    Args:
+        project_name (str): The name of the project whose tasks are being patched.
+        request (Request): The HTTP request containing the JSON body with the patch.
+
+    Request Body:
+        JSON object with the following optional keys:
+        - updates (list[dict]): The "id" of each changed task and the fields that changed.
+        - inserts (list[dict]): The fields of each new task.
+        - deletes (list[int]): The ids of the tasks to delete.
+
+    Returns:
+        dict: A success message and the ids given to the inserted tasks.
+
+    Raises:
+        HTTPException: Returns a 400 status code if the project or a task does not exist or a
+                       field is invalid, in which case nothing is applied.
+    """
+    body = await request.json()
+    try:
+        inserted = await Async_Facade.storage(Project_Utilities.patch_tasks, project_name, body.get("updates", []), body.get("inserts", []), body.get("deletes", []))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}")
+    return {"message": "Tasks updated successfully.", "inserted": inserted}
+
+@app.post("/{username}/{project_name}/batch", response_model=dict, dependencies=[Depends(require_session)])
+async def apply_batch(project_name: str, request: Request, role: Role = Depends(require_editor)):
+    """
+    Endpoint to apply many operations to a project in one all-or-nothing write.
+
+    Args:
+        project_name (str): The name of the project the operations apply to.
+        request (Request): The HTTP request containing the JSON body with the operations.
+        role (Role): The role of the user in the project. Only owners can change collaborators.
+
+    Request Body:
+        JSON object with the following key:
+        - operations (list[dict]): The operations to apply in order. Each one has an "op" key
+          (add_task, update_task, delete_task, add_category, remove_category, add_collaborator,
+          update_role, remove_collaborator or update_task_list) and the fields of that operation.
+
+    Returns:
+        dict: A success message and the number of operations applied.
+
+    Raises:
+        HTTPException: Returns a 400 status code if the project does not exist or an operation
+                       is invalid, and a 403 status code if an operation changes the
+                       collaborators of a project the user does not own. In either case no
+                       operation is applied.
+    """
+    body = await request.json()
+    operations = body.get("operations", [])
+    if role != Role.OWNER and any(isinstance(operation, dict) and operation.get("op") in COLLABORATOR_OPERATIONS for operation in operations):
+        raise HTTPException(status_code=403, detail=f"The {role.value} role is not allowed to change collaborators")
+    try:
+        applied = await Async_Facade.storage(Project_Utilities.apply_batch, project_name, operations)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}")
+    return {"message": "Batch applied successfully.", "applied": applied}
+
+@app.post("/{username}/{project_name}/remove_category", response_model=dict, dependencies=[Depends(require_session), Depends(require_editor)])
 async def remove_category(project_name: str, category: str):
     """
     Endpoint to remove a specific category from a project.
@@ -246,11 +598,11 @@ async def remove_category(project_name: str, category: str):
     Returns:
         dict: A success message indicating the category was removed.
     """
-    Project_Utilities.remove_category(project_name, category)
+    await Async_Facade.storage(Project_Utilities.remove_category, project_name, category)
     return {"message": "Category removed successfully."}
 
 
-@app.post("/{username}/{project_name}/collaborators", response_model=dict)
+@app.post("/{username}/{project_name}/collaborators", response_model=dict, dependencies=[Depends(require_session), Depends(require_owner)])
 async def add_collaborator(collaborator_name: str, role: str, project_name: str):
     """
     Endpoint to add a collaborator to a project with a specific role.
@@ -266,16 +618,16 @@ async def add_collaborator(collaborator_name: str, role: str, project_name: str)
     Raises:
         HTTPException: If the collaborator does not exist or is already part of the project.
     """
-    if Account_Utilities.username_exists(collaborator_name):
-        if not Account_Utilities.user_has_project(collaborator_name, project_name):
-            Project_Utilities.add_collaborator(collaborator_name, role, project_name)
+    if await Async_Facade.storage(Account_Utilities.username_exists, collaborator_name):
+        if not await Async_Facade.storage(Account_Utilities.user_has_project, collaborator_name, project_name):
+            await Async_Facade.storage(Project_Utilities.add_collaborator, collaborator_name, role, project_name)
             return {"message": "User added successfully."}
         else:
             raise HTTPException(status_code=400, detail=f"{collaborator_name} is already a collaborator")
     else:
         raise HTTPException(status_code=400, detail=f"{collaborator_name} does not exist")
 
-@app.get("/{username}/{project_name}/collaborators", response_model = dict)
+@app.get("/{username}/{project_name}/collaborators", response_model = dict, dependencies=[Depends(require_session), Depends(require_member)])
 async def get_collaborators(project_name: str):
     """
     Endpoint to retrieve a dictionary of collaborators for a project.
@@ -286,10 +638,10 @@ async def get_collaborators(project_name: str):
     Returns:
         dict: A dictionary containing collaborator names and their roles for the specified project.
     """
-    collaborator_dict = Project_Utilities.get_collaborators(project_name)
+    collaborator_dict = await Async_Facade.storage(Project_Utilities.get_collaborators, project_name)
     return collaborator_dict
 
-@app.post("/{username}/{project_name}/role", response_model=dict)
+@app.post("/{username}/{project_name}/role", response_model=dict, dependencies=[Depends(require_session), Depends(require_owner)])
 async def update_user_role(project_name: str, collaborator: str, new_role: str):
     """
     Endpoint to update a collaborator's role in a project.
@@ -302,10 +654,10 @@ async def update_user_role(project_name: str, collaborator: str, new_role: str):
     Returns:
         dict: A success message indicating the role update.
     """
-    Project_Utilities.update_user_role(project_name, collaborator, new_role)
+    await Async_Facade.storage(Project_Utilities.update_user_role, project_name, collaborator, new_role)
     return {"message": "User role updated successfully."}
 
-@app.get("/{username}/{project_name}/role", response_model=str)
+@app.get("/{username}/{project_name}/role", response_model=str, dependencies=[Depends(require_session), Depends(require_member)])
 async def get_user_role(project_name: str, username: str):
     """
     Endpoint to retrieve the role of a specific user in a project.
@@ -317,10 +669,10 @@ async def get_user_role(project_name: str, username: str):
     Returns:
         str: The role of the specified user in the project.
     """
-    role = Project_Utilities.get_user_role(project_name, username)
+    role = await Async_Facade.storage(Project_Utilities.get_user_role, project_name, username)
     return role
 
-@app.post("/{username}/{project_name}/remove_collaborator")
+@app.post("/{username}/{project_name}/remove_collaborator", dependencies=[Depends(require_session), Depends(require_owner)])
 async def remove_collaborator(project_name: str, collaborator: str):
     """
     Endpoint to remove a collaborator from a project.
@@ -332,5 +684,5 @@ async def remove_collaborator(project_name: str, collaborator: str):
     Returns:
         dict: A success message indicating the collaborator was removed.
     """
-    Project_Utilities.remove_collaborator(project_name, collaborator)
+    await Async_Facade.storage(Project_Utilities.remove_collaborator, project_name, collaborator)
     return {"message": "User role updated successfully."}
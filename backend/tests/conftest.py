@@ -0,0 +1,50 @@
+import os
+
+# The server refuses to start without a secret key, and the fingerprints and tokens need one
+os.environ.setdefault("HONEYDUE_SECRET_KEY", "test secret key")
+
+import pytest
+
+from utilities.account_index import Account_Index
+from utilities.account_utilities import Account_Utilities
+from utilities.assignee_index import Assignee_Index
+from utilities.operation_log import Operation_Log
+from utilities.project_cache import Project_Cache
+from utilities.project_utilities import Project_Utilities
+from utilities.session_tokens import Session_Tokens
+from utilities.storage_manager import Storage_Manager
+
+def use_database(database_dir: str, shards: int = 1):
+    """
+    Close the stores and the logs, drop every cache, and point the storage at a directory,
+    as a restarted server would find it.
+    """
+    Operation_Log.stop()
+    Storage_Manager.stop()
+    Storage_Manager.DATABASE_DIR = database_dir
+    Storage_Manager.set_project_shards(shards)
+    Project_Cache.clear()
+    Assignee_Index.clear()
+    Account_Index.clear()
+    Account_Utilities._fingerprints = None
+
+@pytest.fixture
+def empty_database(tmp_path):
+    """
+    An empty database in a temporary directory.
+    """
+    previous_dir, previous_shards = Storage_Manager.DATABASE_DIR, Storage_Manager.PROJECT_SHARDS
+    use_database(str(tmp_path))
+    yield str(tmp_path)
+    use_database(previous_dir, previous_shards)
+
+@pytest.fixture
+def sample_database(empty_database):
+    """
+    A database holding the sample users and projects: user1 owns Project1, where user2 and
+    user3 are Members and user4 a Guest.
+    """
+    Account_Utilities.reset()
+    Project_Utilities.reset()
+    Session_Tokens.clear()
+    return empty_database
@@ -0,0 +1,125 @@
+import pytest
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+@pytest.fixture
+def client(sample_database):
+    with TestClient(app) as client:
+        yield client
+
+def log_in(client: TestClient, username: str, password: str = None):
+    """
+    Log a sample user in, returning the headers that carry their session token.
+    """
+    response = client.post("/login", params={"username": username, "password": password or f"password{username[len('user'):]}"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+def task_names(client: TestClient, headers: dict, username: str = "user1"):
+    response = client.get(f"/{username}/Project1/task", headers=headers)
+    assert response.status_code == 200, response.text
+    return {task["id"]: task["name"] for task in response.json()}
+
+def test_session_lifecycle(client):
+    assert client.post("/login", params={"username": "user1", "password": "wrong"}).status_code == 400
+    assert client.get("/user1").status_code == 401
+
+    headers = log_in(client, "user1")
+    response = client.get("/user1", headers=headers)
+    assert response.status_code == 200
+    assert "Project1" in response.json()
+    # A token only opens the paths of its own user
+    assert client.get("/user2", headers=headers).status_code == 401
+
+    assert client.post("/user1/logout", headers=headers).status_code == 200
+    assert client.get("/user1", headers=headers).status_code == 401
+
+def test_signup_refuses_a_used_password(client):
+    assert client.post("/signup", params={"username": "user5", "password": "a new password"}).status_code == 200
+    response = client.post("/signup", params={"username": "user6", "password": "a new password"})
+    assert response.status_code == 400
+    log_in(client, "user5", "a new password")
+
+def test_patch_task(client):
+    headers = log_in(client, "user2")
+    response = client.patch("/user2/Project1/task", headers=headers, json={
+        "updates": [{"id": 1, "status": "DONE"}],
+        "inserts": [{"name": "Inserted", "description": "", "priority": 3, "deadline": "2025-02-01", "category": "None", "status": "TODO", "assignee": "user2"}],
+        "deletes": [2],
+    })
+    assert response.status_code == 200, response.text
+    inserted = response.json()["inserted"]
+
+    tasks = {task["id"]: task for task in client.get("/user2/Project1/task", headers=headers).json()}
+    assert tasks[1]["status"] == "DONE"
+    assert 2 not in tasks
+    assert [tasks[task_id]["name"] for task_id in inserted] == ["Inserted"]
+
+def test_patch_task_is_all_or_nothing(client):
+    headers = log_in(client, "user2")
+    before = client.get("/user2/Project1/task", headers=headers).json()
+    response = client.patch("/user2/Project1/task", headers=headers, json={"updates": [{"id": 1, "status": "DONE"}], "deletes": [999]})
+    assert response.status_code == 400
+    assert client.get("/user2/Project1/task", headers=headers).json() == before
+
+def test_batch(client):
+    headers = log_in(client, "user1")
+    response = client.post("/user1/Project1/batch", headers=headers, json={"operations": [
+        {"op": "add_category", "category_name": "Batched"},
+        {"op": "add_task", "task": {"name": "Batched task", "description": "", "priority": 1, "deadline": "2025-03-01",
+                                    "category": "Batched", "status": "TODO", "assignee": "user1"}},
+        {"op": "update_task", "task_id": 3, "fields": {"priority": 5}},
+    ]})
+    assert response.status_code == 200, response.text
+    assert response.json()["applied"] == 3
+    assert "Batched" in client.get("/user1/Project1/category", headers=headers).json()
+    assert "Batched task" in task_names(client, headers).values()
+
+def test_batch_is_all_or_nothing(client):
+    headers = log_in(client, "user1")
+    before = task_names(client, headers)
+    response = client.post("/user1/Project1/batch", headers=headers, json={"operations": [
+        {"op": "add_category", "category_name": "Never added"},
+        {"op": "delete_task", "task_id": 999},
+    ]})
+    assert response.status_code == 400
+    assert "Operation 1" in response.json()["detail"]
+    assert "Never added" not in client.get("/user1/Project1/category", headers=headers).json()
+    assert task_names(client, headers) == before
+
+def test_batch_collaborator_operations_need_an_owner(client):
+    headers = log_in(client, "user2")
+    response = client.post("/user2/Project1/batch", headers=headers, json={"operations": [{"op": "remove_collaborator", "collaborator": "user3"}]})
+    assert response.status_code == 403
+    assert "user3" in client.get("/user2/Project1/collaborators", headers=headers).json()
+
+def test_project_roles(client):
+    guest = log_in(client, "user4")
+    assert client.get("/user4/Project1/task", headers=guest).status_code == 200
+    assert client.patch("/user4/Project1/task", headers=guest, json={"updates": [{"id": 1, "status": "DONE"}]}).status_code == 403
+    assert client.post("/user4/Project1/category", headers=guest, params={"category_name": "Guest"}).status_code == 403
+
+    member = log_in(client, "user2")
+    assert client.post("/user2/delete_project", headers=member, params={"project_name": "Project1"}).status_code == 403
+
+    client.post("/signup", params={"username": "user5", "password": "outsider password"})
+    outsider = log_in(client, "user5", "outsider password")
+    assert client.get("/user5/Project1/task", headers=outsider).status_code == 404
+
+def test_calendar(client):
+    headers = log_in(client, "user1")
+    response = client.get("/user1/Project1/calendar", headers=headers, params={"start": "2024-12-01", "end": "2025-01-01"})
+    assert response.status_code == 200, response.text
+    deadlines = [task["deadline"] for task in response.json()]
+    assert deadlines == sorted(deadlines)
+    assert deadlines and all("2024-12-01" <= deadline < "2025-01-01" for deadline in deadlines)
+    every_task = client.get("/user1/Project1/task", headers=headers).json()
+    assert len(deadlines) == sum("2024-12-01" <= task["deadline"] < "2025-01-01" for task in every_task)
+
+@pytest.mark.parametrize("start, end", [("2025-01-01", "2025-01-01"), ("2025-02-01", "2025-01-01"), ("January", "2025-01-01")])
+def test_calendar_refuses_invalid_ranges(client, start, end):
+    headers = log_in(client, "user1")
+    response = client.get("/user1/Project1/calendar", headers=headers, params={"start": start, "end": end})
+    assert response.status_code == 400
@@ -0,0 +1,176 @@
+import os
+import pickle
+import zlib
+
+import pytest
+
+from conftest import use_database
+from libraries.project import Project
+from libraries.task import Task
+from utilities.account_index import Account_Index
+from utilities.assignee_index import Assignee_Index
+from utilities.operation_log import Operation_Log
+from utilities.project_cache import Project_Cache
+from utilities.project_operations import Project_Operations
+from utilities.project_store import Project_Store
+from utilities.project_utilities import Project_Utilities
+from utilities.storage_manager import Storage_Manager
+
+def crash():
+    """
+    Drop the state of the process without folding the logs, as a crash would: the next
+    process finds the logs with every acknowledged record and the stores as last flushed.
+    """
+    for store in list(Operation_Log._files):
+        Operation_Log._files.pop(store).close()
+    Operation_Log._records.clear()
+    Storage_Manager.stop()
+    Project_Cache.clear()
+    Assignee_Index.clear()
+    Account_Index.clear()
+
+def add_project(project_name: str, task_count: int):
+    Project_Utilities.add_project(Project(project_name, "owner"))
+    for index in range(task_count):
+        Project_Utilities.add_task(Task(f"Task {index}", "", index % 5 + 1, "2025-01-01", "None", "TODO", "owner"), project_name)
+
+def task_names(project_name: str):
+    return [task.name for task in Project_Utilities.get_task_list(project_name)]
+
+def stored_projects(store: str = "project"):
+    with Storage_Manager.read(store) as project_data:
+        return set(project_data.keys()), Operation_Log.checkpoint(project_data)
+
+def log_size(store: str = "project"):
+    return os.path.getsize(Operation_Log.path(store))
+
+def project_in(store: str, shards: int):
+    return next(f"Project {index}" for index in range(1000) if Storage_Manager.project_store(f"Project {index}", shards) == store)
+
+def test_writes_are_replayed_after_a_crash(empty_database):
+    add_project("Replayed", 3)
+    Project_Utilities.add_category("Category", "Replayed")
+    crash()
+
+    # Nothing was folded, so the project only exists in the log
+    assert stored_projects() == (set(), 0)
+    assert task_names("Replayed") == ["Task 0", "Task 1", "Task 2"]
+    assert Project_Utilities.get_category_list("Replayed") == ["None", "Category"]
+    assert len(Operation_Log.records()) == 5
+
+def test_torn_record_is_discarded(empty_database):
+    add_project("Torn", 2)
+    crash()
+    valid_size = log_size()
+    frame = Operation_Log._frame(99, [Project_Operations.add_task("Torn", Task("Lost", "", 1, "2025-01-01", "None", "TODO", "owner"))])
+    with open(Operation_Log.path("project"), "ab") as log_file:
+        log_file.write(frame[:-3])
+
+    assert task_names("Torn") == ["Task 0", "Task 1"]
+    assert log_size() == valid_size
+    Project_Utilities.add_task(Task("After", "", 1, "2025-01-01", "None", "TODO", "owner"), "Torn")
+    crash()
+    assert task_names("Torn") == ["Task 0", "Task 1", "After"]
+
+def test_corrupted_record_ends_the_log(empty_database):
+    add_project("Corrupted", 3)
+    crash()
+    with open(Operation_Log.path("project"), "rb") as log_file:
+        data = bytearray(log_file.read())
+    # Flip a byte in the payload of the last record, whose checksum no longer matches
+    data[-1] ^= 0xFF
+    with open(Operation_Log.path("project"), "wb") as log_file:
+        log_file.write(data)
+
+    assert task_names("Corrupted") == ["Task 0", "Task 1"]
+
+def test_pickled_records_are_refused(empty_database):
+    add_project("Pickled", 1)
+    crash()
+    valid_size = log_size()
+    payload = pickle.dumps([Project_Operations.add_category("Pickled", "Injected")])
+    with open(Operation_Log.path("project"), "ab") as log_file:
+        log_file.write(Operation_Log._HEADER.pack(3, len(payload), zlib.crc32(payload)) + payload)
+
+    with pytest.raises(RuntimeError):
+        Project_Utilities.get_category_list("Pickled")
+    crash()
+    os.truncate(Operation_Log.path("project"), valid_size)
+
+def test_compaction_folds_records_into_the_store(empty_database):
+    add_project("Compacted", 4)
+    Project_Utilities.patch_tasks("Compacted", [{"id": 2, "status": "DONE"}], [], [1])
+
+    assert Operation_Log.compact() == 6
+    assert Operation_Log.records() == []
+    assert log_size() == 0
+    assert stored_projects() == ({"Compacted"}, 6)
+    with Storage_Manager.read("project") as project_data:
+        stored = Project_Store.read_project(project_data, "Compacted")
+    assert sorted(task.name for task in stored.tasks) == ["Task 1", "Task 2", "Task 3"]
+    assert stored.get_task(2).status == "DONE"
+
+    crash()
+    assert sorted(task_names("Compacted")) == ["Task 1", "Task 2", "Task 3"]
+    # Sequence numbers carry on after the checkpoint
+    Project_Utilities.add_task(Task("Later", "", 1, "2025-01-01", "None", "TODO", "owner"), "Compacted")
+    assert [seq for seq, _ in Operation_Log.records()] == [7]
+
+def test_records_below_the_checkpoint_are_not_applied_twice(empty_database):
+    add_project("Folded", 3)
+    # A crash between the fold into the store and the rewrite of the log
+    Operation_Log._fold("project", Operation_Log.records())
+    crash()
+
+    assert stored_projects() == ({"Folded"}, 4)
+    assert Operation_Log.records() == []
+    assert task_names("Folded") == ["Task 0", "Task 1", "Task 2"]
+
+def test_compaction_after_deleting_a_project(empty_database):
+    add_project("Deleted", 2)
+    add_project("Kept", 1)
+    Operation_Log.compact()
+    Project_Utilities.delete_project("Deleted")
+    Operation_Log.compact()
+
+    assert stored_projects()[0] == {"Kept"}
+    assert not Project_Utilities.project_exists("Deleted")
+
+def test_each_shard_has_its_own_log(empty_database):
+    use_database(empty_database, 2)
+    first, second = project_in("project-0", 2), project_in("project-1", 2)
+    add_project(first, 2)
+    add_project(second, 1)
+
+    assert [seq for seq, _ in Operation_Log.pending(first)] == [1, 2, 3]
+    assert [seq for seq, _ in Operation_Log.pending(second)] == [1, 2]
+    with pytest.raises(ValueError):
+        Operation_Log.append([Project_Operations.add_category(first, "A"), Project_Operations.add_category(second, "B")])
+
+    crash()
+    assert task_names(first) == ["Task 0", "Task 1"]
+    assert Operation_Log.compact() == 5
+    assert stored_projects("project-0")[0] == {first}
+    assert stored_projects("project-1")[0] == {second}
+
+def test_shared_log_of_a_sharded_database_is_folded(empty_database):
+    use_database(empty_database, 2)
+    first, second = project_in("project-0", 2), project_in("project-1", 2)
+    records = [[Project_Operations.create_project(Project(first, "owner"))],
+               [Project_Operations.create_project(Project(second, "owner"))],
+               [Project_Operations.add_category(first, "Shared")]]
+    with open(os.path.join(empty_database, Operation_Log.SHARED_FILE_NAME), "wb") as log_file:
+        for seq, operations in enumerate(records, 1):
+            log_file.write(Operation_Log._frame(seq, operations))
+
+    Operation_Log.start()
+    try:
+        assert not os.path.exists(os.path.join(empty_database, Operation_Log.SHARED_FILE_NAME))
+        assert stored_projects("project-0") == ({first}, 3)
+        assert stored_projects("project-1") == ({second}, 2)
+        assert Project_Utilities.get_category_list(first) == ["None", "Shared"]
+        # The log of each store starts after its checkpoint
+        Project_Utilities.add_category("Later", second)
+        assert [seq for seq, _ in Operation_Log.pending(second)] == [3]
+    finally:
+        Operation_Log.stop()
@@ -0,0 +1,106 @@
+import pytest
+
+from libraries.project import Project
+from libraries.task import Task
+from libraries.user import Role
+from utilities.project_codec import Project_Codec
+
+def make_project(task_count: int = 40):
+    """
+    Return a project whose tasks mix every value type a task field can hold, with columns
+    of few distinct values, so they are dictionary-encoded, and of unique values.
+    """
+    project_obj = Project("Codec project", "owner")
+    project_obj.description = "Déjà vu — a description with unicode"
+    project_obj.add_collaborator("member", Role.MEMBER)
+    project_obj.add_collaborator("guest", Role.GUEST)
+    project_obj.categories = ["None", "Backend", "Frontend"]
+    for index in range(task_count):
+        project_obj.add_task(Task(f"Task {index}", f"Description {index} " * (index % 5), index % 5 + 1, f"2025-01-{index % 28 + 1:02d}",
+                                  ("None", "Backend", "Frontend")[index % 3], ("TODO", "DOING", "DONE")[index % 3],
+                                  None if index % 4 == 0 else ("owner", "member")[index % 2]))
+    return project_obj
+
+def task_rows(project_obj: Project):
+    return [task.to_dict() for task in project_obj.tasks]
+
+def version_1_record(project_obj: Project):
+    """
+    Encode a project as schema version 1 did: without the next task identifier in the
+    header and without the task identifier column.
+    """
+    buffer = bytearray(Project_Codec.MAGIC)
+    buffer.append(1)
+    buffer += b"P"
+    header = bytearray()
+    for value in (project_obj.name, project_obj.description, project_obj.collaborators, project_obj.categories):
+        Project_Codec._write_value(header, value)
+    buffer += Project_Codec._UINT32.pack(len(header)) + header
+    buffer += Project_Codec._UINT32.pack(len(project_obj.tasks))
+    for field in Project_Codec.TASK_FIELDS:
+        Project_Codec._write_column(buffer, [getattr(task, field) for task in project_obj.tasks])
+    return bytes(buffer)
+
+@pytest.mark.parametrize("task_count", [0, 1, 40, 1000])
+def test_project_round_trip(task_count):
+    project_obj = make_project(task_count)
+    decoded = Project_Codec.decode(Project_Codec.encode(project_obj))
+    assert decoded.name == project_obj.name
+    assert decoded.description == project_obj.description
+    assert decoded.collaborators == project_obj.collaborators
+    assert decoded.categories == project_obj.categories
+    assert decoded.next_task_id == project_obj.next_task_id
+    assert task_rows(decoded) == task_rows(project_obj)
+
+def test_round_trip_keeps_value_types():
+    decoded = Project_Codec.decode(Project_Codec.encode(make_project()))
+    assert all(type(task.priority) is int for task in decoded.tasks)
+    assert decoded.tasks[0].assignee is None
+    assert decoded.collaborators["member"] is Role.MEMBER
+
+def test_round_trip_rebuilds_indexes():
+    decoded = Project_Codec.decode(Project_Codec.encode(make_project()))
+    assert decoded.get_task(7).name == "Task 6"
+    assert {task.task_id for task in decoded.find_tasks(status="DONE")} == {task.task_id for task in make_project().find_tasks(status="DONE")}
+
+def test_decode_header_skips_tasks():
+    project_obj = make_project()
+    header = Project_Codec.decode_header(Project_Codec.encode(project_obj))
+    assert header == {"name": project_obj.name, "description": project_obj.description, "collaborators": project_obj.collaborators,
+                      "categories": project_obj.categories, "next_task_id": project_obj.next_task_id}
+
+def test_value_round_trip():
+    task = Task("Task", "Description", 3, "2025-01-01", "None", "TODO", None, task_id=12)
+    value = [None, "text", -2 ** 40, 1.5, True, False, ("a", "b"), {"op": "set_field", "value": 3}, Role.OWNER, task, []]
+    decoded = Project_Codec.decode_value(Project_Codec.encode_value(value))
+    assert decoded[:6] == value[:6]
+    assert list(decoded[6]) == ["a", "b"]
+    assert decoded[7] == value[7] and decoded[8] is Role.OWNER and decoded[10] == []
+    assert decoded[9].to_dict() == task.to_dict()
+
+def test_value_round_trip_holds_project():
+    project_obj = make_project(5)
+    decoded = Project_Codec.decode_value(Project_Codec.encode_value({"op": "create_project", "project": project_obj}))
+    assert task_rows(decoded["project"]) == task_rows(project_obj)
+
+def test_version_1_records_are_decoded():
+    project_obj = make_project()
+    decoded = Project_Codec.decode(version_1_record(project_obj))
+    assert [task.task_id for task in decoded.tasks] == list(range(1, len(project_obj.tasks) + 1))
+    assert decoded.next_task_id == len(project_obj.tasks) + 1
+    assert [dict(row, id=None) for row in task_rows(decoded)] == [dict(row, id=None) for row in task_rows(project_obj)]
+
+def test_unsupported_values_are_refused():
+    with pytest.raises(TypeError):
+        Project_Codec.encode_value(object())
+
+@pytest.mark.parametrize("data", [b"", b"not encoded", Project_Codec.MAGIC + bytes([99]) + b"P"])
+def test_foreign_data_is_refused(data):
+    with pytest.raises(ValueError):
+        Project_Codec.decode(data)
+
+def test_kind_is_checked():
+    with pytest.raises(ValueError):
+        Project_Codec.decode(Project_Codec.encode_value("not a project"))
+    with pytest.raises(ValueError):
+        Project_Codec.decode_value(Project_Codec.encode(make_project(1)))
@@ -0,0 +1,127 @@
+import pickle
+
+import numpy as np
+
+from libraries.project import Project
+from libraries.task import Task
+from libraries.user import Role
+from utilities.operation_log import Operation_Log
+from utilities.project_store import Project_Store
+from utilities.project_utilities import Project_Utilities
+from utilities.storage_manager import Storage_Manager
+
+def make_project(project_name: str, task_count: int):
+    project_obj = Project(project_name, "owner")
+    project_obj.description = "A project"
+    project_obj.add_collaborator("member", Role.MEMBER)
+    project_obj.categories = ["None", "Backend"]
+    for index in range(task_count):
+        project_obj.add_task(Task(f"Task {index}", f"Description {index}", index % 5 + 1, f"2025-01-{index + 1:02d}",
+                                  ("None", "Backend")[index % 2], "TODO", ("owner", "member")[index % 2]))
+    return project_obj
+
+def task_rows(project_obj: Project):
+    return [task.to_dict() for task in project_obj.tasks]
+
+def write_legacy(project_obj: Project):
+    """
+    Store a project as a pickled blob, as HoneyDue did before the columnar layout.
+    """
+    with Storage_Manager.write("project") as project_data:
+        project_data.create_dataset(project_obj.name, data=np.void(pickle.dumps(project_obj)))
+
+def write_layout(project_obj: Project, layout_version: int):
+    """
+    Store a project in the columnar layout as an older layout version wrote it: version 2
+    without task identifiers, version 3 without value types.
+    """
+    with Storage_Manager.write("project") as project_data:
+        Project_Store.write_project(project_data, project_obj)
+        project_group = project_data[project_obj.name]
+        del project_group["tasks"]["kinds"]
+        if layout_version == 2:
+            del project_group["tasks"]["id"]
+            del project_group.attrs["next_task_id"]
+        project_group.attrs["layout_version"] = layout_version
+
+def read_stored(project_name: str):
+    with Storage_Manager.read("project") as project_data:
+        return Project_Store.is_legacy(project_data, project_name), Project_Store.read_project(project_data, project_name)
+
+def test_legacy_project_is_migrated_on_first_load(empty_database):
+    project_obj = make_project("Legacy", 5)
+    write_legacy(project_obj)
+    assert read_stored("Legacy")[0]
+
+    assert [task.to_dict() for task in Project_Utilities.get_task_list("Legacy")] == task_rows(project_obj)
+    legacy, stored = read_stored("Legacy")
+    assert not legacy
+    assert task_rows(stored) == task_rows(project_obj)
+    assert stored.collaborators == project_obj.collaborators
+    assert stored.categories == project_obj.categories
+    assert stored.description == project_obj.description
+
+def test_migrate_converts_every_legacy_project(empty_database):
+    write_legacy(make_project("Legacy 1", 2))
+    write_legacy(make_project("Legacy 2", 0))
+    with Storage_Manager.write("project") as project_data:
+        Project_Store.write_project(project_data, make_project("Current", 1))
+
+    assert sorted(Project_Utilities.migrate()) == ["Legacy 1", "Legacy 2"]
+    assert Project_Utilities.migrate() == []
+    assert [task.name for task in read_stored("Legacy 1")[1].tasks] == ["Task 0", "Task 1"]
+
+def test_migrated_legacy_project_takes_new_writes(empty_database):
+    write_legacy(make_project("Legacy", 2))
+    Project_Utilities.add_task(Task("New", "", 1, "2025-02-01", "None", "TODO", "owner"), "Legacy")
+
+    tasks = Project_Utilities.get_task_list("Legacy")
+    assert [(task.task_id, task.name) for task in tasks] == [(1, "Task 0"), (2, "Task 1"), (3, "New")]
+
+def test_layout_2_project_is_given_task_identifiers(empty_database):
+    project_obj = make_project("Layout 2", 4)
+    write_layout(project_obj, 2)
+
+    with Storage_Manager.write("project") as project_data:
+        Project_Store.migrate_project(project_data, "Layout 2")
+        project_group = project_data["Layout 2"]
+        assert project_group["tasks"]["id"][()].tolist() == [1, 2, 3, 4]
+        assert project_group.attrs["next_task_id"] == 5
+        assert project_group.attrs["layout_version"] == Project_Store.LAYOUT_VERSION
+    assert task_rows(read_stored("Layout 2")[1]) == task_rows(project_obj)
+
+def test_layout_3_project_keeps_priorities_as_ints(empty_database):
+    project_obj = make_project("Layout 3", 3)
+    write_layout(project_obj, 3)
+
+    # Readable before migration, priorities made of digits being read as ints
+    assert task_rows(read_stored("Layout 3")[1]) == task_rows(project_obj)
+    with Storage_Manager.write("project") as project_data:
+        Project_Store.migrate_project(project_data, "Layout 3")
+        assert "kinds" in project_data["Layout 3"]["tasks"]
+    assert all(type(task.priority) is int for task in read_stored("Layout 3")[1].tasks)
+
+def test_delete_task_moves_the_last_row(empty_database):
+    project_obj = make_project("Deletes", 5)
+    with Storage_Manager.write("project") as project_data:
+        Project_Store.write_project(project_data, project_obj)
+        Project_Store.delete_task(project_data, "Deletes", 2)
+        assert project_data["Deletes"]["tasks"]["id"][()].tolist() == [1, 5, 3, 4]
+        assert Project_Store.task_positions(project_data, "Deletes", [5, 4]).tolist() == [1, 3]
+        # The last row is deleted without a move
+        Project_Store.delete_task(project_data, "Deletes", 4)
+        Project_Store.delete_task(project_data, "Deletes", 1)
+
+    stored = read_stored("Deletes")[1]
+    expected = {row["id"]: row for row in task_rows(project_obj) if row["id"] in (3, 5)}
+    assert {row["id"]: row for row in task_rows(stored)} == expected
+    assert stored.next_task_id == 6
+
+def test_delete_task_through_the_log(empty_database):
+    Project_Utilities.add_project(make_project("Logged deletes", 4))
+    Project_Utilities.patch_tasks("Logged deletes", [], [], [1, 3])
+    Project_Utilities.add_task(Task("New", "", 1, "2025-02-01", "None", "TODO", "owner"), "Logged deletes")
+    Operation_Log.compact()
+
+    stored = read_stored("Logged deletes")[1]
+    assert sorted((task.task_id, task.name) for task in stored.tasks) == [(2, "Task 1"), (4, "Task 3"), (5, "New")]
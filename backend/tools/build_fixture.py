@@ -0,0 +1,90 @@
+"""
+Builds the sample data snapshot that the server loads when started with HONEYDUE_SEED=1.
+
+The sample accounts and projects are written by Account_Utilities.reset and
+Project_Utilities.reset into a temporary database, the operation log is folded into the
+project store, and every top-level object is then copied into fresh files in the output
+directory, so the snapshot holds no free space. The password index is left out, since its
+fingerprints are keyed with the secret of the server that computed them; the sample users
+are pending in the index of the server that loads the snapshot, until they log in. The log checkpoint is cleared, as
+the snapshot is loaded with an empty log.
+
+Run from the backend directory after changing the sample data:
+
+    python -m tools.build_fixture [--output fixtures/sample]
+"""
+
+import argparse
+import os
+import secrets
+import shutil
+import tempfile
+import time
+
+import h5py
+
+from utilities.account_utilities import Account_Utilities
+from utilities.operation_log import Operation_Log
+from utilities.project_utilities import Project_Utilities
+from utilities.storage_manager import Storage_Manager
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "sample")
+
+def copy_store(source_path: str, target_path: str, skipped: tuple, dropped_attributes: tuple):
+    """
+    Copy every top-level object and root attribute of an HDF5 file into a fresh file,
+    leaving out the given objects and attributes.
+    """
+    with h5py.File(source_path, 'r') as source, h5py.File(target_path, 'w') as target:
+        for name in source.keys():
+            if name not in skipped:
+                source.copy(source[name], target, name=name)
+        for key, value in source.attrs.items():
+            if key not in dropped_attributes:
+                target.attrs[key] = value
+
+def build(output_dir: str):
+    """
+    Write the sample data snapshot into a directory.
+
+    Args:
+        output_dir (str): The snapshot directory, created if needed.
+
+    Returns:
+        dict: The size in bytes of each snapshot file.
+    """
+    # The password index is left out of the snapshot, so any secret key will do
+    os.environ.setdefault("HONEYDUE_SECRET_KEY", secrets.token_hex(32))
+    build_dir = tempfile.mkdtemp(prefix="honeydue-fixture-")
+    try:
+        Storage_Manager.DATABASE_DIR = build_dir
+        Storage_Manager.set_project_shards(1)
+        Account_Utilities.reset()
+        Project_Utilities.reset()
+        Operation_Log.stop()
+        Storage_Manager.stop()
+
+        os.makedirs(output_dir, exist_ok=True)
+        sizes = {}
+        for store, skipped, dropped_attributes in (("account", (Account_Utilities._PASSWORD_INDEX,), ()), ("project", (), ("log_seq",))):
+            file_name = Storage_Manager.STORES[store]
+            target_path = os.path.join(output_dir, file_name)
+            copy_store(os.path.join(build_dir, file_name), target_path, skipped, dropped_attributes)
+            sizes[file_name] = os.path.getsize(target_path)
+        return sizes
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="The snapshot directory.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sizes = build(args.output)
+    for file_name, size in sizes.items():
+        print(f"{file_name:<20} {size:>10} bytes")
+    print(f"built the snapshot in {args.output} in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
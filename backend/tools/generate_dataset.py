@@ -0,0 +1,222 @@
+"""
+Generates a synthetic database of realistic scale, for load and scale testing.
+
+N users, M projects and K tasks per project are drawn from generators seeded with --seed
+and the index of each project, so the same arguments always give the same database,
+whatever the shard count. The distributions:
+
+- Members: every project has an owner and a geometric number of other collaborators
+  (mean MEAN_COLLABORATORS, at most MAX_COLLABORATORS), Members or Guests, drawn from the
+  users with Zipf-like weights, so a few users belong to many projects and most to a few.
+- Categories: a Poisson number of categories per project (mean MEAN_CATEGORIES) from a
+  fixed vocabulary; a task has a category of its project, or 'None'.
+- Deadlines: each project is centred on a day between six months before and a year after
+  BASE_DATE, and its deadlines are spread around it; tasks due before BASE_DATE are
+  mostly DONE and later ones mostly TODO.
+- Descriptions: log-normal lengths (median MEDIAN_DESCRIPTION characters).
+- Priorities 1 to 5, most often 3; assignees drawn from the project's collaborators.
+
+The projects are written straight into the project stores with
+Project_Store.write_project_columns, in one write of each shard, and the users with their
+project lists by Account_Utilities.add_users in one write of the account store; nothing
+goes through the operation log. Each user gets a password of its own, user_password of
+--password and the username (so user7 logs in with "password user7"), as the default
+'unique' PASSWORD_POLICY requires; the passwords are hashed in parallel, with the bcrypt
+cost of --bcrypt-rounds, and added to the password index, keyed with the secret key of
+HONEYDUE_SECRET_KEY; set it to the key of the server that will serve the database. With
+bcrypt's default cost a hash takes a few hundred milliseconds of CPU, so large datasets
+for benchmarks that do not time logins are best generated with a low cost.
+
+The output directory can be served as is (HONEYDUE_DATABASE_DIR, with
+HONEYDUE_PROJECT_SHARDS set to --shards) or, when written with one shard, loaded on start
+as the seed snapshot (HONEYDUE_SEED=1 and HONEYDUE_SEED_SNAPSHOT).
+
+Run from the backend directory:
+
+    python -m tools.generate_dataset --output /tmp/honeydue-1m [--users 1000] [--projects 1000] [--tasks 1000] [--seed 0] [--shards 1] [--bcrypt-rounds 12]
+"""
+
+import argparse
+import concurrent.futures
+import os
+import time
+
+import numpy as np
+
+from libraries.user import Role
+from utilities.account_utilities import Account_Utilities
+from utilities.password_hashing import Password_Hashing
+from utilities.project_store import Project_Store
+from utilities.storage_manager import Storage_Manager
+
+BASE_DATE = np.datetime64("2025-01-01")
+MEAN_COLLABORATORS = 2.0
+MAX_COLLABORATORS = 40
+MEAN_CATEGORIES = 3.0
+MEDIAN_DESCRIPTION = 80
+CATEGORIES = ("Backend", "Frontend", "Design", "Research", "Bugs", "Docs", "Infrastructure", "Testing",
+              "Marketing", "Sales", "Support", "Planning", "Security", "Data", "Mobile", "Release")
+VERBS = ("Write", "Review", "Fix", "Update", "Design", "Test", "Deploy", "Plan", "Refactor", "Document", "Migrate", "Prepare")
+NOUNS = ("login page", "API docs", "release notes", "database schema", "sprint board", "onboarding flow", "unit tests",
+         "build pipeline", "pricing page", "search index", "error handling", "user survey", "backup job", "dashboard")
+TEXT = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore "
+        "magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo "
+        "consequat. Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla pariatur. "
+        "Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia deserunt mollit anim id est laborum. ") * 24
+MAX_DESCRIPTION = 2000
+PRIORITY_WEIGHTS = (0.1, 0.25, 0.35, 0.2, 0.1)
+STATUSES = ("TODO", "DOING", "DONE")
+
+def user_password(password: str, username: str):
+    """
+    Return the password of a generated user, distinct for every user.
+    """
+    return f"{password} {username}"
+
+def user_weights(users: int, seed: int):
+    """
+    Return the cumulative Zipf-like popularity of the users, in a random order of users.
+    """
+    rng = np.random.default_rng([seed, 0])
+    weights = np.empty(users)
+    weights[rng.permutation(users)] = 1.0 / np.arange(1, users + 1) ** 0.8
+    return np.cumsum(weights / weights.sum())
+
+def project_members(project: int, users: int, cumulative_weights: np.ndarray, seed: int):
+    """
+    Return the collaborators of a project, owner first, with their roles, and its categories.
+    """
+    rng = np.random.default_rng([seed, 1, project])
+    wanted = 1 + min(rng.geometric(1.0 / (1.0 + MEAN_COLLABORATORS)) - 1, MAX_COLLABORATORS, users - 1)
+    # Popular users are drawn again and again, so draw extra candidates and keep the first distinct ones
+    candidates = np.searchsorted(cumulative_weights, rng.random(wanted * 4), side="right").clip(0, users - 1)
+    members = list(dict.fromkeys(candidates.tolist()))[:wanted]
+    roles = np.where(rng.random(len(members)) < 0.7, Role.MEMBER.value, Role.GUEST.value)
+    collaborators = {f"user{member + 1}": role for member, role in zip(members, roles.tolist())}
+    collaborators[f"user{members[0] + 1}"] = Role.OWNER.value
+    categories = [CATEGORIES[index] for index in rng.choice(len(CATEGORIES), min(rng.poisson(MEAN_CATEGORIES), len(CATEGORIES)), replace=False)]
+    return collaborators, categories
+
+def task_columns(project: int, tasks: int, collaborators: dict, categories: list, seed: int):
+    """
+    Return the task columns of a project, as NumPy object arrays of str, and the
+    priorities as an integer array.
+    """
+    rng = np.random.default_rng([seed, 2, project])
+    names = np.array([f"{verb} {noun}" for verb in VERBS for noun in NOUNS], dtype=object)[rng.integers(len(VERBS) * len(NOUNS), size=tasks)]
+
+    lengths = np.minimum(rng.lognormal(np.log(MEDIAN_DESCRIPTION), 1.0, size=tasks), MAX_DESCRIPTION).astype(np.int64)
+    offsets = rng.integers(len(TEXT) - MAX_DESCRIPTION, size=tasks)
+    descriptions = np.array([TEXT[offset:offset + length] for offset, length in zip(offsets.tolist(), lengths.tolist())], dtype=object)
+
+    priorities = rng.choice(5, size=tasks, p=PRIORITY_WEIGHTS) + 1
+
+    centre = rng.integers(-180, 366)
+    days = np.rint(centre + rng.normal(0, 45, size=tasks)).astype(np.int64)
+    deadlines = np.datetime_as_string(BASE_DATE + days.astype("timedelta64[D]")).astype(object)
+
+    draws = rng.random(tasks)
+    past = days < 0
+    statuses = np.where(past, np.where(draws < 0.1, 0, np.where(draws < 0.3, 1, 2)), np.where(draws < 0.6, 0, np.where(draws < 0.9, 1, 2)))
+
+    category_names = np.array(["None"] + categories, dtype=object)
+    category_draws = rng.integers(1, len(category_names), size=tasks) if categories else np.zeros(tasks, dtype=np.int64)
+    category_draws[rng.random(tasks) < 0.25] = 0
+
+    usernames = np.array(list(collaborators), dtype=object)
+    return {
+        "id": np.arange(1, tasks + 1),
+        "name": names,
+        "description": descriptions,
+        "priority": priorities,
+        "deadline": deadlines,
+        "category": category_names[category_draws],
+        "status": np.array(STATUSES, dtype=object)[statuses],
+        "assignee": usernames[rng.integers(len(usernames), size=tasks)],
+    }
+
+def generate(output_dir: str, users: int, projects: int, tasks: int, seed: int, shards: int, password: str, rounds: int = None):
+    """
+    Write a generated database into an empty directory.
+
+    Args:
+        output_dir (str): The database directory.
+        users (int): The number of users.
+        projects (int): The number of projects.
+        tasks (int): The number of tasks of each project.
+        seed (int): The seed of the generators.
+        shards (int): The number of project stores.
+        password (str): The base of the passwords of the users, see user_password.
+        rounds (int, optional): The bcrypt cost of the password hashes, bcrypt's default if not given.
+
+    Returns:
+        dict: The time taken by each step in seconds, and the number of memberships.
+
+    Raises:
+        RuntimeError: If the directory already holds a database.
+    """
+    Storage_Manager.DATABASE_DIR = output_dir
+    Storage_Manager.set_project_shards(shards)
+    if any(os.path.exists(Storage_Manager.path(store)) for store in Storage_Manager.STORES):
+        raise RuntimeError(f"{output_dir} already holds a database.")
+    timings = {}
+
+    start = time.perf_counter()
+    cumulative_weights = user_weights(users, seed)
+    members = [project_members(project, users, cumulative_weights, seed) for project in range(projects)]
+    timings["members_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    by_store = {store: [] for store in Storage_Manager.project_stores()}
+    for project in range(projects):
+        by_store[Storage_Manager.project_store(f"Project{project + 1}")].append(project)
+    for store, store_projects in by_store.items():
+        with Storage_Manager.write(store) as project_data:
+            for project in store_projects:
+                collaborators, categories = members[project]
+                columns = task_columns(project, tasks, collaborators, categories, seed)
+                Project_Store.write_project_columns(project_data, f"Project{project + 1}", collaborators, categories, columns)
+    timings["projects_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    project_lists = [[] for _ in range(users)]
+    for project, (collaborators, _) in enumerate(members):
+        for username in collaborators:
+            project_lists[int(username[len("user"):]) - 1].append(f"Project{project + 1}")
+    usernames = [f"user{user + 1}" for user in range(users)]
+    passwords = [user_password(password, username) for username in usernames]
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        hashed_passwords = list(executor.map(Password_Hashing.hash_password, passwords, [rounds] * users, chunksize=max(1, users // (4 * (os.cpu_count() or 1)))))
+    Account_Utilities.add_users(list(zip(usernames, hashed_passwords, project_lists)), passwords)
+    timings["accounts_s"] = time.perf_counter() - start
+    timings["memberships"] = sum(len(project_list) for project_list in project_lists)
+
+    Storage_Manager.stop()
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="The database directory to create.")
+    parser.add_argument("--users", type=int, default=1000, help="Number of users.")
+    parser.add_argument("--projects", type=int, default=1000, help="Number of projects.")
+    parser.add_argument("--tasks", type=int, default=1000, help="Number of tasks of each project.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generators.")
+    parser.add_argument("--shards", type=int, default=1, help="Number of project stores.")
+    parser.add_argument("--password", default="password", help="The base of the passwords of the users.")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None, help="The bcrypt cost of the password hashes (default: bcrypt's).")
+    args = parser.parse_args()
+    if args.users < 1 or args.projects < 0 or args.tasks < 0 or args.shards < 1:
+        parser.error("--users and --shards must be at least 1, --projects and --tasks at least 0")
+    if args.bcrypt_rounds is not None and not 4 <= args.bcrypt_rounds <= 31:
+        parser.error("--bcrypt-rounds must be between 4 and 31")
+
+    start = time.perf_counter()
+    timings = generate(args.output, args.users, args.projects, args.tasks, args.seed, args.shards, args.password, args.bcrypt_rounds)
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(os.path.getsize(os.path.join(args.output, name)) for name in os.listdir(args.output))
+    print(f"{args.users} users, {args.projects} projects, {args.projects * args.tasks} tasks, {timings['memberships']} memberships")
+    print(f"members {timings['members_s']:.1f} s, projects {timings['projects_s']:.1f} s, accounts {timings['accounts_s']:.1f} s")
+    print(f"wrote {total_bytes / 1e6:.1f} MB to {args.output} in {elapsed:.1f} s ({args.projects * args.tasks / elapsed:,.0f} tasks/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Moves the projects of an offline database to another number of project shards.
+
+Stop every server using the database first. The operation logs are folded into the
+current project stores, then every project is copied as is, with HDF5's object copy, into
+the shard its name maps to under the new count. The new files are written next to the old
+ones and swapped in once they are complete; the old files and their emptied logs are moved
+to a backup directory, which is removed unless --keep-backup is given. Each new shard
+starts with an empty log and a checkpoint of 0, as the sequence numbers of the logs are
+per shard.
+
+Run from the backend directory:
+
+    python -m tools.reshard_projects --shards 8 [--database-dir /app/database] [--keep-backup]
+
+then start the server with HONEYDUE_PROJECT_SHARDS set to the new count.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import time
+
+import h5py
+
+from utilities.operation_log import Operation_Log
+from utilities.storage_manager import Storage_Manager
+
+def current_shards(database_dir: str):
+    """
+    Return the shard count of the project files in a database directory.
+
+    Args:
+        database_dir (str): The database directory.
+
+    Returns:
+        int: The shard count, or None if there are no project files.
+
+    Raises:
+        RuntimeError: If the directory holds project files of more than one layout.
+    """
+    indexes = []
+    for file_name in os.listdir(database_dir):
+        match = re.fullmatch(r"project_data(?:-(\d+))?\.hdf5", file_name)
+        if match:
+            indexes.append(None if match.group(1) is None else int(match.group(1)))
+    if not indexes:
+        return None
+    if None in indexes:
+        if len(indexes) > 1:
+            raise RuntimeError("Found both project_data.hdf5 and sharded project files.")
+        return 1
+    with h5py.File(os.path.join(database_dir, f"project_data-{min(indexes)}.hdf5"), 'r') as project_data:
+        shards = int(project_data.attrs.get("shards", max(indexes) + 1))
+    if max(indexes) >= shards:
+        raise RuntimeError(f"Found project_data-{max(indexes)}.hdf5 in a database of {shards} shards.")
+    return shards
+
+def reshard(database_dir: str, shards: int, keep_backup: bool):
+    """
+    Move the projects of a database to a new shard count.
+
+    Args:
+        database_dir (str): The database directory.
+        shards (int): The new shard count.
+        keep_backup (bool): Whether to keep the old project files.
+
+    Returns:
+        dict: The number of projects written to each new shard file.
+    """
+    source = current_shards(database_dir)
+    if source is None:
+        raise RuntimeError(f"No project files in {database_dir}.")
+    if source == shards:
+        raise RuntimeError(f"The database already has {shards} project shard(s).")
+
+    Storage_Manager.DATABASE_DIR = database_dir
+    Storage_Manager.set_project_shards(source)
+    # Started first, so a log still shared by every shard is folded along with the others
+    Operation_Log.start()
+    folded = Operation_Log.compact()
+    Operation_Log.stop()
+    Storage_Manager.stop()
+    print(f"folded {folded} log records into {source} shard(s)")
+
+    targets = Storage_Manager.shard_files(shards)
+    temporary_paths = {store: os.path.join(database_dir, file_name + ".reshard") for store, file_name in targets.items()}
+    counts = dict.fromkeys(targets, 0)
+    target_files = {store: h5py.File(path, 'w') for store, path in temporary_paths.items()}
+    try:
+        for file_name in Storage_Manager.shard_files(source).values():
+            path = os.path.join(database_dir, file_name)
+            if not os.path.exists(path):
+                continue
+            with h5py.File(path, 'r') as project_data:
+                for project_name in project_data.keys():
+                    store = Storage_Manager.project_store(project_name, shards)
+                    project_data.copy(project_data[project_name], target_files[store], name=project_name)
+                    counts[store] += 1
+        for target_file in target_files.values():
+            target_file.attrs["log_seq"] = 0
+            target_file.attrs["shards"] = shards
+    finally:
+        for target_file in target_files.values():
+            target_file.close()
+
+    backup_dir = os.path.join(database_dir, f"reshard-backup-{int(time.time())}")
+    os.makedirs(backup_dir)
+    for file_name in Storage_Manager.shard_files(source).values():
+        for name in (file_name, os.path.splitext(file_name)[0] + ".log"):
+            path = os.path.join(database_dir, name)
+            if os.path.exists(path):
+                os.replace(path, os.path.join(backup_dir, name))
+    for store, file_name in targets.items():
+        os.replace(temporary_paths[store], os.path.join(database_dir, file_name))
+    if keep_backup:
+        print(f"old project files kept in {backup_dir}")
+    else:
+        shutil.rmtree(backup_dir)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, required=True, help="The new number of project shards.")
+    parser.add_argument("--database-dir", default=Storage_Manager.DATABASE_DIR, help="The database directory.")
+    parser.add_argument("--keep-backup", action="store_true", help="Keep the old project files in a backup directory.")
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+
+    start = time.perf_counter()
+    counts = reshard(args.database_dir, args.shards, args.keep_backup)
+    for store, count in counts.items():
+        print(f"{Storage_Manager.shard_files(args.shards)[store]:<28} {count:>8} projects")
+    print(f"resharded {sum(counts.values())} projects in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
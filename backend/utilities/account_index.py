@@ -0,0 +1,468 @@
+import os
+import threading
+
+from collections import OrderedDict
+
+from utilities.storage_manager import Storage_Manager
+from utilities.worker_coordinator import Worker_Coordinator
+
+class Account_Index:
+    """
+    In-memory index of the account store: the set of usernames, a cache of the project
+    memberships of each user, and the reverse index from each project to its members.
+
+    The usernames are read once, on first use or at startup, and kept current by the
+    account write paths, so resolving a user is a set lookup. The projects of a user are
+    read from their 'Projects' dataset on first use and cached, least recently used first
+    out, for up to MAX_USERS users, as the list of names in dataset order together with
+    the slot of each name. The account write paths plan their changes to the dataset with
+    add_projects and remove_projects, which update the cached entry in place: a project is
+    appended to the end, and removed by moving the last project into its slot, so both
+    cost O(1) per project. A write that fails invalidates the entry, so it is read again.
+
+    The reverse index mirrors the membership table of the account store, which has one row
+    per membership holding the project, the member and the slot of the project in the
+    member's dataset. It keeps the rows in table order and, for each project, the row of
+    each member. It is loaded whole by the account write paths with load_members, and kept
+    in step with the table by add_members, remove_member and set_slot, which return the
+    rows they changed. Rows are removed by moving the last row into their place.
+
+    Entries are loaded and changed with the account store lock held, so an entry can never
+    be loaded from a version of the store older than the last write to it. Lookups take
+    only the index lock and do no file I/O on a hit.
+
+    When several worker processes share the account store, the cached projects and the
+    reverse index are dropped whenever the store's generation shows that another process
+    wrote to it. The usernames are kept, since users are never removed, and a username
+    missing from the set is looked up in the store, where another process may have added it.
+
+    Attributes:
+        MAX_USERS (int): The number of users whose projects are cached (HONEYDUE_ACCOUNT_CACHE_USERS).
+        RESERVED_PREFIX (str): The prefix of top-level groups that are not user accounts.
+
+    Methods:
+        start(): Load the usernames if they have not been loaded yet.
+        user_exists(username): Check if a user exists.
+        projects(username): Return the projects of a user.
+        has_project(username, project_name): Check if a user has a project.
+        add_user(username): Record a new user.
+        add_projects(username, project_names): Plan the append of projects to a user's dataset.
+        remove_projects(username, project_names): Plan the removal of projects from a user's dataset.
+        invalidate(username): Drop the cached projects of a user.
+        load_members(rows): Load the reverse index from the rows of the membership table.
+        members_loaded(): Check if the reverse index is loaded.
+        members(project_name): Return the members of a project.
+        member_slot(project_name, username): Return the table row and slot of a membership.
+        add_members(entries): Add memberships to the reverse index.
+        remove_member(project_name, username): Remove a membership from the reverse index.
+        set_slot(project_name, username, slot): Change the slot of a membership.
+        member_rows(rows): Return rows of the membership table and its number of rows.
+        clear(): Drop the index, so it is loaded again on next use.
+        stats(): Return the size and hit counters of the index.
+    """
+
+    MAX_USERS = int(os.environ.get("HONEYDUE_ACCOUNT_CACHE_USERS", 10000))
+    RESERVED_PREFIX = "__"
+
+    _lock = threading.RLock()
+    _usernames = None
+    _projects = OrderedDict()
+    _member_rows = None
+    _members = None
+    _generation = 0
+    _hits = 0
+    _misses = 0
+    _invalidations = 0
+
+    @classmethod
+    def start(cls):
+        """
+        Load the usernames if they have not been loaded yet.
+        """
+        if cls._usernames is None:
+            with Storage_Manager.read('account') as account_data:
+                with cls._lock:
+                    if cls._usernames is None:
+                        cls._usernames = {name for name in account_data.keys() if not name.startswith(cls.RESERVED_PREFIX)}
+
+    @classmethod
+    def user_exists(cls, username: str):
+        """
+        Check if a user exists.
+
+        Args:
+            username (str): The username to look up.
+
+        Returns:
+            bool: True if the user exists, False otherwise.
+        """
+        cls._sync()
+        if cls._usernames is None:
+            cls.start()
+        with cls._lock:
+            if username in cls._usernames or not Worker_Coordinator.ENABLED:
+                return username in cls._usernames
+        with Storage_Manager.read('account') as account_data:
+            exists = not username.startswith(cls.RESERVED_PREFIX) and username in account_data
+            if exists:
+                cls.add_user(username)
+            return exists
+
+    @classmethod
+    def projects(cls, username: str):
+        """
+        Return the projects of a user, reading them from the account store on a miss.
+
+        Args:
+            username (str): The username of the user.
+
+        Returns:
+            list: The project names in dataset order, or None if the user does not exist.
+        """
+        return cls._read(username, lambda entry: None if entry is None else list(entry[0]))
+
+    @classmethod
+    def has_project(cls, username: str, project_name: str):
+        """
+        Check if a user has a project, reading their projects from the account store on a miss.
+
+        Args:
+            username (str): The username of the user.
+            project_name (str): The name of the project.
+
+        Returns:
+            bool: True if the user exists and has the project, False otherwise.
+        """
+        return cls._read(username, lambda entry: entry is not None and project_name in entry[1])
+
+    @classmethod
+    def add_user(cls, username: str):
+        """
+        Record a new user. Must be called with the account store lock held, after the
+        user's group is created.
+
+        Args:
+            username (str): The username of the new user.
+        """
+        cls._sync()
+        with cls._lock:
+            if cls._usernames is not None:
+                cls._usernames.add(username)
+            cls._projects.pop(username, None)
+
+    @classmethod
+    def add_projects(cls, username: str, project_names: list):
+        """
+        Add projects to the cached entry of a user and return the ones to append to the end
+        of their dataset. Must be called with the account store lock held, and followed by
+        the write or, if the write fails, by invalidate.
+
+        Args:
+            username (str): The username of the user.
+            project_names (list): The names of the projects to add.
+
+        Returns:
+            list: The names the user did not have yet, in the order given, or None if the
+                  user does not exist.
+        """
+        cls._sync()
+        with cls._lock:
+            entry = cls._entry(username)
+            if entry is None:
+                return None
+            names, slots = entry
+            added = []
+            for project_name in project_names:
+                if project_name not in slots:
+                    slots[project_name] = len(names)
+                    names.append(project_name)
+                    added.append(project_name)
+            return added
+
+    @classmethod
+    def remove_projects(cls, username: str, project_names: list):
+        """
+        Remove projects from the cached entry of a user and return the writes that remove
+        them from their dataset: each removed project is replaced by the last project, and
+        the dataset is shrunk. Must be called with the account store lock held, and followed
+        by the writes or, if they fail, by invalidate.
+
+        Args:
+            username (str): The username of the user.
+            project_names (list): The names of the projects to remove.
+
+        Returns:
+            tuple: A dict mapping each slot to write to the name to write into it, and the
+                   new size of the dataset, or None if the user does not exist.
+        """
+        cls._sync()
+        with cls._lock:
+            entry = cls._entry(username)
+            if entry is None:
+                return None
+            names, slots = entry
+            moves = {}
+            for project_name in project_names:
+                slot = slots.pop(project_name, None)
+                if slot is None:
+                    continue
+                last = names.pop()
+                moves.pop(len(names), None)
+                if slot < len(names):
+                    names[slot] = last
+                    slots[last] = slot
+                    moves[slot] = last
+            return moves, len(names)
+
+    @classmethod
+    def invalidate(cls, username: str):
+        """
+        Drop the cached projects of a user, so they are read again on next use. Must be
+        called with the account store lock held, by a write to the user's project list that
+        was not planned with add_projects or remove_projects.
+
+        Args:
+            username (str): The username of the user.
+        """
+        with cls._lock:
+            if cls._projects.pop(username, None) is not None:
+                cls._invalidations += 1
+
+    @classmethod
+    def load_members(cls, rows: list):
+        """
+        Load the reverse index from the rows of the membership table. Must be called with
+        the account store lock held.
+
+        Args:
+            rows (list): The (project name, username, slot) row of each membership, in table order.
+        """
+        with cls._lock:
+            cls._member_rows = [list(row) for row in rows]
+            cls._members = {}
+            for row, (project_name, username, slot) in enumerate(cls._member_rows):
+                cls._members.setdefault(project_name, {})[username] = row
+
+    @classmethod
+    def members_loaded(cls):
+        """
+        Check if the reverse index is loaded.
+
+        Returns:
+            bool: True if load_members was called since the index was last cleared.
+        """
+        cls._sync()
+        with cls._lock:
+            return cls._members is not None
+
+    @classmethod
+    def members(cls, project_name: str):
+        """
+        Return the members of a project. The reverse index must be loaded.
+
+        Args:
+            project_name (str): The name of the project.
+
+        Returns:
+            list: The usernames of the members of the project.
+        """
+        with cls._lock:
+            return list(cls._members.get(project_name, ()))
+
+    @classmethod
+    def member_slot(cls, project_name: str, username: str):
+        """
+        Return the table row of a membership and the slot of the project in the member's
+        dataset. The reverse index must be loaded.
+
+        Args:
+            project_name (str): The name of the project.
+            username (str): The username of the member.
+
+        Returns:
+            tuple: The row and the slot, or None if the user is not a member of the project.
+        """
+        with cls._lock:
+            row = cls._members.get(project_name, {}).get(username)
+            if row is None:
+                return None
+            return row, cls._member_rows[row][2]
+
+    @classmethod
+    def add_members(cls, entries: list):
+        """
+        Append memberships to the reverse index. Must be called with the account store lock
+        held, and followed by the append of the same rows to the membership table.
+
+        Args:
+            entries (list): The (project name, username, slot) of each new membership.
+
+        Returns:
+            int: The table row of the first new membership.
+        """
+        with cls._lock:
+            first = len(cls._member_rows)
+            for project_name, username, slot in entries:
+                cls._members.setdefault(project_name, {})[username] = len(cls._member_rows)
+                cls._member_rows.append([project_name, username, slot])
+            return first
+
+    @classmethod
+    def remove_member(cls, project_name: str, username: str):
+        """
+        Remove a membership from the reverse index by moving the last row into its row.
+        Must be called with the account store lock held, and followed by the same change to
+        the membership table.
+
+        Args:
+            project_name (str): The name of the project.
+            username (str): The username of the member.
+
+        Returns:
+            tuple: The row that was removed, the (project name, username, slot) row to write
+                   into it or None if it was the last row, and the new number of rows; or
+                   None if the user is not a member of the project.
+        """
+        with cls._lock:
+            members = cls._members.get(project_name, {})
+            row = members.pop(username, None)
+            if row is None:
+                return None
+            if not members:
+                del cls._members[project_name]
+            last = cls._member_rows.pop()
+            if row == len(cls._member_rows):
+                return row, None, len(cls._member_rows)
+            cls._member_rows[row] = last
+            cls._members[last[0]][last[1]] = row
+            return row, tuple(last), len(cls._member_rows)
+
+    @classmethod
+    def set_slot(cls, project_name: str, username: str, slot: int):
+        """
+        Change the slot of a membership, after the project moved in the member's dataset.
+        Must be called with the account store lock held, and followed by the same change to
+        the membership table.
+
+        Args:
+            project_name (str): The name of the project.
+            username (str): The username of the member.
+            slot (int): The new slot of the project in the member's dataset.
+
+        Returns:
+            int: The table row of the membership, or None if the user is not a member of the project.
+        """
+        with cls._lock:
+            row = cls._members.get(project_name, {}).get(username)
+            if row is not None:
+                cls._member_rows[row][2] = slot
+            return row
+
+    @classmethod
+    def member_rows(cls, rows: list):
+        """
+        Return rows of the membership table, as they are in the reverse index.
+
+        Args:
+            rows (list): The indexes of the rows.
+
+        Returns:
+            tuple: The (project name, username, slot) of each row that still exists, in the
+                   order given, and the number of rows of the table.
+        """
+        with cls._lock:
+            size = len(cls._member_rows)
+            return [tuple(cls._member_rows[row]) for row in rows if row < size], size
+
+    @classmethod
+    def clear(cls):
+        """
+        Drop the index and reset the counters, so it is loaded again on next use.
+        """
+        with cls._lock:
+            cls._usernames = None
+            cls._projects.clear()
+            cls._member_rows = None
+            cls._members = None
+            cls._hits = 0
+            cls._misses = 0
+            cls._invalidations = 0
+
+    @classmethod
+    def stats(cls):
+        """
+        Return the size and hit counters of the index.
+
+        Returns:
+            dict: The number of known users, the number of users whose projects are cached,
+                  the number of memberships in the reverse index, and the hit, miss and
+                  invalidation counters of the project cache.
+        """
+        with cls._lock:
+            return {
+                "users": None if cls._usernames is None else len(cls._usernames),
+                "cached": len(cls._projects),
+                "memberships": None if cls._member_rows is None else len(cls._member_rows),
+                "hits": cls._hits,
+                "misses": cls._misses,
+                "invalidations": cls._invalidations,
+            }
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @classmethod
+    def _read(cls, username: str, function):
+        """
+        Call a function with the entry of a user under the index lock. The account store
+        lock is taken first on a miss, so the lock order of the write paths is kept.
+        """
+        cls._sync()
+        with cls._lock:
+            if username in cls._projects:
+                return function(cls._entry(username))
+        with Storage_Manager.read('account'):
+            with cls._lock:
+                return function(cls._entry(username))
+
+    @classmethod
+    def _sync(cls):
+        """
+        Drop the cached projects and the reverse index if the account store changed since
+        they were loaded, other than through the account write paths of this process. Must
+        be called without the index lock held.
+        """
+        generation = Storage_Manager.generation('account')
+        with cls._lock:
+            if generation != cls._generation:
+                cls._projects.clear()
+                cls._member_rows = None
+                cls._members = None
+                cls._generation = generation
+
+    @classmethod
+    def _entry(cls, username: str):
+        """
+        Return the cached (names, slots) entry of a user, reading it from the account store
+        on a miss, or None if the user does not exist. Must be called with the index lock
+        held, and on a miss with the account store lock held too.
+        """
+        entry = cls._projects.get(username)
+        if entry is not None:
+            cls._projects.move_to_end(username)
+            cls._hits += 1
+            return entry
+
+        cls._misses += 1
+        if username.startswith(cls.RESERVED_PREFIX):
+            return None
+        with Storage_Manager.read('account') as account_data:
+            if username not in account_data:
+                return None
+            names = [project.decode('utf-8') for project in account_data[username]['Projects'][()]]
+        entry = (names, {project_name: slot for slot, project_name in enumerate(names)})
+        cls._projects[username] = entry
+        while len(cls._projects) > cls.MAX_USERS:
+            cls._projects.popitem(last=False)
+        return entry
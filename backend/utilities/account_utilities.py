@@ -1,22 +1,75 @@
-import bcrypt
 import h5py
+import hashlib
+import hmac
+import os
+
+from utilities.account_index import Account_Index
+from utilities.password_hashing import Password_Hashing
+from utilities.server_secret import Server_Secret
+from utilities.storage_manager import Storage_Manager
 
 class Account_Utilities:
     """
     A utility class for managing accounts and associated project data stored in an HDF5 file.
 
+    The account file is kept open by the Storage_Manager and shared between requests.
+    Users and their project lists are resolved through the Account_Index, which every write
+    to the account store keeps current. The reserved '__project_members' group holds the
+    membership table: one row per project in a user's list, with the project, the user and
+    the slot of the project in the list. It is the reverse index from projects to their
+    members, so a project can be removed from every member's list without reading them.
+    It is built from the users' lists the first time it is needed.
+
+    Passwords are unique across accounts when PASSWORD_POLICY is 'unique' (the default).
+    Uniqueness is checked against an index of password fingerprints, each an HMAC-SHA256
+    of the password keyed with a key derived from the Server_Secret, so a signup costs one
+    set lookup instead of a bcrypt check per account. The fingerprints are stored in the
+    reserved '__password_index' group, each with the account it belongs to, and loaded into
+    memory on first use. The index is rebuilt when the secret key changes. Accounts whose
+    password is not known, because they were created before the index existed or loaded
+    with add_users without their passwords, are listed as pending in the same group and indexed at their next
+    successful login. A signup is never checked with bcrypt against pending accounts, as
+    that would cost a bcrypt check per account while the account store is locked, so their
+    passwords can be reused until they log in; stats() reports how many are pending.
+    Setting PASSWORD_POLICY to 'none' disables the check and the index.
+
+    Attributes:
+        PASSWORD_POLICY (str): 'unique' or 'none' (HONEYDUE_PASSWORD_POLICY).
+        RESERVED_PREFIX (str): The prefix of top-level groups that are not user accounts.
+
     Methods:
         username_exists(username): Check if a username exists in the database.
         password_exists(password): Check if a password exists in the database.
         account_exists(username, password): Check if an account with the given credentials exists.
-        add_user(username, password): Add a new user to the database.
+        get_password_hash(username): Retrieve the stored password hash of a user.
+        index_password(username, password): Add the password of an account to the password index.
+        add_user(username, password, hashed_password): Add a new user to the database.
+        add_users(accounts, passwords): Add many users with their project lists in one write.
         user_has_project(username, project_name): Check if a user has a specific project.
         add_project(project_name, username): Add a project to a user's project list.
+        add_projects(username, project_names): Add several projects to a user's project list.
         delete_project(project_name, username): Remove a project from a user's project list.
+        remove_projects(username, project_names): Remove several projects from a user's project list.
+        get_members(project_name): Retrieve the users whose project list holds a project.
+        remove_project_members(project_name): Remove a project from the project list of every member.
         get_project_list(username): Retrieve a list of projects for a user.
         reset(): Reset the database to default values (used for testing).
+        load_snapshot(snapshot_dir): Replace the accounts with those of a prebuilt snapshot.
+        stats(): Return the number of indexed and pending accounts of the password index.
     """
 
+    PASSWORD_POLICY = os.environ.get("HONEYDUE_PASSWORD_POLICY", "unique")
+    RESERVED_PREFIX = Account_Index.RESERVED_PREFIX
+
+    _PASSWORD_INDEX = "__password_index"
+    _MEMBER_INDEX = "__project_members"
+    _fingerprints = None
+    _fingerprints_read = 0
+    _fingerprints_generation = None
+    _indexed = set()
+    _unindexed = set()
+    _pending_read = 0
+
     #################################
     ### SIGN UP / LOGIN FUNCTIONS ###
     #################################
@@ -32,15 +85,14 @@ class Account_Utilities:
         Returns:
             bool: True if the username exists, False otherwise.
         """
-        with h5py.File('/app/database/account_data.hdf5', 'r') as account_data:
-            if username in account_data:
-                return True
-            return False
+        return Account_Index.user_exists(username)
 
     @staticmethod
     def password_exists(password: str):
         """
-        Check if a password exists in the database.
+        Check if a password exists in the database, by looking up its fingerprint in the
+        password index. The passwords of pending accounts are not in the index until they
+        log in, and are not checked.
 
         Args:
             password (str): The password to search for.
@@ -48,23 +100,9 @@ class Account_Utilities:
         Returns:
             bool: True if the password exists, False otherwise.
         """
-        with h5py.File('/app/database/account_data.hdf5', 'r') as account_data:
-            for user in account_data:
-                user_group = account_data[user]
-                stored_hash = user_group.attrs['Password']
-                
-                if isinstance(stored_hash, str): 
-                    stored_hash = stored_hash.encode('utf-8')
-                
-                password_encoded = password.encode('utf-8')
-
-                try:
-                    if bcrypt.checkpw(password_encoded, stored_hash):
-                        return True
-                except TypeError as e:
-                    print(f"Error checking password: {e}")
-                    return False
-            return False
+        fingerprint = Account_Utilities._password_fingerprint(password)
+        with Storage_Manager.write('account') as account_data:
+            return fingerprint in Account_Utilities._load_fingerprints(account_data)
 
     @staticmethod
     def account_exists(username: str, password: str):
@@ -78,45 +116,126 @@ class Account_Utilities:
         Returns:
             bool: True if the account exists, False otherwise.
         """
-        with h5py.File('/app/database/account_data.hdf5', 'r') as account_data:
-            try:
-                user_group = account_data[username]
-                stored_hash = user_group.attrs['Password']
-                
-                if isinstance(stored_hash, str):
-                    stored_hash = stored_hash.encode('utf-8')
+        stored_hash = Account_Utilities.get_password_hash(username)
+        if stored_hash is None:
+            return False
+        if Password_Hashing.check_password(password, stored_hash):
+            Account_Utilities.index_password(username, password)
+            return True
+        return False
 
-                password_encoded = password.encode('utf-8')
-                
-                if bcrypt.checkpw(password_encoded, stored_hash):
-                    return True
-                return False
-            except KeyError:
-                return False
+    @staticmethod
+    def get_password_hash(username: str):
+        """
+        Retrieve the stored password hash of a user.
+
+        Args:
+            username (str): The username of the account.
+
+        Returns:
+            bytes: The bcrypt hash, or None if the account does not exist.
+        """
+        if username.startswith(Account_Utilities.RESERVED_PREFIX):
+            return None
+        with Storage_Manager.read('account') as account_data:
+            if username not in account_data:
+                return None
+            stored_hash = account_data[username].attrs['Password']
+            if isinstance(stored_hash, str):
+                stored_hash = stored_hash.encode('utf-8')
+            return stored_hash
 
     @staticmethod
-    def add_user(username: str, password: str):
+    def index_password(username: str, password: str):
+        """
+        Add the fingerprint of the password of an account to the password index, after a
+        successful login. Pending accounts are indexed this way. Does nothing when the
+        account is already indexed, or when PASSWORD_POLICY is not 'unique'.
+
+        Args:
+            username (str): The username of the account.
+            password (str): The password of the account.
+        """
+        if Account_Utilities.PASSWORD_POLICY == "unique":
+            Account_Utilities._index_password(username, password)
+
+    @staticmethod
+    def add_user(username: str, password: str, hashed_password: bytes = None):
         """
         Add a new user to the database.
 
         Args:
             username (str): The username of the new user.
             password (str): The password of the new user.
+            hashed_password (bytes, optional): The bcrypt hash of the password, if it was
+                                               already computed. Hashed here when omitted.
 
         Raises:
-            ValueError: If the username or password already exists.
+            ValueError: If the username is reserved or already exists, or if the password
+                        already exists and PASSWORD_POLICY is 'unique'.
         """
-        with h5py.File('/app/database/account_data.hdf5', 'a') as account_data:
-            if Account_Utilities.username_exists(username):  
+        # Hashed before the account store is locked, so bcrypt never holds up other requests
+        if hashed_password is None:
+            hashed_password = Password_Hashing.hash_password(password)
+        with Storage_Manager.write('account') as account_data:
+            if username.startswith(Account_Utilities.RESERVED_PREFIX):
+                raise ValueError("Username is reserved.")
+            elif Account_Utilities.username_exists(username):  
                 raise ValueError("Username already exists.")
-            elif Account_Utilities.password_exists(password):
+            elif Account_Utilities.PASSWORD_POLICY == "unique" and Account_Utilities.password_exists(password):
                 raise ValueError("Password already exists.")
             else:
-                hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-                
                 user_group = account_data.create_group(username)
                 user_group.attrs['Password'] = hashed_password  
                 user_group.create_dataset('Projects', shape=(0,), maxshape=(None,), dtype=h5py.string_dtype(encoding='utf-8'))
+                Account_Index.add_user(username)
+                if Account_Utilities.PASSWORD_POLICY == "unique":
+                    Account_Utilities._index_password(username, password)
+
+    @staticmethod
+    def add_users(accounts: list, passwords: list = None):
+        """
+        Add many users, each with a list of projects, in a single write of the account store.
+        The project list of each user is written whole, and the memberships are appended to
+        the membership table with one write per column. Used to load generated datasets.
+        The passwords are given as bcrypt hashes, so they are not checked for uniqueness.
+        The users are added to the password index when their passwords are given, and are
+        pending otherwise.
+
+        Args:
+            accounts (list): The (username, hashed password, project names) of each user.
+            passwords (list, optional): The password of each user, in the order of accounts.
+
+        Raises:
+            ValueError: If a username is reserved, already exists or is given twice, or if
+                passwords are not given for every user.
+        """
+        if passwords is not None and len(passwords) != len(accounts):
+            raise ValueError(f"{len(passwords)} passwords given for {len(accounts)} users.")
+        with Storage_Manager.write('account') as account_data:
+            member_table = Account_Utilities._member_table(account_data)
+            usernames = set()
+            for username, _, _ in accounts:
+                if username.startswith(Account_Utilities.RESERVED_PREFIX):
+                    raise ValueError(f"Username {username} is reserved.")
+                elif username in usernames or Account_Utilities.username_exists(username):
+                    raise ValueError(f"Username {username} already exists.")
+                usernames.add(username)
+
+            rows = []
+            for username, hashed_password, project_names in accounts:
+                project_names = list(dict.fromkeys(project_names))
+                user_group = account_data.create_group(username)
+                user_group.attrs['Password'] = hashed_password
+                user_group.create_dataset('Projects', data=[project_name.encode('utf-8') for project_name in project_names],
+                                          shape=(len(project_names),), maxshape=(None,), dtype=h5py.string_dtype(encoding='utf-8'))
+                Account_Index.add_user(username)
+                rows.extend((project_name, username, slot) for slot, project_name in enumerate(project_names))
+            changed = set()
+            Account_Utilities._add_members(rows, changed)
+            Account_Utilities._write_members(member_table, changed)
+            if Account_Utilities.PASSWORD_POLICY == "unique":
+                Account_Utilities._index_accounts(account_data, [username for username, _, _ in accounts], passwords)
 
     #########################
     ### PROJECT FUNCTIONS ###
@@ -125,7 +244,8 @@ class Account_Utilities:
     @staticmethod
     def user_has_project(username: str, project_name: str):
         """
-        Check if a user has a specific project.
+        Check if a user has a specific project, with a lookup in the cached set of the
+        user's projects.
 
         Args:
             username (str): The username to check.
@@ -134,16 +254,12 @@ class Account_Utilities:
         Returns:
             bool: True if the user has the project, False otherwise.
         """
-        project_list = Account_Utilities.get_project_list(username)
-        if project_name in project_list:
-            return True
-        else:
-            return False
+        return Account_Index.has_project(username, project_name)
 
     @staticmethod
     def add_project(project_name: str, username: str):
         """
-        Add a new project to a user's project list.
+        Add a new project to a user's project list. Does nothing if the user already has it.
 
         Args:
             project_name (str): The name of the project.
@@ -152,14 +268,42 @@ class Account_Utilities:
         Raises:
             ValueError: If the project cannot be added.
         """
-        with h5py.File('/app/database/account_data.hdf5', 'a') as account_data:
+        try:
+            Account_Utilities.add_projects(username, [project_name])
+        except ValueError:
+            raise ValueError(f"There was an error adding Project {project_name} to {username}")
+
+    @staticmethod
+    def add_projects(username: str, project_names: list):
+        """
+        Add several projects to a user's project list with a single append to the dataset.
+        Projects the user already has are skipped.
+
+        Args:
+            username (str): The username of the user.
+            project_names (list): The names of the projects.
+
+        Raises:
+            ValueError: If the user does not exist or the projects cannot be added.
+        """
+        with Storage_Manager.write('account') as account_data:
+            member_table = Account_Utilities._member_table(account_data)
+            added = Account_Index.add_projects(username, project_names)
+            if added is None:
+                raise ValueError(f"User {username} does not exist")
+            if not added:
+                return
             try:
-                user_group = account_data[username]
-                project_dataset = user_group['Projects']
-                project_dataset.resize((project_dataset.shape[0] + 1,))
-                project_dataset[-1] = project_name.encode('utf-8')
-            except:
-                raise ValueError(f"There was an error adding Project {project_name} to {username}")
+                project_dataset = account_data[username]['Projects']
+                size = project_dataset.shape[0]
+                project_dataset.resize((size + len(added),))
+                project_dataset[size:] = [project_name.encode('utf-8') for project_name in added]
+                changed = set()
+                Account_Utilities._add_members([(project_name, username, size + i) for i, project_name in enumerate(added)], changed)
+                Account_Utilities._write_members(member_table, changed)
+            except Exception:
+                Account_Index.clear()
+                raise ValueError(f"There was an error adding projects to {username}")
 
     @staticmethod
     def delete_project(project_name: str, username: str):
@@ -171,23 +315,107 @@ class Account_Utilities:
             username (str): The username of the user.
 
         Raises:
-            ValueError: If the user or project does not exist.
+            ValueError: If the user or project dataset does not exist.
+        """
+        try:
+            Account_Utilities.remove_projects(username, [project_name])
+        except ValueError:
+            raise ValueError(f"User {username} or project dataset does not exist")
+
+    @staticmethod
+    def remove_projects(username: str, project_names: list):
         """
-        with h5py.File('/app/database/account_data.hdf5', 'a') as account_data:
+        Remove several projects from a user's project list. Each project is overwritten
+        with the last project of the list and the dataset is shrunk once, so the cost does
+        not depend on the length of the list. The order of the remaining projects changes.
+        Projects the user does not have are skipped.
+
+        Args:
+            username (str): The username of the user.
+            project_names (list): The names of the projects to remove.
+
+        Raises:
+            ValueError: If the user does not exist or the projects cannot be removed.
+        """
+        with Storage_Manager.write('account') as account_data:
+            member_table = Account_Utilities._member_table(account_data)
+            removed = [project_name for project_name in dict.fromkeys(project_names) if Account_Index.member_slot(project_name, username) is not None]
+            plan = Account_Index.remove_projects(username, project_names)
+            if plan is None:
+                raise ValueError(f"User {username} does not exist")
+            moves, size = plan
             try:
-                user_group = account_data[username]
-                project_dataset = user_group['Projects']
-                project_list = [p.decode('utf-8') for p in project_dataset[()]]
+                project_dataset = account_data[username]['Projects']
+                if size == project_dataset.shape[0]:
+                    return
+                if moves:
+                    slots = sorted(moves)
+                    project_dataset[slots] = [moves[slot].encode('utf-8') for slot in slots]
+                project_dataset.resize((size,))
+                changed = set()
+                for project_name in removed:
+                    Account_Utilities._remove_member(project_name, username, changed)
+                for slot, project_name in moves.items():
+                    Account_Utilities._set_slot(project_name, username, slot, changed)
+                Account_Utilities._write_members(member_table, changed)
+            except Exception:
+                Account_Index.clear()
+                raise ValueError(f"There was an error removing projects from {username}")
 
-                if project_name in project_list:
-                    project_list.remove(project_name)
+    @staticmethod
+    def get_members(project_name: str):
+        """
+        Retrieve the users whose project list holds a project, from the reverse index.
+
+        Args:
+            project_name (str): The name of the project.
 
-                    del user_group['Projects']
-                    user_group.create_dataset('Projects', shape=(0,), maxshape=(None,), dtype=h5py.string_dtype(encoding='utf-8'))
-                    for project in project_list:
-                        Account_Utilities.add_project(project, username)
-            except:
-                raise ValueError(f"User {username} or project dataset does not exist")
+        Returns:
+            list: The usernames of the members of the project.
+        """
+        if not Account_Index.members_loaded():
+            with Storage_Manager.write('account') as account_data:
+                Account_Utilities._member_table(account_data)
+        return Account_Index.members(project_name)
+
+    @staticmethod
+    def remove_project_members(project_name: str):
+        """
+        Remove a project from the project list of every member, in a single write to the
+        account store. The members are found in the reverse index, and each removal moves
+        the member's last project into the freed slot, so the cost grows with the number
+        of members and not with the length of their project lists.
+
+        Args:
+            project_name (str): The name of the project.
+
+        Returns:
+            list: The usernames of the members the project was removed from.
+
+        Raises:
+            ValueError: If the memberships cannot be removed.
+        """
+        with Storage_Manager.write('account') as account_data:
+            member_table = Account_Utilities._member_table(account_data)
+            members = Account_Index.members(project_name)
+            try:
+                changed = set()
+                for username in members:
+                    row, slot = Account_Index.member_slot(project_name, username)
+                    project_dataset = account_data[username]['Projects']
+                    last = project_dataset.shape[0] - 1
+                    if slot != last:
+                        moved = project_dataset[last]
+                        project_dataset[slot] = moved
+                        Account_Utilities._set_slot(moved.decode('utf-8'), username, slot, changed)
+                    project_dataset.resize((last,))
+                    Account_Utilities._remove_member(project_name, username, changed)
+                    Account_Index.invalidate(username)
+                Account_Utilities._write_members(member_table, changed)
+            except Exception:
+                Account_Index.clear()
+                raise ValueError(f"There was an error removing the members of Project {project_name}")
+            return members
 
     @staticmethod
     def get_project_list(username: str):
@@ -198,15 +426,199 @@ class Account_Utilities:
             username (str): The username of the user.
 
         Returns:
-            list: A list of project names.
+            list: A list of project names, or None if the user does not exist.
         """
-        with h5py.File('/app/database/account_data.hdf5', 'r') as account_data:
-            for user in account_data:
-                if user == username:
-                    user_group = account_data[user]
-                    project_dataset = user_group['Projects']
-                    project_list = [project.decode('utf-8') for project in project_dataset]
-                    return project_list
+        return Account_Index.projects(username)
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @staticmethod
+    def _password_fingerprint(password: str):
+        """
+        Return the keyed fingerprint of a password stored in the password index.
+        """
+        key = Server_Secret.derive("password-index")
+        return hmac.new(key, password.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def _password_index(account_data: h5py.File):
+        """
+        Return the group of the password index, creating it on first use. An index keyed
+        with another secret key, or written before the index recorded its key and accounts,
+        is dropped and created again. Every account already in the store then becomes
+        pending. Must be called with the account store write lock held.
+        """
+        key_id = hashlib.sha256(Server_Secret.derive("password-index")).hexdigest()[:16]
+        index_group = account_data.get(Account_Utilities._PASSWORD_INDEX)
+        if index_group is not None and index_group.attrs.get('Key') == key_id:
+            return index_group
+        if index_group is not None:
+            del account_data[Account_Utilities._PASSWORD_INDEX]
+        Account_Utilities._fingerprints = None
+        index_group = account_data.create_group(Account_Utilities._PASSWORD_INDEX)
+        string_dtype = h5py.string_dtype(encoding='utf-8')
+        for column in ('fingerprints', 'accounts', 'pending'):
+            index_group.create_dataset(column, shape=(0,), maxshape=(None,), chunks=(1024,), dtype=string_dtype)
+        Account_Utilities._append(index_group['pending'], [name for name in account_data.keys() if not name.startswith(Account_Utilities.RESERVED_PREFIX)])
+        index_group.attrs['Key'] = key_id
+        return index_group
+
+    @staticmethod
+    def _load_fingerprints(account_data: h5py.File):
+        """
+        Return the set of password fingerprints, reading the index on first use, and the
+        rows added since when another worker process changed the store. The indexed and
+        pending accounts are read along with them. Must be called with the account store
+        write lock held.
+        """
+        index_group = Account_Utilities._password_index(account_data)
+        generation = Storage_Manager.generation('account')
+        if Account_Utilities._fingerprints is None or generation != Account_Utilities._fingerprints_generation:
+            size = index_group['fingerprints'].shape[0]
+            pending_size = index_group['pending'].shape[0]
+            if Account_Utilities._fingerprints is None or size < Account_Utilities._fingerprints_read or pending_size < Account_Utilities._pending_read:
+                Account_Utilities._fingerprints = set()
+                Account_Utilities._fingerprints_read = 0
+                Account_Utilities._indexed = set()
+                Account_Utilities._unindexed = set()
+                Account_Utilities._pending_read = 0
+            if size > Account_Utilities._fingerprints_read:
+                Account_Utilities._fingerprints.update(index_group['fingerprints'].asstr()[Account_Utilities._fingerprints_read:size])
+                indexed = set(index_group['accounts'].asstr()[Account_Utilities._fingerprints_read:size])
+                indexed.discard("")
+                Account_Utilities._indexed |= indexed
+                Account_Utilities._unindexed -= indexed
+                Account_Utilities._fingerprints_read = size
+            if pending_size > Account_Utilities._pending_read:
+                pending = index_group['pending'].asstr()[Account_Utilities._pending_read:pending_size]
+                Account_Utilities._unindexed.update(name for name in pending if name not in Account_Utilities._indexed)
+                Account_Utilities._pending_read = pending_size
+            Account_Utilities._fingerprints_generation = generation
+        return Account_Utilities._fingerprints
+
+    @staticmethod
+    def _index_password(username: str, password: str):
+        """
+        Add the fingerprint of the password of an account to the password index, if the
+        account is not indexed yet.
+        """
+        with Storage_Manager.write('account') as account_data:
+            Account_Utilities._load_fingerprints(account_data)
+            if username not in Account_Utilities._indexed:
+                Account_Utilities._index_accounts(account_data, [username], [password])
+
+    @staticmethod
+    def _index_accounts(account_data: h5py.File, usernames: list, passwords: list = None):
+        """
+        Add accounts to the password index with the fingerprints of their passwords, or list
+        them as pending if they are not given. Must be called with the account store write
+        lock held.
+        """
+        Account_Utilities._load_fingerprints(account_data)
+        index_group = account_data[Account_Utilities._PASSWORD_INDEX]
+        if passwords is None:
+            Account_Utilities._append(index_group['pending'], usernames)
+            Account_Utilities._unindexed.update(usernames)
+            Account_Utilities._pending_read = index_group['pending'].shape[0]
+            return
+        fingerprints = [Account_Utilities._password_fingerprint(password) for password in passwords]
+        Account_Utilities._append(index_group['fingerprints'], fingerprints)
+        Account_Utilities._append(index_group['accounts'], usernames)
+        Account_Utilities._fingerprints.update(fingerprints)
+        Account_Utilities._indexed.update(usernames)
+        Account_Utilities._unindexed.difference_update(usernames)
+        Account_Utilities._fingerprints_read = index_group['fingerprints'].shape[0]
+
+    @staticmethod
+    def _append(dataset: h5py.Dataset, values: list):
+        """
+        Append values to a resizable one-dimensional dataset with one write.
+        """
+        if values:
+            size = dataset.shape[0]
+            dataset.resize((size + len(values),))
+            dataset[size:] = values
+
+    @staticmethod
+    def _member_table(account_data: h5py.File):
+        """
+        Return the group of the membership table, loading it into the reverse index of the
+        Account_Index on first use. The table is built from the project list of every user
+        if the store has none. Must be called with the account store write lock held.
+        """
+        if Account_Utilities._MEMBER_INDEX not in account_data:
+            rows = []
+            for username in account_data.keys():
+                if username.startswith(Account_Utilities.RESERVED_PREFIX):
+                    continue
+                names = [project.decode('utf-8') for project in account_data[username]['Projects'][()]]
+                slots = {project_name: slot for slot, project_name in enumerate(names)}
+                rows.extend((project_name, username, slot) for project_name, slot in slots.items())
+            member_table = account_data.create_group(Account_Utilities._MEMBER_INDEX)
+            string_dtype = h5py.string_dtype(encoding='utf-8')
+            for column, dtype in (("project", string_dtype), ("member", string_dtype), ("slot", "int64")):
+                member_table.create_dataset(column, shape=(0,), maxshape=(None,), chunks=(1024,), dtype=dtype)
+            Account_Index.load_members([])
+            changed = set()
+            Account_Utilities._add_members(rows, changed)
+            Account_Utilities._write_members(member_table, changed)
+        elif not Account_Index.members_loaded():
+            member_table = account_data[Account_Utilities._MEMBER_INDEX]
+            Account_Index.load_members(zip(member_table['project'].asstr()[()], member_table['member'].asstr()[()], member_table['slot'][()].tolist()))
+        return account_data[Account_Utilities._MEMBER_INDEX]
+
+    @staticmethod
+    def _add_members(entries: list, changed: set):
+        """
+        Append (project name, username, slot) memberships to the reverse index, adding the
+        rows they take to the set of changed rows.
+        """
+        if entries:
+            first = Account_Index.add_members(entries)
+            changed.update(range(first, first + len(entries)))
+
+    @staticmethod
+    def _remove_member(project_name: str, username: str, changed: set):
+        """
+        Remove a membership from the reverse index by moving the last row into its place,
+        adding that row to the set of changed rows.
+        """
+        removed = Account_Index.remove_member(project_name, username)
+        if removed is not None and removed[1] is not None:
+            changed.add(removed[0])
+
+    @staticmethod
+    def _set_slot(project_name: str, username: str, slot: int, changed: set):
+        """
+        Change the slot of a membership in the reverse index, adding its row to the set of
+        changed rows.
+        """
+        row = Account_Index.set_slot(project_name, username, slot)
+        if row is not None:
+            changed.add(row)
+
+    @staticmethod
+    def _write_members(member_table: h5py.Group, changed: set):
+        """
+        Write the changed rows of the reverse index to the membership table, and resize the
+        table to the size of the index, with one write and one resize per column.
+        """
+        rows = sorted(changed)
+        values, size = Account_Index.member_rows(rows)
+        rows = rows[:len(values)]
+        for position, column in enumerate(("project", "member", "slot")):
+            dataset = member_table[column]
+            if dataset.shape[0] != size:
+                dataset.resize((size,))
+            if not rows:
+                continue
+            column_values = [value[position] for value in values]
+            if rows[-1] - rows[0] + 1 == len(rows):
+                dataset[rows[0]:rows[-1] + 1] = column_values
+            else:
+                dataset[rows] = column_values
 
     #################################################
     # THE FOLLOWING FUNCTION IS TO RESET THE DATABASE
@@ -219,13 +631,42 @@ class Account_Utilities:
 
         Creates default users and assigns one project to each user.
         """
-        with h5py.File('/app/database/account_data.hdf5', 'w') as account_data:
-            Account_Utilities.add_user('user1', 'password1')
-            Account_Utilities.add_user('user2', 'password2')
-            Account_Utilities.add_user('user3', 'password3')
-            Account_Utilities.add_user('user4', 'password4')
+        Storage_Manager.truncate('account')
+        Account_Index.clear()
+        Account_Utilities._fingerprints = None
+        Account_Utilities.add_user('user1', 'password1')
+        Account_Utilities.add_user('user2', 'password2')
+        Account_Utilities.add_user('user3', 'password3')
+        Account_Utilities.add_user('user4', 'password4')
 
         Account_Utilities.add_project('Project1', 'user1')
         Account_Utilities.add_project('Project2', 'user2')
         Account_Utilities.add_project('Project3', 'user3')
         Account_Utilities.add_project('Project4', 'user4')
+
+    @staticmethod
+    def load_snapshot(snapshot_dir: str):
+        """
+        Replace every account with those of a prebuilt snapshot of the database, such as the
+        sample data written by tools/build_fixture.py. The account file is copied as a whole
+        instead of being rebuilt one account at a time.
+
+        Args:
+            snapshot_dir (str): The directory holding the snapshot files.
+        """
+        Storage_Manager.restore('account', os.path.join(snapshot_dir, Storage_Manager.STORES['account']))
+        Account_Index.clear()
+        Account_Utilities._fingerprints = None
+
+    @staticmethod
+    def stats():
+        """
+        Return the number of accounts of the password index, as last read by this process.
+
+        Returns:
+            dict: The password policy, and the number of indexed and pending accounts.
+        """
+        loaded = Account_Utilities._fingerprints is not None
+        return {"policy": Account_Utilities.PASSWORD_POLICY, "loaded": loaded,
+                "indexed": len(Account_Utilities._indexed) if loaded else 0,
+                "pending": len(Account_Utilities._unindexed) if loaded else 0}
@@ -0,0 +1,177 @@
+import threading
+
+from utilities.operation_log import Operation_Log
+from utilities.project_store import Project_Store
+from utilities.storage_manager import Storage_Manager
+
+class Assignee_Index:
+    """
+    Global inverted index from assignee to the tasks assigned to them, across every project.
+
+    The index maps each username to the set of (project name, task id) pairs assigned to
+    them, and keeps the reverse mapping from each project to the assignee of each of its
+    tasks, so that a write can move or drop entries without reading the project. The
+    project write paths apply every logged operation to the index, after it is appended
+    to the Operation_Log.
+
+    The index is held in memory only. It is built on first use, or at startup, from the
+    'tasks/id' and 'tasks/assignee' columns of every project in the project stores, with
+    the pending log records applied on top, so it survives restarts without being stored.
+
+    Methods:
+        start(): Build the index if it has not been built yet.
+        lookup(username): Return the tasks assigned to a user.
+        apply(operation): Apply a logged project operation to the index.
+        clear(): Drop the index, so it is rebuilt on next use.
+        stats(): Return the size of the index.
+    """
+
+    _lock = threading.RLock()
+    _assignees = None
+    _projects = None
+
+    @classmethod
+    def start(cls):
+        """
+        Build the index if it has not been built yet.
+        """
+        with Operation_Log.lock():
+            with cls._lock:
+                if cls._assignees is None:
+                    cls._build()
+
+    @classmethod
+    def lookup(cls, username: str):
+        """
+        Return the tasks assigned to a user.
+
+        Args:
+            username (str): The username of the assignee.
+
+        Returns:
+            list: A list of (project name, task id) tuples.
+        """
+        Operation_Log.sync()
+        if cls._assignees is None:
+            cls.start()
+        with cls._lock:
+            return list(cls._assignees.get(username, ()))
+
+    @classmethod
+    def apply(cls, operation: dict):
+        """
+        Apply a logged project operation to the index. Does nothing until the index is
+        built, since building it reads every operation already in the logs. Must be called
+        with the lock of the operation log of the project held, after the operation is appended.
+
+        Args:
+            operation (dict): A Project_Operations operation.
+        """
+        with cls._lock:
+            if cls._assignees is None:
+                return
+            name = operation["op"]
+            project_name = operation["project"]
+
+            if name == "create_project":
+                cls._drop_project(project_name)
+                for task in operation["data"].tasks:
+                    cls._assign(project_name, task.task_id, task.assignee)
+            elif name == "delete_project":
+                cls._drop_project(project_name)
+            elif name == "add_task":
+                cls._assign(project_name, operation["task"].task_id, operation["task"].assignee)
+            elif name == "set_tasks":
+                cls._drop_project(project_name)
+                for task in operation["tasks"]:
+                    cls._assign(project_name, task.task_id, task.assignee)
+            elif name == "set_field" and operation["field"] == "assignee":
+                cls._unassign(project_name, operation["task_id"])
+                cls._assign(project_name, operation["task_id"], operation["value"])
+            elif name == "delete_task":
+                cls._unassign(project_name, operation["task_id"])
+
+    @classmethod
+    def clear(cls):
+        """
+        Drop the index, so it is rebuilt from the project store on next use.
+        """
+        with cls._lock:
+            cls._assignees = None
+            cls._projects = None
+
+    @classmethod
+    def stats(cls):
+        """
+        Return the size of the index.
+
+        Returns:
+            dict: Whether the index is built, and its number of assignees and entries.
+        """
+        with cls._lock:
+            if cls._assignees is None:
+                return {"built": False, "assignees": 0, "entries": 0}
+            return {
+                "built": True,
+                "assignees": len(cls._assignees),
+                "entries": sum(len(entries) for entries in cls._assignees.values()),
+            }
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @classmethod
+    def _build(cls):
+        """
+        Build the index from the project stores and the pending log records. Must be called
+        with the locks of every operation log and the index lock held.
+        """
+        cls._assignees = {}
+        cls._projects = {}
+        records = Operation_Log.records()
+        checkpoints = {}
+        for store in Storage_Manager.project_stores():
+            with Storage_Manager.read(store) as project_data:
+                checkpoints[store] = Operation_Log.checkpoint(project_data)
+                for project_name in project_data.keys():
+                    assignees = Project_Store.read_task_field(project_data, project_name, "assignee")
+                    for task_id, assignee in assignees.items():
+                        cls._assign(project_name, task_id, assignee)
+
+        for seq, operations in records:
+            for operation in operations:
+                if seq > checkpoints[Storage_Manager.project_store(operation["project"])]:
+                    cls.apply(operation)
+
+    @classmethod
+    def _assign(cls, project_name: str, task_id: int, assignee: str):
+        """
+        Record that a task is assigned to a user. Tasks without an assignee are not indexed.
+        """
+        if not assignee:
+            return
+        cls._projects.setdefault(project_name, {})[task_id] = assignee
+        cls._assignees.setdefault(assignee, set()).add((project_name, task_id))
+
+    @classmethod
+    def _unassign(cls, project_name: str, task_id: int):
+        """
+        Remove the entry of a task, if it has one.
+        """
+        assignee = cls._projects.get(project_name, {}).pop(task_id, None)
+        if assignee is None:
+            return
+        entries = cls._assignees[assignee]
+        entries.discard((project_name, task_id))
+        if not entries:
+            del cls._assignees[assignee]
+
+    @classmethod
+    def _drop_project(cls, project_name: str):
+        """
+        Remove the entries of every task of a project.
+        """
+        for task_id in list(cls._projects.get(project_name, {})):
+            cls._unassign(project_name, task_id)
+        cls._projects.pop(project_name, None)
@@ -0,0 +1,244 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from utilities.account_utilities import Account_Utilities
+from utilities.metrics import Metrics
+from utilities.password_hashing import Password_Hashing
+
+class Async_Facade:
+    """
+    Runs the blocking work of the request handlers away from the event loop.
+
+    CPU-bound bcrypt hashing is sent to a pool of HASH_WORKERS processes, so a password
+    check neither holds the event loop nor competes for the GIL with the storage threads.
+    Blocking HDF5 and log I/O is sent to a pool of STORAGE_WORKERS threads. While a login
+    waits for bcrypt, other requests keep being served from the storage pool.
+
+    For each pool the facade counts the submitted and completed calls and the calls in
+    flight, from which the queue depth is derived, and the time calls spend queued (wait)
+    and running. stats returns these counters. The wait of every call, and the run time of
+    the bcrypt calls, which the worker processes cannot record themselves, are also
+    recorded in the Metrics.
+
+    Attributes:
+        HASH_WORKERS (int): The number of bcrypt worker processes (HONEYDUE_HASH_WORKERS).
+        STORAGE_WORKERS (int): The number of storage worker threads (HONEYDUE_STORAGE_WORKERS).
+
+    Methods:
+        start(): Start the worker pools.
+        stop(): Wait for running calls and stop the worker pools.
+        storage(function, *args): Run a blocking storage call on the storage pool.
+        hash(function, *args): Run a bcrypt call on the hash pool.
+        login(username, password): Check the credentials of an account.
+        signup(username, password): Create an account.
+        stats(): Return the queue and timing counters of each pool.
+    """
+
+    HASH_WORKERS = int(os.environ.get("HONEYDUE_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+    STORAGE_WORKERS = int(os.environ.get("HONEYDUE_STORAGE_WORKERS", 8))
+
+    _lock = threading.Lock()
+    _pools = {}
+    _metrics = {}
+    _BCRYPT_OPERATIONS = {"hash_password": "hash", "check_password": "check"}
+
+    ###########################
+    ### LIFECYCLE FUNCTIONS ###
+    ###########################
+
+    @classmethod
+    def start(cls):
+        """
+        Start the worker pools if they are not running.
+        """
+        with cls._lock:
+            if "hash" not in cls._pools:
+                # Worker processes are spawned, not forked, since the parent already runs threads
+                cls._pools["hash"] = ProcessPoolExecutor(max_workers=cls.HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            if "storage" not in cls._pools:
+                cls._pools["storage"] = ThreadPoolExecutor(max_workers=cls.STORAGE_WORKERS, thread_name_prefix="storage")
+            for pool in cls._pools:
+                cls._metrics.setdefault(pool, cls._new_metrics())
+
+    @classmethod
+    def stop(cls):
+        """
+        Wait for the running calls to finish and stop the worker pools.
+        """
+        with cls._lock:
+            pools, cls._pools = cls._pools, {}
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+
+    ##########################
+    ### EXECUTOR FUNCTIONS ###
+    ##########################
+
+    @classmethod
+    async def storage(cls, function, *args):
+        """
+        Run a blocking storage call on the storage pool.
+
+        Args:
+            function (callable): The function to call.
+            *args: The arguments of the call.
+
+        Returns:
+            The result of the call. Exceptions raised by the call are raised here.
+        """
+        return await cls._run("storage", function, args)
+
+    @classmethod
+    async def hash(cls, function, *args):
+        """
+        Run a bcrypt call on the hash pool. The function and its arguments must be picklable.
+
+        Args:
+            function (callable): The function to call, such as a Password_Hashing function.
+            *args: The arguments of the call.
+
+        Returns:
+            The result of the call. Exceptions raised by the call are raised here.
+        """
+        return await cls._run("hash", function, args)
+
+    ######################
+    ### AUTH FUNCTIONS ###
+    ######################
+
+    @classmethod
+    async def login(cls, username: str, password: str):
+        """
+        Check the credentials of an account. The stored hash is read on the storage pool
+        and checked on the hash pool.
+
+        Args:
+            username (str): The username of the account.
+            password (str): The password of the account.
+
+        Returns:
+            bool: True if the account exists and the password matches, False otherwise.
+        """
+        stored_hash = await cls.storage(Account_Utilities.get_password_hash, username)
+        if stored_hash is None:
+            return False
+        if not await cls.hash(Password_Hashing.check_password, password, stored_hash):
+            return False
+        await cls.storage(Account_Utilities.index_password, username, password)
+        return True
+
+    @classmethod
+    async def signup(cls, username: str, password: str):
+        """
+        Create an account. The password is hashed on the hash pool before the account is written.
+
+        Args:
+            username (str): The username of the new user.
+            password (str): The password of the new user.
+
+        Raises:
+            ValueError: If the username or password cannot be used.
+        """
+        if await cls.storage(Account_Utilities.username_exists, username):
+            raise ValueError("Username already exists.")
+        hashed_password = await cls.hash(Password_Hashing.hash_password, password)
+        await cls.storage(Account_Utilities.add_user, username, password, hashed_password)
+
+    @classmethod
+    def stats(cls):
+        """
+        Return the queue and timing counters of each pool.
+
+        Returns:
+            dict: For each pool, its size, the number of submitted, completed, running and
+                  queued calls, and the total and maximum wait and run times in milliseconds.
+        """
+        with cls._lock:
+            stats = {}
+            for pool, metrics in cls._metrics.items():
+                workers = cls.HASH_WORKERS if pool == "hash" else cls.STORAGE_WORKERS
+                stats[pool] = dict(metrics)
+                stats[pool]["workers"] = workers
+                stats[pool]["running"] = min(metrics["in_flight"], workers)
+                stats[pool]["queued"] = max(0, metrics["in_flight"] - workers)
+            return stats
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @classmethod
+    async def _run(cls, pool: str, function, args: tuple):
+        """
+        Submit a call to a pool and wait for it, recording how long it was queued and how long it ran.
+        """
+        if pool not in cls._pools:
+            cls.start()
+        submitted = time.time()
+        with cls._lock:
+            metrics = cls._metrics[pool]
+            metrics["submitted"] += 1
+            metrics["in_flight"] += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            started, finished, result = await loop.run_in_executor(cls._pools[pool], _timed_call, function, args)
+        except _Timed_Error as error:
+            cls._record(pool, function, submitted, error.started, error.finished)
+            raise error.error from None
+        finally:
+            with cls._lock:
+                metrics["in_flight"] -= 1
+                metrics["completed"] += 1
+        cls._record(pool, function, submitted, started, finished)
+        return result
+
+    @classmethod
+    def _record(cls, pool: str, function, submitted: float, started: float, finished: float):
+        """
+        Add the wait and run time of a completed call to the counters of its pool and to the Metrics.
+        """
+        wait = max(0.0, started - submitted) * 1000
+        run = max(0.0, finished - started) * 1000
+        Metrics.observe("honeydue_executor_wait_seconds", wait / 1000, (("pool", pool),))
+        if pool == "hash":
+            Metrics.observe("honeydue_bcrypt_seconds", run / 1000, (("operation", cls._BCRYPT_OPERATIONS.get(function.__name__, function.__name__)),))
+        with cls._lock:
+            metrics = cls._metrics[pool]
+            metrics["wait_ms_total"] += wait
+            metrics["wait_ms_max"] = max(metrics["wait_ms_max"], wait)
+            metrics["run_ms_total"] += run
+
+    @staticmethod
+    def _new_metrics():
+        """
+        Return the counters of a pool that has not run anything yet.
+        """
+        return {"submitted": 0, "in_flight": 0, "completed": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "run_ms_total": 0.0}
+
+class _Timed_Error(Exception):
+    """
+    Carries an exception raised by a pooled call together with the times the call started and finished.
+    """
+
+    def __init__(self, error, started, finished):
+        super().__init__(error, started, finished)
+        self.error = error
+        self.started = started
+        self.finished = finished
+
+def _timed_call(function, args):
+    """
+    Call a function in a worker and return the wall-clock times it started and finished with its result.
+    """
+    started = time.time()
+    try:
+        result = function(*args)
+    except Exception as error:
+        raise _Timed_Error(error, started, time.time())
+    return started, time.time(), result
@@ -0,0 +1,174 @@
+import bisect
+import os
+import threading
+
+class Metrics:
+    """
+    Process-wide counters and histograms, exposed in the Prometheus text format at /__internal/metrics.
+
+    Every metric is declared once in FAMILIES with its type, help text and, for histograms,
+    the upper bounds of its buckets. Recording a value costs a dictionary lookup and an
+    addition under a lock: histograms keep one count per bucket and only accumulate them
+    into Prometheus' cumulative buckets when rendered, so the cost of a request does not
+    depend on whether anyone scrapes. Gauges are set by the metrics endpoint itself, just
+    before rendering.
+
+    Labels are passed as a tuple of (name, value) pairs, so a series is keyed without
+    building a dictionary. Label values must come from a bounded set, such as route
+    templates or store names, never usernames or project names.
+
+    With several uvicorn workers, each worker keeps its own metrics and a scrape is
+    answered by whichever worker accepts it; the worker is told apart by its pid label.
+    Calls run in the bcrypt worker processes of the Async_Facade are recorded by the
+    facade in the server process.
+
+    Attributes:
+        ENABLED (bool): Whether metrics are recorded and served (HONEYDUE_METRICS).
+        FAMILIES (dict): The type, help text and bucket bounds of every metric, by name.
+
+    Methods:
+        increment(name, amount, labels): Add to a counter.
+        observe(name, value, labels): Record a value in a histogram.
+        set(name, value, labels): Set a gauge.
+        render(): Return every metric in the Prometheus text format.
+        clear(): Drop every recorded value.
+    """
+
+    ENABLED = os.environ.get("HONEYDUE_METRICS", "1") == "1"
+
+    _SECONDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    _BYTES = tuple(4 ** exponent for exponent in range(4, 14))
+    _TASKS = (10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000, 300000, 1000000)
+
+    FAMILIES = {
+        "honeydue_http_request_duration_seconds": ("histogram", "Time to serve a request, by method, route template and status.", _SECONDS),
+        "honeydue_hdf5_opens_total": ("counter", "HDF5 store files opened, by store.", None),
+        "honeydue_hdf5_read_bytes_total": ("counter", "Bytes of task column values read from the HDF5 stores.", None),
+        "honeydue_hdf5_written_bytes_total": ("counter", "Bytes of task column values written to the HDF5 stores.", None),
+        "honeydue_project_tasks": ("histogram", "Number of tasks of the project task lists read from the HDF5 stores.", _TASKS),
+        "honeydue_log_read_bytes_total": ("counter", "Bytes read from the operation log file.", None),
+        "honeydue_log_written_bytes_total": ("counter", "Bytes appended to the operation log file.", None),
+        "honeydue_codec_seconds": ("histogram", "Time to encode or decode a record, by codec and operation.", _SECONDS),
+        "honeydue_codec_bytes": ("histogram", "Size of the records encoded or decoded, by codec and operation.", _BYTES),
+        "honeydue_bcrypt_seconds": ("histogram", "Time of a bcrypt call, by operation.", _SECONDS),
+        "honeydue_executor_wait_seconds": ("histogram", "Time a call waited for an Async_Facade worker, by pool.", _SECONDS),
+        "honeydue_store_file_bytes": ("gauge", "Size of the file backing each store.", None),
+        "honeydue_background_errors_total": ("counter", "Exceptions raised by a background task, by task.", None),
+    }
+
+    _lock = threading.Lock()
+    _values = {}
+
+    @classmethod
+    def increment(cls, name: str, amount: float = 1, labels: tuple = ()):
+        """
+        Add to a counter.
+
+        Args:
+            name (str): The name of a counter declared in FAMILIES.
+            amount (float): The amount to add.
+            labels (tuple): The (name, value) pairs of the series.
+        """
+        if not cls.ENABLED:
+            return
+        key = (name, labels)
+        with cls._lock:
+            cls._values[key] = cls._values.get(key, 0) + amount
+
+    @classmethod
+    def observe(cls, name: str, value: float, labels: tuple = ()):
+        """
+        Record a value in a histogram.
+
+        Args:
+            name (str): The name of a histogram declared in FAMILIES.
+            value (float): The observed value, in seconds for durations.
+            labels (tuple): The (name, value) pairs of the series.
+        """
+        if not cls.ENABLED:
+            return
+        bounds = cls.FAMILIES[name][2]
+        bucket = bisect.bisect_left(bounds, value)
+        key = (name, labels)
+        with cls._lock:
+            series = cls._values.get(key)
+            if series is None:
+                # One count per bucket and one past the last bound, then the sum
+                series = cls._values[key] = [0] * (len(bounds) + 1) + [0.0]
+            series[bucket] += 1
+            series[-1] += value
+
+    @classmethod
+    def set(cls, name: str, value: float, labels: tuple = ()):
+        """
+        Set a gauge.
+
+        Args:
+            name (str): The name of a gauge declared in FAMILIES.
+            value (float): The value of the gauge.
+            labels (tuple): The (name, value) pairs of the series.
+        """
+        if not cls.ENABLED:
+            return
+        with cls._lock:
+            cls._values[(name, labels)] = value
+
+    @classmethod
+    def render(cls):
+        """
+        Return every metric in the Prometheus text exposition format (version 0.0.4).
+
+        Returns:
+            str: The metric families with their series.
+        """
+        families = {name: [] for name in cls.FAMILIES}
+        with cls._lock:
+            for (name, labels), value in cls._values.items():
+                families[name].append((labels, list(value) if isinstance(value, list) else value))
+        pid = (("pid", str(os.getpid())),)
+        lines = []
+        for name, (kind, description, bounds) in cls.FAMILIES.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(families[name]):
+                labels = pid + labels
+                if kind != "histogram":
+                    lines.append(f"{name}{Metrics._labels(labels)} {Metrics._number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(bounds + (float("inf"),), value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{Metrics._labels(labels + (('le', Metrics._number(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{Metrics._labels(labels)} {Metrics._number(value[-1])}")
+                lines.append(f"{name}_count{Metrics._labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def clear(cls):
+        """
+        Drop every recorded value.
+        """
+        with cls._lock:
+            cls._values.clear()
+
+    @staticmethod
+    def _labels(labels: tuple):
+        """
+        Format label pairs as {name="value",...}, escaping the values.
+        """
+        escaped = []
+        for name, value in labels:
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            escaped.append(f'{name}="{value}"')
+        return "{" + ",".join(escaped) + "}"
+
+    @staticmethod
+    def _number(value: float):
+        """
+        Format a sample value or bucket bound as Prometheus expects it.
+        """
+        if value == float("inf"):
+            return "+Inf"
+        if isinstance(value, int) or float(value).is_integer():
+            return str(int(value))
+        return repr(float(value))
@@ -0,0 +1,557 @@
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+from contextlib import ExitStack, contextmanager
+
+from utilities.metrics import Metrics
+from utilities.project_codec import Project_Codec
+from utilities.project_operations import Project_Operations
+from utilities.storage_manager import Storage_Manager
+from utilities.worker_coordinator import Worker_Coordinator
+
+logger = logging.getLogger(__name__)
+
+class Operation_Log:
+    """
+    Append-only write-ahead logs of project operations, one for each project store.
+
+    Every project mutation is appended to the log of the store holding its project, and
+    made durable, before the project store is touched, so a write costs one small
+    sequential append. Each log has its own file, lock and sequence numbers, so writes to
+    projects in different shards neither wait for each other's lock nor share an fsync.
+    Records that have not yet been folded into their project store are kept in memory and
+    applied on top of the store by readers. A background compactor periodically folds the
+    pending records of each log into its store, records the sequence number of the last
+    record folded in the store's 'log_seq' attribute, and drops the folded records from
+    the log, so readers skip the records at or below that checkpoint. After a crash each
+    log is read back on first use, so every acknowledged write is replayed.
+
+    The log of the store project_data.hdf5 is project_data.log, and the log of the shard
+    project_data-N.hdf5 is project_data-N.log. A sharded database whose shards still share
+    the single project_data.log, as every shard did before each had its own log, has that
+    log folded into its stores and removed at start.
+
+    Each record holds the list of operations of one write, so a record is applied
+    all-or-nothing. On disk a record is framed as
+
+        sequence (uint64) | payload length (uint32) | crc32 (uint32) | encoded operations
+
+    where the operations are encoded with Project_Codec. A torn or corrupted record at the
+    end of the log is discarded on recovery. A record with a valid checksum that is not
+    encoded with Project_Codec is refused: it is never unpickled, since anyone able to
+    write the log file could otherwise run code in the server.
+
+    When several worker processes share the logs (see Worker_Coordinator), readers hold the
+    file lock of a log shared and writers exclusive. A process that finds a log changed by another
+    reads the frames appended since it last looked, or the whole log if it was rewritten,
+    and passes the operations of each new record to the subscribed functions, so caches
+    built on top of the log stay current. When that is not possible, because the log was
+    reset or another process folded records this one never read, None is passed instead,
+    and the caches must be dropped.
+
+    Attributes:
+        SHARED_FILE_NAME (str): The log every shard of a sharded database used to share.
+        FSYNC (bool): Whether each append is fsynced before it is acknowledged.
+        COMPACT_INTERVAL (float): The number of seconds between compactions.
+        COMPACT_RECORDS (int): The number of pending records that triggers an early compaction.
+
+    Methods:
+        start(): Start the background compactor.
+        stop(): Stop the background compactor and fold every pending record.
+        lock(project_name): Return a context manager serializing the writers of a project's log, or of every log.
+        subscribe(function): Register a function called with records appended by other processes.
+        sync(project_name): Read the records appended by other processes.
+        append(operations): Durably append one record.
+        pending(project_name): Return the pending records of a project.
+        records(): Return every pending record.
+        checkpoint(project_data): Return the sequence number folded into the project store.
+        compact(): Fold every pending record into the project stores.
+        truncate(): Drop every record.
+        path(store): Return the path of the log of a project store.
+    """
+
+    SHARED_FILE_NAME = "project_data.log"
+    FSYNC = os.environ.get("HONEYDUE_LOG_FSYNC", "1") == "1"
+    COMPACT_INTERVAL = float(os.environ.get("HONEYDUE_COMPACT_INTERVAL", 5.0))
+    COMPACT_RECORDS = int(os.environ.get("HONEYDUE_COMPACT_RECORDS", 1000))
+
+    _HEADER = struct.Struct("<QII")
+
+    _setup_lock = threading.Lock()
+    _compact_lock = threading.Lock()
+    _locks = {}
+    _files = {}
+    _records = {}
+    _next_seq = {}
+    _inodes = {}
+    _offsets = {}
+    _subscribers = []
+    _compactor = None
+    _stop_event = threading.Event()
+    _wake_event = threading.Event()
+
+    ###########################
+    ### LIFECYCLE FUNCTIONS ###
+    ###########################
+
+    @classmethod
+    def start(cls):
+        """
+        Fold a log shared by every shard, recover the log of every project store and start
+        the background compactor.
+        """
+        cls._fold_shared_log()
+        for store in Storage_Manager.project_stores():
+            with cls._lock_of(store):
+                cls._open(store)
+        if cls._compactor is not None and cls._compactor.is_alive():
+            return
+        cls._stop_event.clear()
+        cls._compactor = threading.Thread(target=cls._compact_loop, name="log-compactor", daemon=True)
+        cls._compactor.start()
+
+    @classmethod
+    def stop(cls):
+        """
+        Stop the background compactor, fold every pending record and close the logs.
+        """
+        cls._stop_event.set()
+        cls._wake_event.set()
+        if cls._compactor is not None:
+            cls._compactor.join()
+            cls._compactor = None
+        cls.compact()
+        for store in list(cls._files):
+            with cls._lock_of(store):
+                log_file = cls._files.pop(store, None)
+                if log_file is not None:
+                    log_file.close()
+                cls._records.pop(store, None)
+
+    #####################
+    ### LOG FUNCTIONS ###
+    #####################
+
+    @classmethod
+    def lock(cls, project_name: str = None):
+        """
+        Return the lock that writers of a project hold while they validate and append an
+        operation: the lock of the log of the store holding the project, so writers of
+        projects in other shards are not held up. Without a project, the locks of every log
+        are held, taken in store order.
+
+        Args:
+            project_name (str, optional): The name of the project that will be written.
+
+        Returns:
+            contextmanager: The writer lock, across every worker process.
+        """
+        if project_name is not None:
+            return cls._hold(Storage_Manager.project_store(project_name), True)
+        return cls._hold_all()
+
+    @classmethod
+    def subscribe(cls, function):
+        """
+        Register a function called with the operations of each record appended by another
+        worker process, or with None when records were missed and caches built from the log
+        must be dropped. It is called with the log lock held.
+
+        Args:
+            function (callable): The function to call.
+        """
+        cls._subscribers.append(function)
+
+    @classmethod
+    def sync(cls, project_name: str = None):
+        """
+        Read the records appended by other worker processes since the log was last used.
+        Costs a read of the shared epoch file per log when nothing changed.
+
+        Args:
+            project_name (str, optional): Only read the log of the store holding this
+                                          project. Every log is read if omitted.
+        """
+        stores = Storage_Manager.project_stores() if project_name is None else [Storage_Manager.project_store(project_name)]
+        for store in stores:
+            if Worker_Coordinator.stale(cls._resource(store)):
+                with cls._hold(store, False):
+                    pass
+
+    @classmethod
+    def append(cls, operations: list):
+        """
+        Durably append one record holding the given operations to the log of the store
+        holding their project.
+
+        Args:
+            operations (list): The operations of one write, applied all-or-nothing.
+
+        Returns:
+            int: The sequence number of the record in its log.
+
+        Raises:
+            ValueError: If the operations touch projects of more than one project store.
+        """
+        stores = {Storage_Manager.project_store(operation["project"]) for operation in operations}
+        if len(stores) != 1:
+            raise ValueError("The operations of a record must touch the projects of a single project store.")
+        store = stores.pop()
+        with cls._hold(store, True):
+            cls._open(store)
+            seq = cls._next_seq[store]
+            frame = cls._frame(seq, operations)
+            log_file = cls._files[store]
+            if Worker_Coordinator.ENABLED and os.fstat(log_file.fileno()).st_size > cls._offsets[store]:
+                # A torn frame left by a crashed worker, which recovery under a shared lock does not cut
+                log_file.truncate(cls._offsets[store])
+            log_file.write(frame)
+            log_file.flush()
+            Metrics.increment("honeydue_log_written_bytes_total", len(frame))
+            if cls.FSYNC:
+                os.fsync(log_file.fileno())
+            cls._records[store].append((seq, operations, frame))
+            cls._next_seq[store] += 1
+            cls._offsets[store] += len(frame)
+            Worker_Coordinator.changed(cls._resource(store))
+            if len(cls._records[store]) >= cls.COMPACT_RECORDS:
+                cls._wake_event.set()
+            return seq
+
+    @classmethod
+    def pending(cls, project_name: str):
+        """
+        Return the pending records that touch a project, in log order.
+
+        Args:
+            project_name (str): The name of the project.
+
+        Returns:
+            list: A list of (sequence, operations) tuples, where operations only holds
+                  the operations on the given project.
+        """
+        store = Storage_Manager.project_store(project_name)
+        with cls._hold(store, False):
+            cls._open(store)
+            pending = []
+            for seq, operations, _ in cls._records[store]:
+                project_operations = [operation for operation in operations if operation["project"] == project_name]
+                if project_operations:
+                    pending.append((seq, project_operations))
+            return pending
+
+    @classmethod
+    def records(cls):
+        """
+        Return every pending record, in log order, one project store after another. The
+        sequence numbers are those of each store's own log, so a record is compared with the
+        checkpoint of the store holding its projects.
+
+        Returns:
+            list: A list of (sequence, operations) tuples.
+        """
+        records = []
+        for store in Storage_Manager.project_stores():
+            with cls._hold(store, False):
+                cls._open(store)
+                records.extend((seq, operations) for seq, operations, _ in cls._records[store])
+        return records
+
+    @staticmethod
+    def checkpoint(project_data):
+        """
+        Return the sequence number of the last record folded into a project store.
+
+        Args:
+            project_data (h5py.File): The open project store.
+
+        Returns:
+            int: The sequence number, or 0 if nothing has been folded.
+        """
+        return int(project_data.attrs.get("log_seq", 0))
+
+    @classmethod
+    def compact(cls):
+        """
+        Fold every pending record into its project store and drop it from its log, one
+        store at a time, so writes to the other stores are not held up.
+
+        Returns:
+            int: The number of records folded.
+        """
+        with cls._compact_lock:
+            folded = 0
+            for store in Storage_Manager.project_stores():
+                with cls._hold(store, False):
+                    cls._open(store)
+                    records = [(seq, operations) for seq, operations, _ in cls._records[store]]
+                if not records:
+                    continue
+                Operation_Log._fold(store, records)
+                with cls._hold(store, True):
+                    last_seq = records[-1][0]
+                    cls._records[store] = [record for record in cls._records[store] if record[0] > last_seq]
+                    cls._rewrite(store)
+                folded += len(records)
+            return folded
+
+    @classmethod
+    def truncate(cls):
+        """
+        Drop every record of every log, pending or not. Used when the project stores are reset.
+        """
+        for store in Storage_Manager.project_stores():
+            with cls._hold(store, True):
+                cls._open(store)
+                cls._records[store] = []
+                cls._rewrite(store)
+
+    @staticmethod
+    def path(store: str):
+        """
+        Return the path of the log of a project store: the path of the store with the
+        .log extension.
+
+        Args:
+            store (str): The name of the project store.
+
+        Returns:
+            str: The path of the log file.
+        """
+        return os.path.splitext(Storage_Manager.path(store))[0] + ".log"
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @staticmethod
+    def _resource(store: str):
+        """
+        Return the name of the Worker_Coordinator resource of the log of a project store.
+        """
+        return f"{store}.log"
+
+    @classmethod
+    def _lock_of(cls, store: str):
+        """
+        Return the thread lock of the log of a project store, creating it on first use.
+        """
+        with cls._setup_lock:
+            return cls._locks.setdefault(store, threading.RLock())
+
+    @classmethod
+    @contextmanager
+    def _hold(cls, store: str, exclusive: bool):
+        """
+        Hold the lock of the log of a project store, and the log's file lock shared or exclusive.
+        """
+        with cls._lock_of(store):
+            with Worker_Coordinator.hold(cls._resource(store), exclusive, lambda: cls._refresh(store)):
+                yield
+
+    @classmethod
+    @contextmanager
+    def _hold_all(cls):
+        """
+        Hold the locks of the logs of every project store exclusive, taken in store order.
+        """
+        with ExitStack() as stack:
+            for store in Storage_Manager.project_stores():
+                stack.enter_context(cls._hold(store, True))
+            yield
+
+    @classmethod
+    def _open(cls, store: str):
+        """
+        Open the log of a project store on first use, recovering every record that has not
+        been folded into the store. Must be called with the lock of the log held.
+        """
+        if cls._files.get(store) is not None:
+            return
+
+        checkpoint = Operation_Log._checkpoint(store)
+        path = Operation_Log.path(store)
+        data = b""
+        if os.path.exists(path):
+            with open(path, 'rb') as log_file:
+                data = log_file.read()
+            Metrics.increment("honeydue_log_read_bytes_total", len(data))
+        records, valid_length = cls._parse(data, checkpoint, path)
+
+        cls._records[store] = records
+        cls._next_seq[store] = max([checkpoint] + [seq for seq, _, _ in records]) + 1
+        log_file = cls._files[store] = open(path, 'ab')
+        if valid_length < len(data) and not Worker_Coordinator.ENABLED:
+            log_file.truncate(valid_length)
+        cls._inodes[store] = os.fstat(log_file.fileno()).st_ino
+        cls._offsets[store] = valid_length
+
+    @staticmethod
+    def _checkpoint(store: str):
+        """
+        Return the checkpoint of a project store.
+        """
+        with Storage_Manager.read(store) as project_data:
+            return Operation_Log.checkpoint(project_data)
+
+    @staticmethod
+    def _fold(store: str, records: list):
+        """
+        Apply the (sequence, operations) records of a log that are above the checkpoint of
+        its project store to the store, move the checkpoint, and fsync the store, since the
+        records are then dropped from the log.
+        """
+        with Storage_Manager.write(store) as project_data:
+            checkpoint = Operation_Log.checkpoint(project_data)
+            for seq, operations in records:
+                if seq <= checkpoint:
+                    continue
+                for operation in operations:
+                    Project_Operations.apply_to_store(project_data, operation)
+                project_data.attrs["log_seq"] = seq
+            Storage_Manager.sync(store)
+
+    @classmethod
+    def _fold_shared_log(cls):
+        """
+        Fold the records of the log that every shard of a sharded database shared, before
+        each project store had a log of its own, into the project stores, then remove it.
+        Its sequence numbers carry on in the log of each store, which starts after the
+        store's checkpoint. Does nothing for an unsharded database, whose store keeps that log.
+        """
+        shared_path = os.path.join(Storage_Manager.DATABASE_DIR, cls.SHARED_FILE_NAME)
+        if Storage_Manager.PROJECT_SHARDS == 1 or not os.path.exists(shared_path):
+            return
+        with cls._hold_all():
+            # Another worker may have folded it while this one waited for the locks
+            if not os.path.exists(shared_path):
+                return
+            with open(shared_path, 'rb') as log_file:
+                data = log_file.read()
+            Metrics.increment("honeydue_log_read_bytes_total", len(data))
+            records, _ = cls._parse(data, 0, shared_path)
+            for store in Storage_Manager.project_stores():
+                store_records = []
+                for seq, operations, _ in records:
+                    operations = [operation for operation in operations if Storage_Manager.project_store(operation["project"]) == store]
+                    if operations:
+                        store_records.append((seq, operations))
+                Operation_Log._fold(store, store_records)
+            os.remove(shared_path)
+
+    @classmethod
+    def _parse(cls, data: bytes, checkpoint: int, path: str):
+        """
+        Decode the frames of a log, keeping the records after the checkpoint, up to the
+        first torn or corrupted frame. Returns the records and the length of the valid frames.
+        Raises a RuntimeError for a record that is not encoded with Project_Codec.
+        """
+        records = []
+        offset = 0
+        while offset + cls._HEADER.size <= len(data):
+            seq, length, crc = cls._HEADER.unpack_from(data, offset)
+            start = offset + cls._HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            if seq > checkpoint:
+                if not Project_Codec.is_encoded(payload):
+                    raise RuntimeError(f"Record {seq} of the operation log {path} is not encoded with Project_Codec")
+                decode_start = time.perf_counter()
+                records.append((seq, Project_Codec.decode_value(payload), data[offset:start + length]))
+                Metrics.observe("honeydue_codec_seconds", time.perf_counter() - decode_start, (("codec", "project_codec"), ("operation", "decode")))
+                Metrics.observe("honeydue_codec_bytes", length, (("codec", "project_codec"), ("operation", "decode")))
+            offset = start + length
+        return records, offset
+
+    @classmethod
+    def _refresh(cls, store: str):
+        """
+        Catch up with the log of a project store changed by another process: read the frames
+        appended since the last read, or reload the log if it was rewritten, and pass the new
+        records to the subscribers. Must be called with the lock of the log held.
+        """
+        if cls._files.get(store) is None:
+            return
+        path = Operation_Log.path(store)
+        last_seq = cls._next_seq[store] - 1
+        try:
+            status = os.stat(path)
+        except FileNotFoundError:
+            status = None
+
+        if status is not None and status.st_ino == cls._inodes[store] and status.st_size >= cls._offsets[store]:
+            with open(path, 'rb') as log_file:
+                log_file.seek(cls._offsets[store])
+                data = log_file.read()
+            Metrics.increment("honeydue_log_read_bytes_total", len(data))
+            records, valid_length = cls._parse(data, last_seq, path)
+            cls._records[store].extend(records)
+            cls._offsets[store] += valid_length
+            cls._next_seq[store] = max([cls._next_seq[store]] + [seq + 1 for seq, _, _ in records])
+        else:
+            cls._files.pop(store).close()
+            cls._open(store)
+            if cls._next_seq[store] - 1 < last_seq or Operation_Log._checkpoint(store) > last_seq:
+                # Reset, or records this process never read were folded and dropped
+                for function in cls._subscribers:
+                    function(None)
+                return
+            records = [record for record in cls._records[store] if record[0] > last_seq]
+
+        for _, operations, _ in records:
+            for function in cls._subscribers:
+                function(operations)
+
+    @classmethod
+    def _frame(cls, seq: int, operations: list):
+        """
+        Encode a record as a frame ready to be appended to the log.
+        """
+        start = time.perf_counter()
+        payload = Project_Codec.encode_value(operations)
+        Metrics.observe("honeydue_codec_seconds", time.perf_counter() - start, (("codec", "project_codec"), ("operation", "encode")))
+        Metrics.observe("honeydue_codec_bytes", len(payload), (("codec", "project_codec"), ("operation", "encode")))
+        return cls._HEADER.pack(seq, len(payload), zlib.crc32(payload)) + payload
+
+    @classmethod
+    def _rewrite(cls, store: str):
+        """
+        Atomically replace the log file of a project store with the records still pending.
+        Must be called with the lock of the log held.
+        """
+        path = Operation_Log.path(store)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, 'wb') as log_file:
+            for _, _, frame in cls._records[store]:
+                log_file.write(frame)
+                Metrics.increment("honeydue_log_written_bytes_total", len(frame))
+            log_file.flush()
+            os.fsync(log_file.fileno())
+        if cls._files.get(store) is not None:
+            cls._files[store].close()
+        os.replace(temporary_path, path)
+        log_file = cls._files[store] = open(path, 'ab')
+        cls._inodes[store] = os.fstat(log_file.fileno()).st_ino
+        cls._offsets[store] = sum(len(frame) for _, _, frame in cls._records[store])
+        Worker_Coordinator.changed(cls._resource(store))
+
+    @classmethod
+    def _compact_loop(cls):
+        """
+        Compact every COMPACT_INTERVAL seconds, or sooner when too many records are pending, until stopped.
+        """
+        while not cls._stop_event.is_set():
+            cls._wake_event.wait(cls.COMPACT_INTERVAL)
+            cls._wake_event.clear()
+            if cls._stop_event.is_set():
+                break
+            try:
+                cls.compact()
+            except Exception:
+                Metrics.increment("honeydue_background_errors_total", labels=(("task", "log_compaction"),))
+                logger.exception("Error compacting the operation log")
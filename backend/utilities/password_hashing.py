@@ -0,0 +1,53 @@
+import bcrypt
+import time
+
+from utilities.metrics import Metrics
+
+class Password_Hashing:
+    """
+    The CPU-bound bcrypt operations on passwords.
+
+    These functions touch no storage and hold no state, so they can be sent to a worker
+    process of the Async_Facade. Their time is recorded in the Metrics of the process
+    they run in; for calls sent to a worker, the facade records it in the server process.
+
+    Methods:
+        hash_password(password, rounds): Hash a password with a new salt.
+        check_password(password, stored_hash): Check a password against a stored hash.
+    """
+
+    @staticmethod
+    def hash_password(password: str, rounds: int = None):
+        """
+        Hash a password with a new salt.
+
+        Args:
+            password (str): The password to hash.
+            rounds (int, optional): The bcrypt cost, bcrypt's default if not given.
+
+        Returns:
+            bytes: The bcrypt hash.
+        """
+        start = time.perf_counter()
+        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt() if rounds is None else bcrypt.gensalt(rounds))
+        Metrics.observe("honeydue_bcrypt_seconds", time.perf_counter() - start, (("operation", "hash"),))
+        return hashed_password
+
+    @staticmethod
+    def check_password(password: str, stored_hash):
+        """
+        Check a password against a stored hash.
+
+        Args:
+            password (str): The password to check.
+            stored_hash (bytes or str): The bcrypt hash stored for the account.
+
+        Returns:
+            bool: True if the password matches the hash, False otherwise.
+        """
+        if isinstance(stored_hash, str):
+            stored_hash = stored_hash.encode('utf-8')
+        start = time.perf_counter()
+        matches = bcrypt.checkpw(password.encode('utf-8'), stored_hash)
+        Metrics.observe("honeydue_bcrypt_seconds", time.perf_counter() - start, (("operation", "check"),))
+        return matches
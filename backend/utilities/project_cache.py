@@ -0,0 +1,281 @@
+import os
+import sys
+import threading
+
+from collections import OrderedDict
+
+from libraries.project import Project
+
+class Project_Cache:
+    """
+    In-process LRU cache of deserialized Project objects, bounded by a memory budget.
+
+    Entries are keyed by project name and tagged with the project's generation counter.
+    Every write path either updates the cached project in place, which keeps its task
+    indexes current without reloading it, or bumps the generation of the project, so an
+    entry loaded before the write is treated as stale and reloaded on its next read. The
+    size of an entry is estimated again after each update in place, and the least recently
+    used entries are evicted once the estimated size of the cached projects exceeds MAX_BYTES.
+
+    Generations are drawn from one counter shared by every project, so the generations of
+    deleted projects can be dropped: a project without a generation of its own is at the
+    floor generation, which forget() moves past every generation handed out so far.
+
+    Cached projects are changed in place, so readers hold lock() while they read from one.
+
+    Attributes:
+        MAX_BYTES (int): The memory budget of the cache (HONEYDUE_PROJECT_CACHE_BYTES).
+
+    Methods:
+        get(project_name): Return the cached project if it is still current.
+        put(project_name, project_obj, generation): Cache a project loaded at a generation.
+        generation(project_name): Return the current generation of a project.
+        bump(project_name): Invalidate the cached copy of a project.
+        update(project_name, function): Apply a write to the cached copy of a project.
+        forget(project_name): Drop a deleted project and its generation.
+        lock(): Return the lock guarding the cached projects.
+        clear(): Drop every entry and reset the counters.
+        stats(): Return the hit, miss and eviction counters.
+    """
+
+    MAX_BYTES = int(os.environ.get("HONEYDUE_PROJECT_CACHE_BYTES", 64 * 1024 * 1024))
+
+    _lock = threading.RLock()
+    _entries = OrderedDict()
+    _generations = {}
+    _clock = 0
+    _floor = 0
+    _bytes = 0
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+    _invalidations = 0
+    _updates = 0
+
+    @classmethod
+    def get(cls, project_name: str):
+        """
+        Return the cached project if it was loaded at the project's current generation.
+
+        Args:
+            project_name (str): The name of the project.
+
+        Returns:
+            Project: The cached project, or None on a miss.
+        """
+        with cls._lock:
+            entry = cls._entries.get(project_name)
+            if entry is None or entry[0] != cls._generations.get(project_name, cls._floor):
+                cls._misses += 1
+                return None
+            cls._entries.move_to_end(project_name)
+            cls._hits += 1
+            return entry[1]
+
+    @classmethod
+    def put(cls, project_name: str, project_obj: Project, generation: int):
+        """
+        Cache a project. The project is not cached if it was written after the given
+        generation was read, or if it is larger than the whole budget.
+
+        Args:
+            project_name (str): The name of the project.
+            project_obj (Project): The project loaded from storage.
+            generation (int): The generation read before the project was loaded.
+        """
+        size = Project_Cache._estimate_size(project_obj)
+        with cls._lock:
+            if generation != cls._generations.get(project_name, cls._floor) or size > cls.MAX_BYTES:
+                return
+            cls._remove(project_name)
+            cls._entries[project_name] = (generation, project_obj, size)
+            cls._bytes += size
+            cls._evict()
+
+    @classmethod
+    def generation(cls, project_name: str):
+        """
+        Return the current generation of a project.
+
+        Args:
+            project_name (str): The name of the project.
+
+        Returns:
+            int: The generation counter.
+        """
+        with cls._lock:
+            return cls._generations.get(project_name, cls._floor)
+
+    @classmethod
+    def bump(cls, project_name: str):
+        """
+        Bump the generation of a project, invalidating its cached copy.
+
+        Args:
+            project_name (str): The name of the project that was written.
+        """
+        with cls._lock:
+            cls._generations[project_name] = cls._tick()
+            if project_name in cls._entries:
+                cls._remove(project_name)
+                cls._invalidations += 1
+
+    @classmethod
+    def update(cls, project_name: str, function):
+        """
+        Bump the generation of a project and apply a write to its cached copy in place, so
+        the cached project stays current. If the project is not cached, or the write cannot
+        be applied, the cached copy is dropped instead. The size of the updated copy is
+        estimated again, and entries are evicted if the cache is over its budget.
+
+        Args:
+            project_name (str): The name of the project that was written.
+            function (callable): Called with the cached project, returns the updated project
+                                 or None if the project was deleted.
+        """
+        with cls._lock:
+            generation = cls._generations.get(project_name, cls._floor)
+            cls._generations[project_name] = cls._tick()
+            entry = cls._entries.get(project_name)
+            if entry is None:
+                return
+            if entry[0] != generation:
+                cls._remove(project_name)
+                cls._invalidations += 1
+                return
+            try:
+                project_obj = function(entry[1])
+            except Exception:
+                project_obj = None
+            if project_obj is None:
+                cls._remove(project_name)
+                cls._invalidations += 1
+                return
+            size = Project_Cache._estimate_size(project_obj)
+            cls._remove(project_name)
+            cls._updates += 1
+            if size > cls.MAX_BYTES:
+                cls._evictions += 1
+                return
+            cls._entries[project_name] = (cls._generations[project_name], project_obj, size)
+            cls._bytes += size
+            cls._evict()
+
+    @classmethod
+    def forget(cls, project_name: str):
+        """
+        Drop the cached copy and the generation of a deleted project, so the generations of
+        deleted projects are not kept forever. The floor generation is moved past every
+        generation handed out, so a copy of the project loaded before it was deleted cannot
+        be cached; the entries of the other projects at the floor are moved along with it.
+
+        Args:
+            project_name (str): The name of the project that was deleted.
+        """
+        with cls._lock:
+            cls._remove(project_name)
+            cls._generations.pop(project_name, None)
+            floor = cls._floor
+            cls._floor = cls._tick()
+            for name, entry in list(cls._entries.items()):
+                if name not in cls._generations and entry[0] == floor:
+                    cls._entries[name] = (cls._floor, entry[1], entry[2])
+
+    @classmethod
+    def lock(cls):
+        """
+        Return the lock that guards the cached projects. Hold it while reading from a cached project.
+
+        Returns:
+            threading.RLock: The cache lock.
+        """
+        return cls._lock
+
+    @classmethod
+    def clear(cls):
+        """
+        Drop every entry and reset the counters.
+        """
+        with cls._lock:
+            cls._entries.clear()
+            cls._generations.clear()
+            # Projects loaded before the clear cannot be cached after it
+            cls._floor = cls._tick()
+            cls._bytes = 0
+            cls._hits = 0
+            cls._misses = 0
+            cls._evictions = 0
+            cls._invalidations = 0
+            cls._updates = 0
+
+    @classmethod
+    def stats(cls):
+        """
+        Return the cache counters, used to size the cache.
+
+        Returns:
+            dict: The number of hits, misses, evictions, invalidations and in-place updates,
+                  the number of cached projects and their estimated size against the budget,
+                  and the number of projects with a generation of their own.
+        """
+        with cls._lock:
+            return {
+                "hits": cls._hits,
+                "misses": cls._misses,
+                "evictions": cls._evictions,
+                "invalidations": cls._invalidations,
+                "updates": cls._updates,
+                "entries": len(cls._entries),
+                "bytes": cls._bytes,
+                "max_bytes": cls.MAX_BYTES,
+                "generations": len(cls._generations),
+            }
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @classmethod
+    def _tick(cls):
+        """
+        Return a new generation, above every generation handed out. Must be called with the
+        cache lock held.
+        """
+        cls._clock += 1
+        return cls._clock
+
+    @classmethod
+    def _evict(cls):
+        """
+        Evict the least recently used entries until the cache is within its budget. Must be
+        called with the cache lock held.
+        """
+        while cls._bytes > cls.MAX_BYTES:
+            cls._remove(next(iter(cls._entries)))
+            cls._evictions += 1
+
+    @classmethod
+    def _remove(cls, project_name: str):
+        """
+        Remove an entry if present. Must be called with the cache lock held.
+        """
+        entry = cls._entries.pop(project_name, None)
+        if entry is not None:
+            cls._bytes -= entry[2]
+
+    @staticmethod
+    def _estimate_size(project_obj: Project):
+        """
+        Estimate the memory held by a project from the size of its objects, strings and indexes.
+        """
+        size = sys.getsizeof(project_obj) + sys.getsizeof(project_obj.tasks)
+        size += sum(sys.getsizeof(name) + 64 for name in project_obj.collaborators)
+        size += sum(sys.getsizeof(category) for category in project_obj.categories)
+        for task in project_obj.tasks:
+            size += sys.getsizeof(task) + sys.getsizeof(task.__dict__)
+            size += sum(sys.getsizeof(value) for value in task.__dict__.values())
+        size += sys.getsizeof(project_obj.task_index) + sys.getsizeof(project_obj.deadline_index)
+        size += len(project_obj.deadline_index) * 64
+        for index in project_obj.field_indexes.values():
+            size += sys.getsizeof(index) + sum(sys.getsizeof(task_ids) for task_ids in index.values())
+        return size
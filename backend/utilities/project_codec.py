@@ -0,0 +1,476 @@
+import struct
+import sys
+
+from array import array
+from itertools import accumulate
+
+from libraries.task import Task
+from libraries.project import Project
+from libraries.user import Role
+
+class Project_Codec:
+    """
+    Compact, schema-versioned binary encoding of Project, Task and Role objects.
+
+    Every encoded record starts with the magic bytes, the schema version and a kind byte
+    ('P' for a project, 'V' for any other value). A project is encoded as a header
+    (name, description, collaborators and categories) prefixed by its length, followed
+    by the tasks stored column by column, so decode_header can stop after the header
+    without materializing any task. String columns with few distinct values (status,
+    category, assignee...) are dictionary-encoded as a packed array of codes, other string
+    columns are stored as one UTF-8 blob plus an array of lengths, and integer columns as
+    a packed array.
+
+    Values inside records are tagged with their type, so operations holding strings,
+    numbers, lists, dictionaries, Roles, Tasks and Projects can be encoded as well.
+
+    The field order of Task is part of the schema. Changing the shape of Task requires a
+    new SCHEMA_VERSION and a decoder for the previous one. Version 2 added the task
+    identifier, written after the other fields of a task and as a trailing task column,
+    and the project's next task identifier, written at the end of the header. Records
+    written with version 1 are still decoded; their tasks are numbered in order.
+
+    Attributes:
+        MAGIC (bytes): The bytes every encoded record starts with.
+        SCHEMA_VERSION (int): The version of the encoding written by this codec.
+        SUPPORTED_VERSIONS (tuple): The versions this codec can decode.
+        TASK_FIELDS (tuple): The Task fields, in encoding order.
+
+    Methods:
+        is_encoded(data): Check if bytes were written by this codec.
+        encode(project): Encode a project.
+        decode(data): Decode a project.
+        decode_header(data): Decode only the header of an encoded project.
+        encode_value(value): Encode any supported value.
+        decode_value(data): Decode a value written by encode_value.
+    """
+
+    MAGIC = b"HDC"
+    SCHEMA_VERSION = 2
+    SUPPORTED_VERSIONS = (1, 2)
+    TASK_FIELDS = ("name", "description", "priority", "deadline", "category", "status", "assignee")
+
+    _PROJECT_KIND = b"P"
+    _VALUE_KIND = b"V"
+    _PREFIX_SIZE = len(MAGIC) + 2
+
+    _NONE, _STR, _INT, _FLOAT, _BOOL, _LIST, _DICT, _ROLE, _TASK, _PROJECT = range(10)
+    _STR_COLUMN, _INT_COLUMN, _VALUE_COLUMN, _DICT_COLUMN = range(4)
+
+    _UINT32 = struct.Struct("<I")
+    _INT64 = struct.Struct("<q")
+    _FLOAT64 = struct.Struct("<d")
+
+    ########################
+    ### PUBLIC FUNCTIONS ###
+    ########################
+
+    @staticmethod
+    def is_encoded(data: bytes):
+        """
+        Check if bytes were written by this codec rather than by pickle.
+
+        Args:
+            data (bytes): The encoded record.
+
+        Returns:
+            bool: True if the record starts with the codec's magic bytes.
+        """
+        return bytes(data[:len(Project_Codec.MAGIC)]) == Project_Codec.MAGIC
+
+    @staticmethod
+    def encode(project: Project):
+        """
+        Encode a project.
+
+        Args:
+            project (Project): The project to encode.
+
+        Returns:
+            bytes: The encoded project.
+        """
+        buffer = Project_Codec._prefix(Project_Codec._PROJECT_KIND)
+        Project_Codec._write_project(buffer, project)
+        return bytes(buffer)
+
+    @staticmethod
+    def decode(data: bytes):
+        """
+        Decode a project.
+
+        Args:
+            data (bytes): A project written by encode.
+
+        Returns:
+            Project: The decoded project.
+
+        Raises:
+            ValueError: If the data is not an encoded project of a supported schema version.
+        """
+        view, version = Project_Codec._check_prefix(data, Project_Codec._PROJECT_KIND)
+        project_obj, _ = Project_Codec._read_project(view, Project_Codec._PREFIX_SIZE, version)
+        return project_obj
+
+    @staticmethod
+    def decode_header(data: bytes):
+        """
+        Decode only the header of an encoded project. The tasks are skipped, not decoded.
+
+        Args:
+            data (bytes): A project written by encode.
+
+        Returns:
+            dict: The name, description, collaborators, categories and next task identifier of the project.
+
+        Raises:
+            ValueError: If the data is not an encoded project of a supported schema version.
+        """
+        view, version = Project_Codec._check_prefix(data, Project_Codec._PROJECT_KIND)
+        header, _ = Project_Codec._read_header(view, Project_Codec._PREFIX_SIZE, version)
+        return header
+
+    @staticmethod
+    def encode_value(value):
+        """
+        Encode any supported value: None, str, int, float, bool, list, tuple, dict, Role,
+        Task or Project.
+
+        Args:
+            value: The value to encode.
+
+        Returns:
+            bytes: The encoded value.
+
+        Raises:
+            TypeError: If the value, or a value it contains, is not supported.
+        """
+        buffer = Project_Codec._prefix(Project_Codec._VALUE_KIND)
+        Project_Codec._write_value(buffer, value)
+        return bytes(buffer)
+
+    @staticmethod
+    def decode_value(data: bytes):
+        """
+        Decode a value written by encode_value.
+
+        Args:
+            data (bytes): The encoded value.
+
+        Returns:
+            The decoded value.
+
+        Raises:
+            ValueError: If the data is not an encoded value of a supported schema version.
+        """
+        view, version = Project_Codec._check_prefix(data, Project_Codec._VALUE_KIND)
+        value, _ = Project_Codec._read_value(view, Project_Codec._PREFIX_SIZE, version)
+        return value
+
+    ########################
+    ### ENCODE FUNCTIONS ###
+    ########################
+
+    @staticmethod
+    def _prefix(kind: bytes):
+        """
+        Start a record with the magic bytes, the schema version and the record kind.
+        """
+        buffer = bytearray(Project_Codec.MAGIC)
+        buffer.append(Project_Codec.SCHEMA_VERSION)
+        buffer += kind
+        return buffer
+
+    @staticmethod
+    def _write_project(buffer: bytearray, project: Project):
+        """
+        Write a project: its length-prefixed header, then its tasks column by column.
+        """
+        header = bytearray()
+        Project_Codec._write_value(header, project.name)
+        Project_Codec._write_value(header, project.description)
+        Project_Codec._write_value(header, project.collaborators)
+        Project_Codec._write_value(header, project.categories)
+        Project_Codec._write_value(header, project.next_task_id)
+        buffer += Project_Codec._UINT32.pack(len(header))
+        buffer += header
+
+        tasks = project.tasks
+        buffer += Project_Codec._UINT32.pack(len(tasks))
+        for field in Project_Codec.TASK_FIELDS:
+            Project_Codec._write_column(buffer, [getattr(task, field) for task in tasks])
+        Project_Codec._write_column(buffer, [task.task_id for task in tasks])
+
+    @staticmethod
+    def _write_column(buffer: bytearray, values: list):
+        """
+        Write one task column as dictionary codes, strings, integers, or tagged values when the column mixes types.
+        """
+        non_null = [value for value in values if value is not None]
+        mask = bytes(value is None for value in values) if len(non_null) != len(values) else b""
+
+        if all(type(value) is str for value in non_null):
+            dictionary = list(dict.fromkeys(values))
+            if len(dictionary) <= 65535 and 2 * len(dictionary) < len(values):
+                codes = {value: code for code, value in enumerate(dictionary)}
+                buffer.append(Project_Codec._DICT_COLUMN)
+                Project_Codec._write_value(buffer, dictionary)
+                buffer += Project_Codec._little_endian(array("H", [codes[value] for value in values])).tobytes()
+                return
+            strings = [value if value is not None else "" for value in values]
+            blob = "".join(strings).encode("utf-8")
+            lengths = Project_Codec._little_endian(array("I", map(len, strings)))
+            buffer.append(Project_Codec._STR_COLUMN)
+            Project_Codec._write_mask(buffer, mask)
+            buffer += lengths.tobytes()
+            buffer += Project_Codec._UINT32.pack(len(blob))
+            buffer += blob
+        elif all(type(value) is int and -2**63 <= value < 2**63 for value in non_null):
+            numbers = Project_Codec._little_endian(array("q", (value if value is not None else 0 for value in values)))
+            buffer.append(Project_Codec._INT_COLUMN)
+            Project_Codec._write_mask(buffer, mask)
+            buffer += numbers.tobytes()
+        else:
+            buffer.append(Project_Codec._VALUE_COLUMN)
+            for value in values:
+                Project_Codec._write_value(buffer, value)
+
+    @staticmethod
+    def _write_mask(buffer: bytearray, mask: bytes):
+        """
+        Write the flag and bytes marking the missing (None) values of a column.
+        """
+        buffer.append(1 if mask else 0)
+        buffer += mask
+
+    @staticmethod
+    def _write_value(buffer: bytearray, value):
+        """
+        Write a value prefixed by its type tag.
+        """
+        if value is None:
+            buffer.append(Project_Codec._NONE)
+        elif isinstance(value, bool):
+            buffer.append(Project_Codec._BOOL)
+            buffer.append(1 if value else 0)
+        elif isinstance(value, Role):
+            buffer.append(Project_Codec._ROLE)
+            Project_Codec._write_str(buffer, value.value)
+        elif isinstance(value, str):
+            buffer.append(Project_Codec._STR)
+            Project_Codec._write_str(buffer, value)
+        elif isinstance(value, int):
+            buffer.append(Project_Codec._INT)
+            buffer += Project_Codec._INT64.pack(value)
+        elif isinstance(value, float):
+            buffer.append(Project_Codec._FLOAT)
+            buffer += Project_Codec._FLOAT64.pack(value)
+        elif isinstance(value, (list, tuple)):
+            buffer.append(Project_Codec._LIST)
+            buffer += Project_Codec._UINT32.pack(len(value))
+            for item in value:
+                Project_Codec._write_value(buffer, item)
+        elif isinstance(value, dict):
+            buffer.append(Project_Codec._DICT)
+            buffer += Project_Codec._UINT32.pack(len(value))
+            for key, item in value.items():
+                Project_Codec._write_value(buffer, key)
+                Project_Codec._write_value(buffer, item)
+        elif isinstance(value, Task):
+            buffer.append(Project_Codec._TASK)
+            for field in Project_Codec.TASK_FIELDS:
+                Project_Codec._write_value(buffer, getattr(value, field))
+            Project_Codec._write_value(buffer, getattr(value, "task_id", None))
+        elif isinstance(value, Project):
+            buffer.append(Project_Codec._PROJECT)
+            Project_Codec._write_project(buffer, value)
+        else:
+            raise TypeError(f"Cannot encode a value of type {type(value).__name__}.")
+
+    @staticmethod
+    def _little_endian(values: array):
+        """
+        Convert a packed array between native and little-endian byte order.
+        """
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    @staticmethod
+    def _write_str(buffer: bytearray, value: str):
+        """
+        Write a length-prefixed UTF-8 string.
+        """
+        encoded = value.encode("utf-8")
+        buffer += Project_Codec._UINT32.pack(len(encoded))
+        buffer += encoded
+
+    ########################
+    ### DECODE FUNCTIONS ###
+    ########################
+
+    @staticmethod
+    def _check_prefix(data: bytes, kind: bytes):
+        """
+        Validate the magic bytes, schema version and kind of a record, returning a view of it and its version.
+        """
+        view = memoryview(data)
+        if not Project_Codec.is_encoded(view):
+            raise ValueError("Data was not written by Project_Codec.")
+        version = view[len(Project_Codec.MAGIC)]
+        if version not in Project_Codec.SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported Project_Codec schema version {version}.")
+        if bytes(view[len(Project_Codec.MAGIC) + 1:Project_Codec._PREFIX_SIZE]) != kind:
+            raise ValueError("Encoded record is not of the expected kind.")
+        return view, version
+
+    @staticmethod
+    def _read_header(view: memoryview, offset: int, version: int):
+        """
+        Read a project header, returning it and the offset where the tasks start.
+        """
+        header_length, = Project_Codec._UINT32.unpack_from(view, offset)
+        offset += Project_Codec._UINT32.size
+        end = offset + header_length
+        name, offset = Project_Codec._read_value(view, offset, version)
+        description, offset = Project_Codec._read_value(view, offset, version)
+        collaborators, offset = Project_Codec._read_value(view, offset, version)
+        categories, offset = Project_Codec._read_value(view, offset, version)
+        next_task_id = 1
+        if version >= 2:
+            next_task_id, offset = Project_Codec._read_value(view, offset, version)
+        header = {"name": name, "description": description, "collaborators": collaborators, "categories": categories, "next_task_id": next_task_id}
+        return header, end
+
+    @staticmethod
+    def _read_project(view: memoryview, offset: int, version: int):
+        """
+        Read a project, returning it and the offset after it.
+        """
+        header, offset = Project_Codec._read_header(view, offset, version)
+        task_count, = Project_Codec._UINT32.unpack_from(view, offset)
+        offset += Project_Codec._UINT32.size
+        columns = []
+        for _ in Project_Codec.TASK_FIELDS:
+            column, offset = Project_Codec._read_column(view, offset, task_count, version)
+            columns.append(column)
+        if version >= 2:
+            task_ids, offset = Project_Codec._read_column(view, offset, task_count, version)
+        else:
+            task_ids = list(range(1, task_count + 1))
+
+        project_obj = Project(header["name"], None)
+        project_obj.description = header["description"]
+        project_obj.collaborators = header["collaborators"]
+        project_obj.categories = header["categories"]
+        project_obj.set_tasks([Task(*row, task_id=task_id) for row, task_id in zip(zip(*columns), task_ids)])
+        project_obj.next_task_id = max(project_obj.next_task_id, header["next_task_id"])
+        return project_obj, offset
+
+    @staticmethod
+    def _read_column(view: memoryview, offset: int, count: int, version: int):
+        """
+        Read one task column of the given length, returning it and the offset after it.
+        """
+        kind = view[offset]
+        offset += 1
+        if kind == Project_Codec._DICT_COLUMN:
+            dictionary, offset = Project_Codec._read_value(view, offset, version)
+            codes = array("H")
+            codes.frombytes(view[offset:offset + 2 * count])
+            offset += 2 * count
+            return [dictionary[code] for code in Project_Codec._little_endian(codes)], offset
+        if kind == Project_Codec._VALUE_COLUMN:
+            values = []
+            for _ in range(count):
+                value, offset = Project_Codec._read_value(view, offset, version)
+                values.append(value)
+            return values, offset
+
+        has_mask = view[offset]
+        offset += 1
+        mask = None
+        if has_mask:
+            mask = bytes(view[offset:offset + count])
+            offset += count
+
+        if kind == Project_Codec._STR_COLUMN:
+            lengths = array("I")
+            lengths.frombytes(view[offset:offset + 4 * count])
+            lengths = Project_Codec._little_endian(lengths)
+            offset += 4 * count
+            blob_length, = Project_Codec._UINT32.unpack_from(view, offset)
+            offset += Project_Codec._UINT32.size
+            text = str(view[offset:offset + blob_length], "utf-8")
+            offset += blob_length
+            ends = list(accumulate(lengths))
+            values = [text[end - length:end] for end, length in zip(ends, lengths)]
+        elif kind == Project_Codec._INT_COLUMN:
+            numbers = array("q")
+            numbers.frombytes(view[offset:offset + 8 * count])
+            numbers = Project_Codec._little_endian(numbers)
+            offset += 8 * count
+            values = numbers.tolist()
+        else:
+            raise ValueError(f"Unknown column kind {kind}.")
+
+        if mask is not None:
+            values = [None if missing else value for value, missing in zip(values, mask)]
+        return values, offset
+
+    @staticmethod
+    def _read_value(view: memoryview, offset: int, version: int):
+        """
+        Read a tagged value, returning it and the offset after it.
+        """
+        tag = view[offset]
+        offset += 1
+        if tag == Project_Codec._NONE:
+            return None, offset
+        if tag == Project_Codec._BOOL:
+            return bool(view[offset]), offset + 1
+        if tag == Project_Codec._STR or tag == Project_Codec._ROLE:
+            value, offset = Project_Codec._read_str(view, offset)
+            if tag == Project_Codec._ROLE:
+                return Role(value), offset
+            return value, offset
+        if tag == Project_Codec._INT:
+            return Project_Codec._INT64.unpack_from(view, offset)[0], offset + Project_Codec._INT64.size
+        if tag == Project_Codec._FLOAT:
+            return Project_Codec._FLOAT64.unpack_from(view, offset)[0], offset + Project_Codec._FLOAT64.size
+        if tag == Project_Codec._LIST:
+            count, = Project_Codec._UINT32.unpack_from(view, offset)
+            offset += Project_Codec._UINT32.size
+            values = []
+            for _ in range(count):
+                value, offset = Project_Codec._read_value(view, offset, version)
+                values.append(value)
+            return values, offset
+        if tag == Project_Codec._DICT:
+            count, = Project_Codec._UINT32.unpack_from(view, offset)
+            offset += Project_Codec._UINT32.size
+            values = {}
+            for _ in range(count):
+                key, offset = Project_Codec._read_value(view, offset, version)
+                values[key], offset = Project_Codec._read_value(view, offset, version)
+            return values, offset
+        if tag == Project_Codec._TASK:
+            fields = []
+            for _ in Project_Codec.TASK_FIELDS:
+                value, offset = Project_Codec._read_value(view, offset, version)
+                fields.append(value)
+            task_id = None
+            if version >= 2:
+                task_id, offset = Project_Codec._read_value(view, offset, version)
+            return Task(*fields, task_id=task_id), offset
+        if tag == Project_Codec._PROJECT:
+            return Project_Codec._read_project(view, offset, version)
+        raise ValueError(f"Unknown value tag {tag}.")
+
+    @staticmethod
+    def _read_str(view: memoryview, offset: int):
+        """
+        Read a length-prefixed UTF-8 string, returning it and the offset after it.
+        """
+        length, = Project_Codec._UINT32.unpack_from(view, offset)
+        offset += Project_Codec._UINT32.size
+        return str(view[offset:offset + length], "utf-8"), offset + length
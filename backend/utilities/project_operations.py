@@ -0,0 +1,215 @@
+import copy
+import h5py
+
+from libraries.task import Task
+from libraries.project import Project
+from utilities.project_store import Project_Store
+
+class Project_Operations:
+    """
+    The operations that mutate a project, and how each one is applied.
+
+    An operation is a dictionary with an 'op' key naming the operation and a 'project'
+    key naming the project it applies to. The same operation can be applied either to
+    a Project object in memory, which is how reads see operations that are still in the
+    operation log, or to the columnar project store, which is how the log is compacted.
+
+    Operations:
+        create_project: {'project', 'data': Project}
+        delete_project: {'project'}
+        add_task: {'project', 'task': Task}
+        set_tasks: {'project', 'tasks': list of Task}
+        set_field: {'project', 'task_id', 'field', 'value'}
+        delete_task: {'project', 'task_id'}
+        add_category: {'project', 'category'}
+        remove_category: {'project', 'category'}
+        set_collaborator: {'project', 'username', 'role'}
+        remove_collaborator: {'project', 'username'}
+
+    Methods:
+        create_project(project): Build a create_project operation.
+        delete_project(project_name): Build a delete_project operation.
+        add_task(project_name, task): Build an add_task operation.
+        set_tasks(project_name, tasks): Build a set_tasks operation.
+        set_field(project_name, task_id, field, value): Build a set_field operation.
+        delete_task(project_name, task_id): Build a delete_task operation.
+        add_category(project_name, category_name): Build an add_category operation.
+        remove_category(project_name, category_name): Build a remove_category operation.
+        set_collaborator(project_name, username, role): Build a set_collaborator operation.
+        remove_collaborator(project_name, username): Build a remove_collaborator operation.
+        apply_to_project(project_obj, operation): Apply an operation to a Project in memory.
+        apply_to_store(project_data, operation): Apply an operation to the project store.
+    """
+
+    ##############################
+    ### OPERATION CONSTRUCTORS ###
+    ##############################
+
+    @staticmethod
+    def create_project(project: Project):
+        """
+        Build an operation that creates a project.
+        """
+        return {"op": "create_project", "project": project.name, "data": project}
+
+    @staticmethod
+    def delete_project(project_name: str):
+        """
+        Build an operation that deletes a project.
+        """
+        return {"op": "delete_project", "project": project_name}
+
+    @staticmethod
+    def add_task(project_name: str, task: Task):
+        """
+        Build an operation that appends a task to a project.
+        """
+        return {"op": "add_task", "project": project_name, "task": task}
+
+    @staticmethod
+    def set_tasks(project_name: str, tasks: list):
+        """
+        Build an operation that replaces every task of a project.
+        """
+        return {"op": "set_tasks", "project": project_name, "tasks": tasks}
+
+    @staticmethod
+    def set_field(project_name: str, task_id: int, field: str, value):
+        """
+        Build an operation that changes one field of one task.
+        """
+        return {"op": "set_field", "project": project_name, "task_id": task_id, "field": field, "value": value}
+
+    @staticmethod
+    def delete_task(project_name: str, task_id: int):
+        """
+        Build an operation that deletes one task.
+        """
+        return {"op": "delete_task", "project": project_name, "task_id": task_id}
+
+    @staticmethod
+    def add_category(project_name: str, category_name: str):
+        """
+        Build an operation that adds a category to a project.
+        """
+        return {"op": "add_category", "project": project_name, "category": category_name}
+
+    @staticmethod
+    def remove_category(project_name: str, category_name: str):
+        """
+        Build an operation that removes a category and moves its tasks to "None".
+        """
+        return {"op": "remove_category", "project": project_name, "category": category_name}
+
+    @staticmethod
+    def set_collaborator(project_name: str, username: str, role):
+        """
+        Build an operation that adds a collaborator or changes their role.
+        """
+        return {"op": "set_collaborator", "project": project_name, "username": username, "role": role}
+
+    @staticmethod
+    def remove_collaborator(project_name: str, username: str):
+        """
+        Build an operation that removes a collaborator from a project.
+        """
+        return {"op": "remove_collaborator", "project": project_name, "username": username}
+
+    #######################
+    ### APPLY FUNCTIONS ###
+    #######################
+
+    @staticmethod
+    def apply_to_project(project_obj: Project, operation: dict):
+        """
+        Apply an operation to a project in memory. Objects held by the operation are
+        copied, so the operation can be applied again later.
+
+        Args:
+            project_obj (Project): The current project, or None if it does not exist.
+            operation (dict): The operation to apply.
+
+        Returns:
+            Project: The updated project, or None if the project was deleted.
+
+        Raises:
+            ValueError: If the operation is unknown.
+        """
+        name = operation["op"]
+        if name == "create_project":
+            return copy.deepcopy(operation["data"])
+        if name == "delete_project":
+            return None
+
+        if name == "add_task":
+            project_obj.add_task(copy.copy(operation["task"]))
+        elif name == "set_tasks":
+            project_obj.set_tasks([copy.copy(task) for task in operation["tasks"]])
+        elif name == "set_field":
+            project_obj.update_task(operation["task_id"], operation["field"], operation["value"])
+        elif name == "delete_task":
+            project_obj.remove_task(operation["task_id"])
+        elif name == "add_category":
+            project_obj.categories.append(operation["category"])
+        elif name == "remove_category":
+            for task_id in list(project_obj.field_indexes["category"].get(operation["category"], ())):
+                project_obj.update_task(task_id, "category", "None")
+            project_obj.remove_category(operation["category"])
+        elif name == "set_collaborator":
+            project_obj.add_collaborator(operation["username"], operation["role"])
+        elif name == "remove_collaborator":
+            project_obj.remove_collaborator(operation["username"])
+        else:
+            raise ValueError(f"Unknown project operation '{name}'.")
+        return project_obj
+
+    @staticmethod
+    def apply_to_store(project_data: h5py.File, operation: dict):
+        """
+        Apply an operation to the columnar project store, touching only the rows and
+        columns it changes.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            operation (dict): The operation to apply.
+
+        Raises:
+            ValueError: If the operation is unknown.
+        """
+        name = operation["op"]
+        project_name = operation["project"]
+
+        if name == "create_project":
+            if project_name in project_data:
+                del project_data[project_name]
+            Project_Store.write_project(project_data, operation["data"])
+        elif name == "delete_project":
+            if project_name in project_data:
+                del project_data[project_name]
+        elif name == "add_task":
+            Project_Store.append_task(project_data, project_name, operation["task"])
+        elif name == "set_tasks":
+            Project_Store.write_tasks(project_data, project_name, operation["tasks"])
+        elif name == "set_field":
+            positions = Project_Store.task_positions(project_data, project_name, [operation["task_id"]])
+            Project_Store.set_task_field(project_data, project_name, positions, operation["field"], operation["value"])
+        elif name == "delete_task":
+            Project_Store.delete_task(project_data, project_name, operation["task_id"])
+        elif name == "add_category":
+            Project_Store.append_category(project_data, project_name, operation["category"])
+        elif name == "remove_category":
+            positions = Project_Store.find_tasks(project_data, project_name, "category", operation["category"])
+            Project_Store.set_task_field(project_data, project_name, positions, "category", "None")
+            categories = Project_Store.read_categories(project_data, project_name)
+            categories.remove(operation["category"])
+            Project_Store.write_categories(project_data, project_name, categories)
+        elif name == "set_collaborator":
+            collaborators = Project_Store.read_collaborators(project_data, project_name)
+            collaborators[operation["username"]] = operation["role"]
+            Project_Store.write_collaborators(project_data, project_name, collaborators)
+        elif name == "remove_collaborator":
+            collaborators = Project_Store.read_collaborators(project_data, project_name)
+            del collaborators[operation["username"]]
+            Project_Store.write_collaborators(project_data, project_name, collaborators)
+        else:
+            raise ValueError(f"Unknown project operation '{name}'.")
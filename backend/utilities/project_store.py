@@ -0,0 +1,698 @@
+import h5py
+import numpy as np
+import pickle
+import time
+
+from libraries.task import Task
+from libraries.project import Project
+from libraries.user import Role
+from utilities.metrics import Metrics
+
+class Project_Store:
+    """
+    Low-level columnar layout for projects stored in an open HDF5 file.
+
+    Each project is an HDF5 group laid out as follows:
+
+        /<project_name>                 group (attrs: layout_version, description, next_task_id)
+            categories                  resizable string dataset
+            collaborators/username      resizable string dataset
+            collaborators/role          resizable string dataset
+            tasks/id                    resizable int64 dataset of task identifiers
+            tasks/kinds                 resizable uint32 dataset of the value types of each task
+            tasks/<field>               one resizable string dataset per Task field
+
+    The string columns hold the text of each value, and the kinds column records, in four
+    bits per field, whether the value is a string, None, an int, a float or a bool, so a
+    task reads back with the values it was written with: a priority of 2 stays an int and a
+    missing assignee stays None.
+
+    Appending a task grows every task column by one row, changing a task field writes
+    a single cell and deleting a task moves the last row into its place, so none of these
+    operations depend on the size of the project.
+
+    Projects written by older versions of HoneyDue are stored as a single pickled
+    Project blob, as layout version 2 groups without task identifiers, or as layout
+    version 3 groups without value types. These records remain readable, and are converted
+    to the current layout the first time they are modified or when migrate_project is
+    called. Task identifiers are assigned in row order. Values without a recorded type are
+    read as strings, except priorities made of digits, which are read as ints.
+
+    Methods:
+        is_legacy(project_data, project_name): Check if a project is stored as a pickled blob.
+        migrate_project(project_data, project_name): Convert an older project to the current layout.
+        write_project(project_data, project): Write a full project in the columnar layout.
+        write_project_columns(project_data, project_name, collaborators, categories, task_columns): Write a full project from its columns.
+        read_project(project_data, project_name): Read a full project.
+        read_tasks(project_data, project_name): Read only the tasks of a project.
+        read_categories(project_data, project_name): Read only the categories of a project.
+        read_collaborators(project_data, project_name): Read only the collaborators of a project.
+        read_task_field(project_data, project_name, field): Read one field of every task.
+        append_task(project_data, project_name, task): Append one task row.
+        write_tasks(project_data, project_name, tasks): Replace every task row.
+        delete_task(project_data, project_name, task_id): Delete one task row.
+        set_task_field(project_data, project_name, positions, field, value): Write task cells.
+        find_tasks(project_data, project_name, field, value): Find task rows by field value.
+        task_positions(project_data, project_name, task_ids): Find task rows by identifier.
+        append_category(project_data, project_name, category_name): Append one category.
+        write_categories(project_data, project_name, categories): Replace the category list.
+        write_collaborators(project_data, project_name, collaborators): Replace the collaborator list.
+    """
+
+    LAYOUT_VERSION = 4
+    TASK_FIELDS = ("name", "description", "priority", "deadline", "category", "status", "assignee")
+    CHUNK_SIZE = 256
+
+    _KIND_STR, _KIND_NONE, _KIND_INT, _KIND_FLOAT, _KIND_BOOL = range(5)
+    _KIND_BITS = 4
+
+    ########################
+    ### LAYOUT FUNCTIONS ###
+    ########################
+
+    @staticmethod
+    def is_legacy(project_data: h5py.File, project_name: str):
+        """
+        Check if a project is stored in the legacy pickled-blob format.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+
+        Returns:
+            bool: True if the project is a pickled blob, False if it uses the columnar layout.
+        """
+        return isinstance(project_data[project_name], h5py.Dataset)
+
+    @staticmethod
+    def migrate_project(project_data: h5py.File, project_name: str):
+        """
+        Convert a legacy pickled project, or a project without task identifiers or value
+        types, to the current layout. Does nothing if the project already uses the current
+        layout.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project to migrate.
+
+        Raises:
+            ValueError: If the pickled project cannot be loaded.
+        """
+        if Project_Store.is_legacy(project_data, project_name):
+            project_obj = Project_Store._load_legacy(project_data, project_name)
+            del project_data[project_name]
+            Project_Store.write_project(project_data, project_obj)
+            return
+
+        project_group = project_data[project_name]
+        task_group = project_group["tasks"]
+        if "id" not in task_group:
+            task_count = task_group["name"].shape[0]
+            Project_Store._create_id_column(task_group, list(range(1, task_count + 1)))
+            project_group.attrs["next_task_id"] = task_count + 1
+        if "kinds" not in task_group:
+            Project_Store._create_kinds_column(task_group, Project_Store._read_kinds(task_group))
+            project_group.attrs["layout_version"] = Project_Store.LAYOUT_VERSION
+
+    @staticmethod
+    def write_project(project_data: h5py.File, project: Project):
+        """
+        Write a full project in the columnar layout.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project (Project): The project to write.
+        """
+        task_columns = {field: [getattr(task, field) for task in project.tasks] for field in Project_Store.TASK_FIELDS}
+        task_columns["id"] = [task.task_id for task in project.tasks]
+        Project_Store.write_project_columns(project_data, project.name, project.collaborators, project.categories, task_columns,
+                                            project.description, project.next_task_id)
+
+    @staticmethod
+    def write_project_columns(project_data: h5py.File, project_name: str, collaborators: dict, categories: list, task_columns: dict,
+                              description: str = "", next_task_id: int = None):
+        """
+        Write a full project in the columnar layout from the columns of its tasks, without
+        building Task objects. Used to write many generated projects quickly.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            collaborators (dict): The Role (or role name) of each collaborator, by username.
+            categories (list): The category names.
+            task_columns (dict): The values of each Task field, by field name, and the task
+                                 identifiers under 'id', all in row order. Fields given as
+                                 NumPy object arrays of str are written without conversion,
+                                 and fields given as NumPy integer arrays are written as ints.
+            description (str, optional): The description of the project.
+            next_task_id (int, optional): The identifier of the next task. Defaults to one
+                                          more than the largest identifier.
+        """
+        task_ids = list(task_columns["id"])
+        if next_task_id is None:
+            next_task_id = max(task_ids, default=0) + 1
+
+        project_group = project_data.create_group(project_name)
+        project_group.attrs["layout_version"] = Project_Store.LAYOUT_VERSION
+        project_group.attrs["description"] = description or ""
+        project_group.attrs["next_task_id"] = next_task_id
+
+        Project_Store._create_column(project_group, "categories", categories)
+
+        collaborator_group = project_group.create_group("collaborators")
+        Project_Store._create_column(collaborator_group, "username", list(collaborators.keys()))
+        Project_Store._create_column(collaborator_group, "role", [Project_Store._encode_role(role) for role in collaborators.values()])
+
+        task_group = project_group.create_group("tasks")
+        Project_Store._create_id_column(task_group, task_ids)
+        kinds = np.zeros(len(task_ids), dtype=np.uint32)
+        for position, field in enumerate(Project_Store.TASK_FIELDS):
+            values = task_columns[field]
+            if isinstance(values, np.ndarray) and values.dtype.kind in "iu":
+                field_kinds = np.full(len(values), Project_Store._KIND_INT, dtype=np.uint32)
+                values = values.astype(str).astype(object)
+            elif isinstance(values, np.ndarray):
+                field_kinds = np.zeros(len(values), dtype=np.uint32)
+            else:
+                field_kinds = np.array([Project_Store._kind(value) for value in values], dtype=np.uint32)
+            kinds |= field_kinds << (position * Project_Store._KIND_BITS)
+            Project_Store._create_column(task_group, field, values)
+        Project_Store._create_kinds_column(task_group, kinds)
+
+    ######################
+    ### READ FUNCTIONS ###
+    ######################
+
+    @staticmethod
+    def read_project(project_data: h5py.File, project_name: str):
+        """
+        Read a full project.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+
+        Returns:
+            Project: The project object.
+
+        Raises:
+            KeyError: If the project does not exist.
+        """
+        if Project_Store.is_legacy(project_data, project_name):
+            return Project_Store._load_legacy(project_data, project_name)
+
+        project_obj = Project(project_name, None)
+        project_obj.description = project_data[project_name].attrs.get("description", "")
+        project_obj.collaborators = Project_Store.read_collaborators(project_data, project_name)
+        project_obj.categories = Project_Store.read_categories(project_data, project_name)
+        project_obj.set_tasks(Project_Store.read_tasks(project_data, project_name))
+        project_obj.next_task_id = max(project_obj.next_task_id, int(project_data[project_name].attrs.get("next_task_id", 1)))
+        return project_obj
+
+    @staticmethod
+    def read_tasks(project_data: h5py.File, project_name: str):
+        """
+        Read only the tasks of a project.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+
+        Returns:
+            list: A list of Task objects.
+        """
+        if Project_Store.is_legacy(project_data, project_name):
+            return Project_Store._load_legacy(project_data, project_name).tasks
+
+        task_group = project_data[project_name]["tasks"]
+        columns = [Project_Store._read_column(task_group[field]) for field in Project_Store.TASK_FIELDS]
+        Metrics.increment("honeydue_hdf5_read_bytes_total", sum(Project_Store._size(column) for column in columns))
+        Metrics.observe("honeydue_project_tasks", len(columns[0]))
+        kinds = Project_Store._read_kinds(task_group)
+        columns = [Project_Store._decode_column(column, kinds, position) for position, column in enumerate(columns)]
+        if "id" in task_group:
+            task_ids = task_group["id"][()].tolist()
+        else:
+            task_ids = list(range(1, task_group["name"].shape[0] + 1))
+        return [Task(*row, task_id=task_id) for row, task_id in zip(zip(*columns), task_ids)]
+
+    @staticmethod
+    def read_categories(project_data: h5py.File, project_name: str):
+        """
+        Read only the categories of a project.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+
+        Returns:
+            list: A list of category names.
+        """
+        if Project_Store.is_legacy(project_data, project_name):
+            return Project_Store._load_legacy(project_data, project_name).categories
+
+        return Project_Store._read_column(project_data[project_name]["categories"])
+
+    @staticmethod
+    def read_collaborators(project_data: h5py.File, project_name: str):
+        """
+        Read only the collaborators of a project.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+
+        Returns:
+            dict: A dictionary mapping collaborator usernames to their roles.
+        """
+        if Project_Store.is_legacy(project_data, project_name):
+            return Project_Store._load_legacy(project_data, project_name).collaborators
+
+        collaborator_group = project_data[project_name]["collaborators"]
+        usernames = Project_Store._read_column(collaborator_group["username"])
+        roles = Project_Store._read_column(collaborator_group["role"])
+        return {username: Project_Store._decode_role(role) for username, role in zip(usernames, roles)}
+
+    @staticmethod
+    def read_task_field(project_data: h5py.File, project_name: str, field: str):
+        """
+        Read one field of every task. Only the identifier column and the requested column are read.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            field (str): The Task field to read.
+
+        Returns:
+            dict: The value of the field, keyed by task identifier.
+        """
+        if Project_Store.is_legacy(project_data, project_name):
+            return {task.task_id: getattr(task, field) for task in Project_Store._load_legacy(project_data, project_name).tasks}
+
+        task_group = project_data[project_name]["tasks"]
+        values = Project_Store._read_column(task_group[field])
+        values = Project_Store._decode_column(values, Project_Store._read_kinds(task_group), Project_Store.TASK_FIELDS.index(field))
+        if "id" in task_group:
+            task_ids = task_group["id"][()].tolist()
+        else:
+            task_ids = range(1, len(values) + 1)
+        return dict(zip(task_ids, values))
+
+    @staticmethod
+    def find_tasks(project_data: h5py.File, project_name: str, field: str, value: str):
+        """
+        Find the rows of every task whose field matches a value. Only the requested column is read.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            field (str): The Task field to compare.
+            value (str): The value to search for.
+
+        Returns:
+            numpy.ndarray: The sorted row positions of the matching tasks.
+        """
+        Project_Store.migrate_project(project_data, project_name)
+        task_group = project_data[project_name]["tasks"]
+        column = task_group[field].asstr()[()]
+        kinds = Project_Store._field_kinds(task_group["kinds"][()], Project_Store.TASK_FIELDS.index(field))
+        return np.flatnonzero((column == Project_Store._encode_value(value)) & (kinds == Project_Store._kind(value)))
+
+    @staticmethod
+    def task_positions(project_data: h5py.File, project_name: str, task_ids: list):
+        """
+        Find the rows of tasks by identifier. Only the identifier column is read.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            task_ids (list): The identifiers of the tasks.
+
+        Returns:
+            numpy.ndarray: The row position of each task, in the order of task_ids.
+
+        Raises:
+            KeyError: If the project has no task with one of the identifiers.
+        """
+        Project_Store.migrate_project(project_data, project_name)
+        ids = project_data[project_name]["tasks"]["id"][()]
+        order = np.argsort(ids, kind="stable")
+        found = np.searchsorted(ids, task_ids, sorter=order)
+        positions = order[np.minimum(found, len(ids) - 1)] if len(ids) > 0 else np.array([], dtype=np.int64)
+        if len(positions) != len(task_ids) or np.any(ids[positions] != np.asarray(task_ids)):
+            raise KeyError(f"Task not found in project '{project_name}'.")
+        return positions
+
+    #######################
+    ### WRITE FUNCTIONS ###
+    #######################
+
+    @staticmethod
+    def append_task(project_data: h5py.File, project_name: str, task: Task):
+        """
+        Append one task row to a project.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            task (Task): The task to append.
+        """
+        Project_Store.migrate_project(project_data, project_name)
+        project_group = project_data[project_name]
+        task_group = project_group["tasks"]
+        next_task_id = int(project_group.attrs["next_task_id"])
+        task_id = task.task_id if task.task_id is not None else next_task_id
+        project_group.attrs["next_task_id"] = max(next_task_id, task_id + 1)
+
+        id_column = task_group["id"]
+        id_column.resize((id_column.shape[0] + 1,))
+        id_column[-1] = task_id
+        kinds_column = task_group["kinds"]
+        kinds_column.resize((kinds_column.shape[0] + 1,))
+        kinds_column[-1] = Project_Store._task_kinds(task)
+        for field in Project_Store.TASK_FIELDS:
+            Project_Store._append_value(task_group[field], getattr(task, field))
+
+    @staticmethod
+    def write_tasks(project_data: h5py.File, project_name: str, tasks: list):
+        """
+        Replace every task row of a project. The columns are resized and overwritten in place.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            tasks (list): The new list of Task objects.
+        """
+        Project_Store.migrate_project(project_data, project_name)
+        project_group = project_data[project_name]
+        task_group = project_group["tasks"]
+        next_task_id = int(project_group.attrs["next_task_id"])
+        task_ids = []
+        for task in tasks:
+            task_id = task.task_id if task.task_id is not None else next_task_id
+            next_task_id = max(next_task_id, task_id + 1)
+            task_ids.append(task_id)
+        project_group.attrs["next_task_id"] = next_task_id
+
+        task_group["id"].resize((len(task_ids),))
+        task_group["kinds"].resize((len(task_ids),))
+        if task_ids:
+            task_group["id"][:] = task_ids
+            task_group["kinds"][:] = np.array([Project_Store._task_kinds(task) for task in tasks], dtype=np.uint32)
+        for field in Project_Store.TASK_FIELDS:
+            Project_Store._write_column(task_group[field], [getattr(task, field) for task in tasks])
+
+    @staticmethod
+    def delete_task(project_data: h5py.File, project_name: str, task_id: int):
+        """
+        Delete one task row. The last row is moved into its place, so only one row is written.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            task_id (int): The identifier of the task to delete.
+
+        Raises:
+            KeyError: If the project has no task with this identifier.
+        """
+        position = int(Project_Store.task_positions(project_data, project_name, [task_id])[0])
+        task_group = project_data[project_name]["tasks"]
+        last = task_group["id"].shape[0] - 1
+        for column in [task_group["id"], task_group["kinds"]] + [task_group[field] for field in Project_Store.TASK_FIELDS]:
+            if position != last:
+                column[position] = column[last]
+            column.resize((last,))
+
+    @staticmethod
+    def set_task_field(project_data: h5py.File, project_name: str, positions, field: str, value):
+        """
+        Write a single value into the given field of one or more tasks.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            positions (int or numpy.ndarray): The row position(s) of the task(s), in increasing order.
+            field (str): The Task field to write.
+            value: The new value of the field.
+
+        Raises:
+            ValueError: If the field is not a Task field.
+        """
+        if field not in Project_Store.TASK_FIELDS:
+            raise ValueError(f"'{field}' is not a task field.")
+        Project_Store.migrate_project(project_data, project_name)
+        if np.size(positions) == 0:
+            return
+        encoded = Project_Store._encode_value(value)
+        Metrics.increment("honeydue_hdf5_written_bytes_total", len(encoded) * np.size(positions))
+        task_group = project_data[project_name]["tasks"]
+        task_group[field][positions] = encoded
+        shift = Project_Store.TASK_FIELDS.index(field) * Project_Store._KIND_BITS
+        kinds = task_group["kinds"][positions]
+        task_group["kinds"][positions] = (kinds & ~np.uint32(0xF << shift)) | np.uint32(Project_Store._kind(value) << shift)
+
+    @staticmethod
+    def append_category(project_data: h5py.File, project_name: str, category_name: str):
+        """
+        Append one category to a project.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            category_name (str): The name of the category.
+        """
+        Project_Store.migrate_project(project_data, project_name)
+        Project_Store._append_value(project_data[project_name]["categories"], category_name)
+
+    @staticmethod
+    def write_categories(project_data: h5py.File, project_name: str, categories: list):
+        """
+        Replace the category list of a project.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            categories (list): The new list of category names.
+        """
+        Project_Store.migrate_project(project_data, project_name)
+        Project_Store._write_column(project_data[project_name]["categories"], categories)
+
+    @staticmethod
+    def write_collaborators(project_data: h5py.File, project_name: str, collaborators: dict):
+        """
+        Replace the collaborator list of a project.
+
+        Args:
+            project_data (h5py.File): The open project database.
+            project_name (str): The name of the project.
+            collaborators (dict): A dictionary mapping collaborator usernames to their roles.
+        """
+        Project_Store.migrate_project(project_data, project_name)
+        collaborator_group = project_data[project_name]["collaborators"]
+        Project_Store._write_column(collaborator_group["username"], list(collaborators.keys()))
+        Project_Store._write_column(collaborator_group["role"], [Project_Store._encode_role(role) for role in collaborators.values()])
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @staticmethod
+    def _load_legacy(project_data: h5py.File, project_name: str):
+        """
+        Unpickle a project stored in the legacy pickled-blob format.
+        """
+        try:
+            data = project_data[project_name][()]
+            start = time.perf_counter()
+            legacy_project = pickle.loads(data)
+        except:
+            raise ValueError(f"Error loading project '{project_name}'")
+        Metrics.observe("honeydue_codec_seconds", time.perf_counter() - start, (("codec", "pickle"), ("operation", "decode")))
+        Metrics.observe("honeydue_codec_bytes", len(data), (("codec", "pickle"), ("operation", "decode")))
+
+        # Pickled projects and tasks predate task identifiers, so rebuild them with the current classes
+        project_obj = Project(legacy_project.name, None)
+        project_obj.description = legacy_project.description
+        project_obj.collaborators = legacy_project.collaborators
+        project_obj.categories = legacy_project.categories
+        project_obj.set_tasks([Task(task.name, task.description, task.priority, task.deadline, task.category, task.status, task.assignee) for task in legacy_project.tasks])
+        return project_obj
+
+    @staticmethod
+    def _create_column(group: h5py.Group, name: str, values: list):
+        """
+        Create a chunked, resizable string column holding the given values. Values given as
+        a NumPy object array of str are stored as they are.
+        """
+        if not isinstance(values, np.ndarray):
+            values = np.array([Project_Store._encode_value(value) for value in values], dtype=object)
+        Metrics.increment("honeydue_hdf5_written_bytes_total", Project_Store._size(values))
+        group.create_dataset(
+            name,
+            data=values,
+            shape=(len(values),),
+            maxshape=(None,),
+            chunks=(Project_Store.CHUNK_SIZE,),
+            dtype=h5py.string_dtype(encoding='utf-8')
+        )
+
+    @staticmethod
+    def _create_id_column(group: h5py.Group, task_ids: list):
+        """
+        Create the chunked, resizable int64 column of task identifiers.
+        """
+        group.create_dataset(
+            "id",
+            data=np.array(task_ids, dtype=np.int64),
+            maxshape=(None,),
+            chunks=(Project_Store.CHUNK_SIZE,),
+            dtype=np.int64
+        )
+
+    @staticmethod
+    def _create_kinds_column(group: h5py.Group, kinds: np.ndarray):
+        """
+        Create the chunked, resizable uint32 column of the value types of each task.
+        """
+        group.create_dataset(
+            "kinds",
+            data=np.asarray(kinds, dtype=np.uint32),
+            maxshape=(None,),
+            chunks=(Project_Store.CHUNK_SIZE,),
+            dtype=np.uint32
+        )
+
+    @staticmethod
+    def _read_kinds(task_group: h5py.Group):
+        """
+        Read the value types of every task. For a project written without them, every value
+        is a string, except a priority made of digits, which is an int.
+        """
+        if "kinds" in task_group:
+            return task_group["kinds"][()]
+        priorities = task_group["priority"].asstr()[()]
+        digits = np.array([priority.isdigit() for priority in priorities.tolist()], dtype=bool)
+        shift = Project_Store.TASK_FIELDS.index("priority") * Project_Store._KIND_BITS
+        return np.where(digits, np.uint32(Project_Store._KIND_INT << shift), np.uint32(0)).astype(np.uint32)
+
+    @staticmethod
+    def _field_kinds(kinds: np.ndarray, position: int):
+        """
+        Return the value type of one field of every task, from the kinds column.
+        """
+        return (kinds >> np.uint32(position * Project_Store._KIND_BITS)) & np.uint32(0xF)
+
+    @staticmethod
+    def _decode_column(values: list, kinds: np.ndarray, position: int):
+        """
+        Convert the text of a column back to the values it was written with. Only the rows
+        whose value is not a string are converted.
+        """
+        field_kinds = Project_Store._field_kinds(kinds, position)
+        for row in np.flatnonzero(field_kinds).tolist():
+            values[row] = Project_Store._decode_value(values[row], int(field_kinds[row]))
+        return values
+
+    @staticmethod
+    def _read_column(column: h5py.Dataset):
+        """
+        Read a string column as a list of str.
+        """
+        return column.asstr()[()].tolist()
+
+    @staticmethod
+    def _append_value(column: h5py.Dataset, value):
+        """
+        Grow a column by one row and write the value into it.
+        """
+        column.resize((column.shape[0] + 1,))
+        encoded = Project_Store._encode_value(value)
+        Metrics.increment("honeydue_hdf5_written_bytes_total", len(encoded))
+        column[-1] = encoded
+
+    @staticmethod
+    def _write_column(column: h5py.Dataset, values: list):
+        """
+        Resize a column to the number of values and overwrite its contents.
+        """
+        column.resize((len(values),))
+        if len(values) > 0:
+            encoded = np.array([Project_Store._encode_value(value) for value in values], dtype=object)
+            Metrics.increment("honeydue_hdf5_written_bytes_total", Project_Store._size(encoded))
+            column[:] = encoded
+
+    @staticmethod
+    def _size(values):
+        """
+        Return the number of characters of string column values, counted as their size in bytes by the metrics.
+        """
+        return sum(map(len, values))
+
+    @staticmethod
+    def _encode_value(value):
+        """
+        Convert a field value to the string stored on disk. Missing values are stored as
+        empty strings, their type in the kinds column telling them apart.
+        """
+        if value is None:
+            return ""
+        return str(value)
+
+    @staticmethod
+    def _kind(value):
+        """
+        Return the value type recorded in the kinds column for a field value.
+        """
+        if value is None:
+            return Project_Store._KIND_NONE
+        if isinstance(value, (bool, np.bool_)):
+            return Project_Store._KIND_BOOL
+        if isinstance(value, (int, np.integer)):
+            return Project_Store._KIND_INT
+        if isinstance(value, (float, np.floating)):
+            return Project_Store._KIND_FLOAT
+        return Project_Store._KIND_STR
+
+    @staticmethod
+    def _task_kinds(task: Task):
+        """
+        Return the kinds column entry of a task, with the value type of each field.
+        """
+        kinds = 0
+        for position, field in enumerate(Project_Store.TASK_FIELDS):
+            kinds |= Project_Store._kind(getattr(task, field)) << (position * Project_Store._KIND_BITS)
+        return kinds
+
+    @staticmethod
+    def _decode_value(text: str, kind: int):
+        """
+        Convert the stored text of a value back to a value of its recorded type.
+        """
+        if kind == Project_Store._KIND_NONE:
+            return None
+        if kind == Project_Store._KIND_INT:
+            return int(text)
+        if kind == Project_Store._KIND_FLOAT:
+            return float(text)
+        if kind == Project_Store._KIND_BOOL:
+            return text == "True"
+        return text
+
+    @staticmethod
+    def _encode_role(role):
+        """
+        Convert a Role (or a role name) to the string stored on disk.
+        """
+        if isinstance(role, Role):
+            return role.value
+        return str(role)
+
+    @staticmethod
+    def _decode_role(role: str):
+        """
+        Convert a stored role name back to a Role, keeping unknown role names as strings.
+        """
+        try:
+            return Role(role)
+        except ValueError:
+            return role
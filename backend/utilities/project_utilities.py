@@ -1,16 +1,37 @@
+import copy
 import h5py
-import numpy as np
-import pickle
+import os
+import tempfile
 
 from libraries.task import Task
 from libraries.project import Project
 from utilities.account_utilities import Account_Utilities
+from utilities.assignee_index import Assignee_Index
+from utilities.operation_log import Operation_Log
+from utilities.project_cache import Project_Cache
+from utilities.project_operations import Project_Operations
+from utilities.project_store import Project_Store
+from utilities.storage_manager import Storage_Manager
 
 class Project_Utilities:
     """
     Utility class for managing project-related operations.
+
+    Projects are stored in the columnar layout described in Project_Store. Every mutation
+    is validated, then appended to the Operation_Log as a Project_Operations operation;
+    the log is folded into the project store in the background. Reads are served from
+    the Project_Cache; on a miss the pending operations of a project are applied on top
+    of the project store. Every mutation holds the lock of the Operation_Log of its
+    project's store from validation to append, so mutations of projects in different
+    shards do not wait for each other, and each costs one append and fsync of its log.
+
+    Every task has an identifier that is unique within its project and never reused.
+    Identifiers are assigned here, before the operation is logged, so replaying the log
+    always yields the same identifiers.
     """
 
+    TASK_FIELDS = ("name", "description", "priority", "deadline", "category", "status", "assignee")
+
     @staticmethod
     def add_project(project: Project):
         """
@@ -22,9 +43,10 @@ class Project_Utilities:
         Raises:
             ValueError: If a project with the same name already exists.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'a') as project_data:
-            serialized_project = pickle.dumps(project)
-            project_data.create_dataset(project.name, data=np.void(serialized_project))
+        with Operation_Log.lock(project.name):
+            if Project_Utilities.project_exists(project.name):
+                raise ValueError(f"Project '{project.name}' already exists.")
+            Project_Utilities._commit([Project_Operations.create_project(project)])
     
     @staticmethod
     def delete_project(project_name: str):
@@ -33,9 +55,13 @@ class Project_Utilities:
         
         Args:
             project_name (str): The name of the proejct to be deleted.
+
+        Raises:
+            ValueError: If the project is not found.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'a') as project_data:
-            del project_data[project_name]
+        with Operation_Log.lock(project_name):
+            Project_Utilities._require_project(project_name)
+            Project_Utilities._commit([Project_Operations.delete_project(project_name)])
 
     @staticmethod
     def project_exists(project_name: str):
@@ -48,11 +74,20 @@ class Project_Utilities:
         Returns:
             bool: True if the project exists, False otherwise.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'a') as project_data:
-            for project in project_data:
-                if project == project_name:
-                    return True
-            return False
+        pending = Operation_Log.pending(project_name)
+        with Storage_Manager.read(Storage_Manager.project_store(project_name)) as project_data:
+            checkpoint = Operation_Log.checkpoint(project_data)
+            exists = project_name in project_data
+
+        for seq, operations in pending:
+            if seq <= checkpoint:
+                continue
+            for operation in operations:
+                if operation["op"] == "create_project":
+                    exists = True
+                elif operation["op"] == "delete_project":
+                    exists = False
+        return exists
 
     @staticmethod
     def add_collaborator(username: str, role: str, project_name: str):
@@ -67,18 +102,9 @@ class Project_Utilities:
         Raises:
             ValueError: If the project does not exist or if loading the project fails.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'a') as project_data:
-            if project_name not in project_data:
-                raise ValueError(f"Project '{project_name}' not found.")
-            try:
-                serialized_project = project_data[project_name][()]
-                project_obj = pickle.loads(serialized_project)
-            except:
-                raise ValueError(f"Error loading project '{project_name}'")
-            project_obj.add_collaborator(username, role)
-            serialized_project = pickle.dumps(project_obj)
-            del project_data[project_name]
-            project_data.create_dataset(project_name, data=np.void(serialized_project))
+        with Operation_Log.lock(project_name):
+            Project_Utilities._require_project(project_name)
+            Project_Utilities._commit([Project_Operations.set_collaborator(project_name, username, role)])
 
             Account_Utilities.add_project(project_name, username)
 
@@ -93,10 +119,7 @@ class Project_Utilities:
         Returns:
             list: A list of collaborators in the project.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'r') as project_data:
-            serialized_project = project_data[project_name][()]
-            project_obj = pickle.loads(serialized_project)
-            return project_obj.collaborators
+        return Project_Utilities._read(project_name, "collaborators")
 
     @staticmethod
     def add_task(task: Task, project_name: str):
@@ -107,23 +130,18 @@ class Project_Utilities:
             task (Task): The Task object being added to the project.
             project_name (str): The name of the project that the task is being added to.
 
+        Returns:
+            int: The identifier of the task.
+
         Raises:
             ValueError: If the project is not found or there is an error loading the project.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'a') as project_data:
-            if project_name not in project_data:
-                raise ValueError(f"Project '{project_name}' not found.")
-
-            try:
-                serialized_project = project_data[project_name][()]
-                project_obj = pickle.loads(serialized_project)
-            except:
-                raise ValueError(f"Error loading project '{project_name}'")
-            
-            project_obj.tasks.append(task)
-            serialized_project = pickle.dumps(project_obj)
-            del project_data[project_name]
-            project_data.create_dataset(project_name, data=np.void(serialized_project))
+        with Operation_Log.lock(project_name):
+            Project_Utilities._require_project(project_name)
+            project_obj = Project_Utilities._project(project_name)
+            Project_Utilities._assign_task_ids([task], project_obj.task_index, project_obj.next_task_id)
+            Project_Utilities._commit([Project_Operations.add_task(project_name, task)])
+            return task.task_id
 
     @staticmethod
     def get_task_list(project_name: str):
@@ -139,10 +157,98 @@ class Project_Utilities:
         Raises:
             KeyError: If the project does not exist in the database.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'r') as project_data:
-            serialized_project = project_data[project_name][()]
-            project_obj = pickle.loads(serialized_project)
-            return project_obj.tasks
+        return Project_Utilities._read(project_name, "tasks")
+
+    @staticmethod
+    def find_tasks(project_name: str, status: str = None, assignee: str = None, category: str = None, priority: str = None, deadline_start: str = None, deadline_end: str = None):
+        """
+        Retrieves the tasks of a project matching every given filter, served from the
+        secondary indexes of the cached project. Filters left as None are ignored.
+
+        Args:
+            project_name (str): The name of the project whose tasks are being retrieved.
+            status (str, optional): The status of the tasks (TODO, DOING, DONE).
+            assignee (str, optional): The username of the assignee of the tasks.
+            category (str, optional): The category of the tasks.
+            priority (str, optional): The priority of the tasks (1-5).
+            deadline_start (str, optional): The earliest deadline, included (format: YYYY-MM-DD).
+            deadline_end (str, optional): The latest deadline, excluded (format: YYYY-MM-DD).
+
+        Returns:
+            list: The matching tasks, in task list order.
+
+        Raises:
+            KeyError: If the project does not exist in the database.
+        """
+        project_obj = Project_Utilities._project(project_name)
+        with Project_Cache.lock():
+            return project_obj.find_tasks(status, assignee, category, priority, deadline_start, deadline_end)
+
+    @staticmethod
+    def get_tasks_due(project_name: str, start: str, end: str):
+        """
+        Retrieves the tasks of a project whose deadline falls in [start, end), found by
+        bisecting the sorted deadline index of the cached project.
+
+        Args:
+            project_name (str): The name of the project.
+            start (str): The earliest deadline, included (format: YYYY-MM-DD).
+            end (str): The latest deadline, excluded (format: YYYY-MM-DD).
+
+        Returns:
+            list: The matching tasks, in deadline order.
+
+        Raises:
+            KeyError: If the project does not exist in the database.
+        """
+        project_obj = Project_Utilities._project(project_name)
+        with Project_Cache.lock():
+            return [project_obj.get_task(task_id) for task_id in project_obj.deadline_range(start, end)]
+
+    @staticmethod
+    def get_assigned_tasks(username: str, sort_by: str = "deadline", descending: bool = False, offset: int = 0, limit: int = None):
+        """
+        Retrieves the tasks assigned to a user across every project, from the assignee index.
+
+        Args:
+            username (str): The username of the assignee.
+            sort_by (str): The task field to sort by ('deadline' or 'priority'). Tasks missing the field come last.
+            descending (bool): Whether to sort in descending order.
+            offset (int): The number of sorted tasks to skip.
+            limit (int, optional): The maximum number of tasks to return. Unlimited if None.
+
+        Returns:
+            tuple: The total number of tasks assigned to the user, and the requested page as a
+                   list of (project name, Task) tuples.
+
+        Raises:
+            ValueError: If sort_by is not 'deadline' or 'priority'.
+        """
+        if sort_by not in ("deadline", "priority"):
+            raise ValueError(f"Cannot sort tasks by '{sort_by}'.")
+
+        entries = {}
+        for project_name, task_id in Assignee_Index.lookup(username):
+            entries.setdefault(project_name, []).append(task_id)
+
+        assigned = []
+        for project_name, task_ids in entries.items():
+            try:
+                project_obj = Project_Utilities._project(project_name)
+            except KeyError:
+                continue
+            with Project_Cache.lock():
+                for task_id in task_ids:
+                    if task_id in project_obj.task_index:
+                        assigned.append((project_name, project_obj.get_task(task_id)))
+
+        present = [entry for entry in assigned if getattr(entry[1], sort_by) not in (None, "")]
+        missing = [entry for entry in assigned if getattr(entry[1], sort_by) in (None, "")]
+        present.sort(key=lambda entry: (str(getattr(entry[1], sort_by)), entry[0], entry[1].task_id), reverse=descending)
+        missing.sort(key=lambda entry: (entry[0], entry[1].task_id))
+        ordered = present + missing
+        end = None if limit is None else offset + limit
+        return len(ordered), ordered[offset:end]
 
     @staticmethod
     def add_category(category_name: str, project_name: str):
@@ -156,20 +262,9 @@ class Project_Utilities:
         Raises:
             ValueError: If the project is not found or there is an error loading the project.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'a') as project_data:
-            if project_name not in project_data:
-                raise ValueError(f"Project '{project_name}' not found.")
-
-            try:
-                serialized_project = project_data[project_name][()]
-                project_obj = pickle.loads(serialized_project)
-            except:
-                raise ValueError(f"Error loading project '{project_name}'")
-
-            project_obj.categories.append(category_name)
-            serialized_project = pickle.dumps(project_obj)
-            del project_data[project_name]
-            project_data.create_dataset(project_name, data=np.void(serialized_project))
+        with Operation_Log.lock(project_name):
+            Project_Utilities._require_project(project_name)
+            Project_Utilities._commit([Project_Operations.add_category(project_name, category_name)])
 
     @staticmethod
     def get_category_list(project_name: str):
@@ -185,10 +280,7 @@ class Project_Utilities:
         Raises:
             KeyError: If the project does not exist in the database.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'r') as project_data:
-            serialized_project = project_data[project_name][()]
-            project_obj = pickle.loads(serialized_project)
-            return project_obj.categories
+        return Project_Utilities._read(project_name, "categories")
 
     @staticmethod
     def category_exists(category_name: str, project_name: str):
@@ -211,7 +303,8 @@ class Project_Utilities:
     @staticmethod
     def update_task_list(project_name: str, task_list: list[dict]):
         """
-        Updates the task list for a given project.
+        Updates the task list for a given project. Tasks keep their identifier when the
+        dictionary holds the 'id' of an existing task; other tasks are given a new one.
 
         Args:
             project_name (str): The name of the project whose task list is being updated.
@@ -220,32 +313,65 @@ class Project_Utilities:
         Raises:
             ValueError: If the project is not found or there is an error loading the project.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'a') as project_data:
-            if project_name not in project_data:
-                raise ValueError(f"Project '{project_name}' not found.")
+        tasks = [Project_Utilities._task_from_dict(task) for task in task_list]
 
-            try:
-                serialized_project = project_data[project_name][()]
-                project_obj = pickle.loads(serialized_project)
-            except:
-                raise ValueError(f"Error loading project '{project_name}'")
-            
-            project_obj.tasks = []
-            for task in task_list:
-                task_obj = Task(
-                    name=task.get('name'), 
-                    description=task.get('description'),
-                    priority=task.get('priority'), 
-                    deadline=task.get('deadline'), 
-                    category=task.get('category'),
-                    status=task.get('status'),
-                    assignee=task.get('assignee')
-                )
-                project_obj.tasks.append(task_obj)
-
-            serialized_project = pickle.dumps(project_obj)
-            del project_data[project_name]
-            project_data.create_dataset(project_name, data=np.void(serialized_project))
+        with Operation_Log.lock(project_name):
+            Project_Utilities._require_project(project_name)
+            project_obj = Project_Utilities._project(project_name)
+            Project_Utilities._assign_task_ids(tasks, project_obj.task_index, project_obj.next_task_id, replace=True)
+            Project_Utilities._commit([Project_Operations.set_tasks(project_name, tasks)])
+
+    @staticmethod
+    def patch_tasks(project_name: str, updates: list[dict], inserts: list[dict], deletes: list[int]):
+        """
+        Applies a patch to the task list of a project as a single write. Only the changed
+        fields, the new tasks and the identifiers of the deleted tasks are sent and logged,
+        so the cost of a patch does not depend on the size of the task list.
+
+        Args:
+            project_name (str): The name of the project whose tasks are being patched.
+            updates (list[dict]): Dictionaries holding the 'id' of a task and the fields to change.
+            inserts (list[dict]): Dictionaries holding the contents of the tasks to add.
+            deletes (list[int]): The identifiers of the tasks to delete.
+
+        Returns:
+            list: The identifiers given to the inserted tasks, in order.
+
+        Raises:
+            ValueError: If the project is not found, a task identifier is unknown or a field
+                        is not a task field. Nothing is applied.
+        """
+        with Operation_Log.lock(project_name):
+            Project_Utilities._require_project(project_name)
+            project_obj = Project_Utilities._project(project_name)
+
+            log_operations = []
+            for update in updates:
+                task_id = Project_Utilities._task_id(project_obj, update.get("id"))
+                for field, value in update.items():
+                    if field == "id":
+                        continue
+                    if field not in Project_Utilities.TASK_FIELDS:
+                        raise ValueError(f"'{field}' is not a task field.")
+                    log_operations.append(Project_Operations.set_field(project_name, task_id, field, value))
+
+            deleted = set()
+            for task_id in deletes:
+                task_id = Project_Utilities._task_id(project_obj, task_id)
+                if task_id in deleted:
+                    raise ValueError(f"Task {task_id} is deleted more than once.")
+                deleted.add(task_id)
+                log_operations.append(Project_Operations.delete_task(project_name, task_id))
+
+            tasks = [Project_Utilities._task_from_dict(task) for task in inserts]
+            for task in tasks:
+                task.task_id = None
+            Project_Utilities._assign_task_ids(tasks, project_obj.task_index, project_obj.next_task_id)
+            log_operations += [Project_Operations.add_task(project_name, task) for task in tasks]
+
+            if log_operations:
+                Project_Utilities._commit(log_operations)
+            return [task.task_id for task in tasks]
 
     @staticmethod
     def remove_category(project_name: str, category_name: str):
@@ -257,27 +383,13 @@ class Project_Utilities:
             category_name (str): The name of the category being deleted.
 
         Raises:
-            ValueError: If the project is not found or there is an error loading the project.
+            ValueError: If the project or the category is not found.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'a') as project_data:
-            if project_name not in project_data:
-                raise ValueError(f"Project '{project_name}' not found.")
-
-            try:
-                serialized_project = project_data[project_name][()]
-                project_obj = pickle.loads(serialized_project)
-            except:
-                raise ValueError(f"Error loading project '{project_name}'")
-            
-            for task in project_obj.tasks:
-                if task.category == category_name:
-                    task.category = "None"
-
-            project_obj.remove_category(category_name)
-
-            serialized_project = pickle.dumps(project_obj)
-            del project_data[project_name]
-            project_data.create_dataset(project_name, data=np.void(serialized_project))
+        with Operation_Log.lock(project_name):
+            Project_Utilities._require_project(project_name)
+            if not Project_Utilities.category_exists(category_name, project_name):
+                raise ValueError(f"Category '{category_name}' not found in project {project_name}.")
+            Project_Utilities._commit([Project_Operations.remove_category(project_name, category_name)])
 
     @staticmethod
     def get_user_role(project_name: str, username: str):
@@ -295,10 +407,7 @@ class Project_Utilities:
             ValueError: If the user is not found in the project.
         """
         if Account_Utilities.user_has_project(username, project_name):
-            with h5py.File('/app/database/project_data.hdf5', 'r') as project_data:
-                serialized_project = project_data[project_name][()]
-                project_obj = pickle.loads(serialized_project)
-                return project_obj.collaborators[username]
+            return Project_Utilities.get_collaborators(project_name)[username]
         else:
             raise ValueError(f"User '{username}' is not in project {project_name}.")
 
@@ -316,13 +425,9 @@ class Project_Utilities:
             ValueError: If the user is not found in the project or there is an error updating the role.
         """
         if Account_Utilities.user_has_project(username, project_name):
-            with h5py.File('/app/database/project_data.hdf5', 'a') as project_data:
-                serialized_project = project_data[project_name][()]
-                project_obj = pickle.loads(serialized_project)
-                project_obj.update_role(username, new_role)
-                serialized_project = pickle.dumps(project_obj)
-                del project_data[project_name]
-                project_data.create_dataset(project_name, data=np.void(serialized_project))
+            with Operation_Log.lock(project_name):
+                Project_Utilities._require_project(project_name)
+                Project_Utilities._commit([Project_Operations.set_collaborator(project_name, username, new_role)])
         else:
             raise ValueError(f"User '{username}' is not in project {project_name}.")
 
@@ -338,21 +443,317 @@ class Project_Utilities:
         Raises:
             ValueError: If the project is not found or there is an error removing the collaborator.
         """
-        with h5py.File('/app/database/project_data.hdf5', 'a') as project_data:
-            if project_name not in project_data:
-                raise ValueError(f"Project '{project_name}' not found.")
-            try:
-                serialized_project = project_data[project_name][()]
-                project_obj = pickle.loads(serialized_project)
-            except:
-                raise ValueError(f"Error loading project '{project_name}'")
-            project_obj.remove_collaborator(collaborator)
-            serialized_project = pickle.dumps(project_obj)
-            del project_data[project_name]
-            project_data.create_dataset(project_name, data=np.void(serialized_project))
+        with Operation_Log.lock(project_name):
+            Project_Utilities._require_project(project_name)
+            if collaborator not in Project_Utilities.get_collaborators(project_name):
+                raise ValueError(f"User '{collaborator}' is not in project {project_name}.")
+            Project_Utilities._commit([Project_Operations.remove_collaborator(project_name, collaborator)])
 
             Account_Utilities.delete_project(project_name, collaborator)
 
+    @staticmethod
+    def apply_batch(project_name: str, operations: list[dict]):
+        """
+        Applies an ordered list of operations to a project and persists them as a single
+        write. Every operation is validated against the state left by the previous ones
+        before anything is written, so either all operations are applied or none are.
+
+        Supported operations (each a dictionary with an 'op' key):
+            add_task: {'task': dict with the fields of a task}
+            update_task: {'task_id', 'fields': dict of the task fields to change}
+            delete_task: {'task_id'}
+            add_category: {'category_name'}
+            remove_category: {'category_name'}
+            add_collaborator: {'collaborator_name', 'role'}
+            update_role: {'collaborator', 'new_role'}
+            remove_collaborator: {'collaborator'}
+            update_task_list: {'updated_tasks': list of task dicts}
+
+        Args:
+            project_name (str): The name of the project the operations apply to.
+            operations (list[dict]): The operations, in the order they are applied.
+
+        Returns:
+            int: The number of operations applied.
+
+        Raises:
+            ValueError: If the project is not found or an operation is invalid, naming the
+                        position of the first invalid operation. Nothing is applied.
+        """
+        with Operation_Log.lock(project_name):
+            Project_Utilities._require_project(project_name)
+            project_obj = Project_Utilities._project(project_name)
+            categories = list(project_obj.categories)
+            collaborators = dict(project_obj.collaborators)
+            task_ids = set(project_obj.task_index)
+            next_task_id = project_obj.next_task_id
+            added_members, removed_members = [], []
+
+            log_operations = []
+            for index, operation in enumerate(operations):
+                name = operation.get("op")
+                try:
+                    if name == "add_task":
+                        task = Project_Utilities._task_from_dict(operation["task"])
+                        task.task_id = None
+                        next_task_id = Project_Utilities._assign_task_ids([task], task_ids, next_task_id)
+                        task_ids.add(task.task_id)
+                        log_operations.append(Project_Operations.add_task(project_name, task))
+                    elif name == "update_task":
+                        task_id = operation["task_id"]
+                        if task_id not in task_ids:
+                            raise ValueError(f"Task {task_id} not found")
+                        for field, value in operation["fields"].items():
+                            if field not in Project_Utilities.TASK_FIELDS:
+                                raise ValueError(f"'{field}' is not a task field")
+                            log_operations.append(Project_Operations.set_field(project_name, task_id, field, value))
+                    elif name == "delete_task":
+                        task_id = operation["task_id"]
+                        if task_id not in task_ids:
+                            raise ValueError(f"Task {task_id} not found")
+                        task_ids.remove(task_id)
+                        log_operations.append(Project_Operations.delete_task(project_name, task_id))
+                    elif name == "update_task_list":
+                        tasks = [Project_Utilities._task_from_dict(task) for task in operation["updated_tasks"]]
+                        next_task_id = Project_Utilities._assign_task_ids(tasks, task_ids, next_task_id, replace=True)
+                        task_ids = {task.task_id for task in tasks}
+                        log_operations.append(Project_Operations.set_tasks(project_name, tasks))
+                    elif name == "add_category":
+                        category_name = operation["category_name"]
+                        if category_name in categories:
+                            raise ValueError("Category already exists")
+                        categories.append(category_name)
+                        log_operations.append(Project_Operations.add_category(project_name, category_name))
+                    elif name == "remove_category":
+                        category_name = operation["category_name"]
+                        if category_name not in categories:
+                            raise ValueError(f"Category '{category_name}' not found")
+                        categories.remove(category_name)
+                        log_operations.append(Project_Operations.remove_category(project_name, category_name))
+                    elif name == "add_collaborator":
+                        collaborator = operation["collaborator_name"]
+                        if not Account_Utilities.username_exists(collaborator):
+                            raise ValueError(f"{collaborator} does not exist")
+                        if collaborator in collaborators:
+                            raise ValueError(f"{collaborator} is already a collaborator")
+                        collaborators[collaborator] = operation["role"]
+                        added_members.append(collaborator)
+                        log_operations.append(Project_Operations.set_collaborator(project_name, collaborator, operation["role"]))
+                    elif name == "update_role":
+                        collaborator = operation["collaborator"]
+                        if collaborator not in collaborators:
+                            raise ValueError(f"User '{collaborator}' is not in project {project_name}")
+                        collaborators[collaborator] = operation["new_role"]
+                        log_operations.append(Project_Operations.set_collaborator(project_name, collaborator, operation["new_role"]))
+                    elif name == "remove_collaborator":
+                        collaborator = operation["collaborator"]
+                        if collaborator not in collaborators:
+                            raise ValueError(f"User '{collaborator}' is not in project {project_name}")
+                        del collaborators[collaborator]
+                        removed_members.append(collaborator)
+                        log_operations.append(Project_Operations.remove_collaborator(project_name, collaborator))
+                    else:
+                        raise ValueError("Unknown operation")
+                except KeyError as e:
+                    raise ValueError(f"Operation {index} ({name}): missing field {e}")
+                except ValueError as e:
+                    raise ValueError(f"Operation {index} ({name}): {e}")
+
+            if log_operations:
+                Project_Utilities._commit(log_operations)
+
+            for collaborator in added_members:
+                if collaborator not in removed_members:
+                    Account_Utilities.add_project(project_name, collaborator)
+            for collaborator in removed_members:
+                if collaborator not in added_members:
+                    Account_Utilities.delete_project(project_name, collaborator)
+            return len(log_operations)
+
+    @staticmethod
+    def migrate():
+        """
+        Converts every project stored in the legacy pickled-blob format to the columnar layout.
+
+        Returns:
+            list: The names of the projects that were migrated.
+        """
+        migrated = []
+        for store in Storage_Manager.project_stores():
+            with Storage_Manager.write(store) as project_data:
+                for project_name in list(project_data.keys()):
+                    if Project_Store.is_legacy(project_data, project_name):
+                        Project_Store.migrate_project(project_data, project_name)
+                        migrated.append(project_name)
+        return migrated
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @staticmethod
+    def _require_project(project_name: str):
+        """
+        Raises a ValueError if a project does not exist.
+        """
+        if not Project_Utilities.project_exists(project_name):
+            raise ValueError(f"Project '{project_name}' not found.")
+
+    @staticmethod
+    def _task_from_dict(task: dict):
+        """
+        Builds a Task from a dictionary holding the contents of a task object.
+        """
+        return Task(
+            name=task.get('name'), 
+            description=task.get('description'),
+            priority=task.get('priority'), 
+            deadline=task.get('deadline'), 
+            category=task.get('category'),
+            status=task.get('status'),
+            assignee=task.get('assignee'),
+            task_id=int(task['id']) if task.get('id') is not None else None
+        )
+
+    @staticmethod
+    def _task_id(project_obj: Project, task_id):
+        """
+        Returns a task identifier as an int, raising a ValueError if the project has no such task.
+        """
+        try:
+            task_id = int(task_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid task identifier '{task_id}'.")
+        if task_id not in project_obj.task_index:
+            raise ValueError(f"Task {task_id} not found in project {project_obj.name}.")
+        return task_id
+
+    @staticmethod
+    def _assign_task_ids(tasks: list, task_ids, next_task_id: int, replace: bool = False):
+        """
+        Gives every task without an identifier the next identifier of the project, and
+        returns the identifier that follows. When the tasks replace the whole task list,
+        identifiers that are not in task_ids or are repeated are replaced as well, so every
+        identifier stays unique.
+        """
+        if replace:
+            seen = set()
+            for task in tasks:
+                if task.task_id not in task_ids or task.task_id in seen:
+                    task.task_id = None
+                seen.add(task.task_id)
+        for task in tasks:
+            if task.task_id is None:
+                task.task_id = next_task_id
+                next_task_id += 1
+        return next_task_id
+
+    @staticmethod
+    def _commit(operations: list):
+        """
+        Appends the operations of one write to the operation log and applies them to the
+        cached copy of every project they touch, so the cached indexes are updated
+        incrementally instead of being rebuilt.
+        """
+        Operation_Log.append(operations)
+        Project_Utilities._apply_logged(operations)
+
+    @staticmethod
+    def _apply_logged(operations: list):
+        """
+        Applies the operations of one logged write to the assignee index and to the cached
+        copy of every project they touch, and forgets the projects they delete. Also called
+        by the operation log with the writes of other worker processes, and with None when
+        this process missed some of them, which drops both caches.
+        """
+        if operations is None:
+            Project_Cache.clear()
+            Assignee_Index.clear()
+            return
+        for operation in operations:
+            Assignee_Index.apply(operation)
+        for project_name in dict.fromkeys(operation["project"] for operation in operations):
+            project_operations = [operation for operation in operations if operation["project"] == project_name]
+            Project_Cache.update(project_name, lambda project_obj: Project_Utilities._apply(project_obj, project_operations))
+            if project_operations[-1]["op"] == "delete_project":
+                Project_Cache.forget(project_name)
+
+    @staticmethod
+    def _apply(project_obj: Project, operations: list):
+        """
+        Applies operations to a project in memory, returning the updated project.
+        """
+        for operation in operations:
+            project_obj = Project_Operations.apply_to_project(project_obj, operation)
+        return project_obj
+
+    @staticmethod
+    def _project(project_name: str):
+        """
+        Returns the current project from the project cache, loading it on a miss. The
+        cached object is returned, so callers must not change it, and must hold
+        Project_Cache.lock() while reading from it.
+
+        Raises:
+            KeyError: If the project does not exist.
+        """
+        Operation_Log.sync(project_name)
+        project_obj = Project_Cache.get(project_name)
+        if project_obj is None:
+            project_obj = Project_Utilities._load(project_name)
+        return project_obj
+
+    @staticmethod
+    def _read(project_name: str, part: str):
+        """
+        Reads part of a project ('tasks', 'categories' or 'collaborators') from the
+        project cache, loading the project on a miss. A copy of the part is returned so
+        callers cannot change the cached project.
+
+        Raises:
+            KeyError: If the project does not exist.
+        """
+        project_obj = Project_Utilities._project(project_name)
+        with Project_Cache.lock():
+            return copy.copy(getattr(project_obj, part))
+
+    @staticmethod
+    def _load(project_name: str):
+        """
+        Loads a project from the project store, applies its pending log operations on top
+        and caches the result. A project still stored as a legacy pickled blob is upgraded
+        to the columnar layout the first time it is loaded.
+
+        Raises:
+            KeyError: If the project does not exist.
+        """
+        generation = Project_Cache.generation(project_name)
+        pending = Operation_Log.pending(project_name)
+        store = Storage_Manager.project_store(project_name)
+        with Storage_Manager.read(store) as project_data:
+            legacy = project_name in project_data and Project_Store.is_legacy(project_data, project_name)
+        if legacy:
+            # Migrated under a write of its own, since another worker may be reading the store
+            with Storage_Manager.write(store) as project_data:
+                if project_name in project_data and Project_Store.is_legacy(project_data, project_name):
+                    Project_Store.migrate_project(project_data, project_name)
+        with Storage_Manager.read(store) as project_data:
+            checkpoint = Operation_Log.checkpoint(project_data)
+            project_obj = None
+            if project_name in project_data:
+                project_obj = Project_Store.read_project(project_data, project_name)
+
+        for seq, operations in pending:
+            if seq <= checkpoint:
+                continue
+            for operation in operations:
+                project_obj = Project_Operations.apply_to_project(project_obj, operation)
+        if project_obj is None:
+            raise KeyError(f"Project '{project_name}' not found.")
+
+        Project_Cache.put(project_name, project_obj, generation)
+        return project_obj
+
     #################################################
     # THE FOLLOWING FUNCTION IS TO RESET THE DATABASE
     #################################################
@@ -365,7 +766,11 @@ class Project_Utilities:
         This function creates multiple projects with sample tasks and categories for testing purposes.
         """
 
-        project_data = h5py.File('/app/database/project_data.hdf5', 'w')
+        for store in Storage_Manager.project_stores():
+            Storage_Manager.truncate(store)
+        Operation_Log.truncate()
+        Project_Cache.clear()
+        Assignee_Index.clear()
 
         #################
         ### PROJECT 1 ###
@@ -490,3 +895,38 @@ class Project_Utilities:
         Project_Utilities.add_task(task4, 'Project4')
         Project_Utilities.add_task(task5, 'Project4')
         Project_Utilities.add_task(task6, 'Project4')
+
+    @staticmethod
+    def load_snapshot(snapshot_dir: str):
+        """
+        Replace every project with those of a prebuilt snapshot of the database, such as the
+        sample data written by tools/build_fixture.py. The snapshot holds a single project
+        file, which is copied as a whole, or split project by project with HDF5's object
+        copy when the projects are sharded. The operation log is emptied.
+
+        Args:
+            snapshot_dir (str): The directory holding the snapshot files.
+        """
+        snapshot_path = os.path.join(snapshot_dir, Storage_Manager.shard_files(1)["project"])
+        if Storage_Manager.PROJECT_SHARDS == 1:
+            Storage_Manager.restore('project', snapshot_path)
+        else:
+            with tempfile.TemporaryDirectory() as split_dir:
+                split_paths = {store: os.path.join(split_dir, file_name) for store, file_name in Storage_Manager.PROJECT_STORES.items()}
+                split_files = {store: h5py.File(path, 'w') for store, path in split_paths.items()}
+                try:
+                    with h5py.File(snapshot_path, 'r') as snapshot:
+                        for project_name in snapshot.keys():
+                            snapshot.copy(snapshot[project_name], split_files[Storage_Manager.project_store(project_name)], name=project_name)
+                    for split_file in split_files.values():
+                        split_file.attrs["shards"] = Storage_Manager.PROJECT_SHARDS
+                finally:
+                    for split_file in split_files.values():
+                        split_file.close()
+                for store, path in split_paths.items():
+                    Storage_Manager.restore(store, path)
+        Operation_Log.truncate()
+        Project_Cache.clear()
+        Assignee_Index.clear()
+
+Operation_Log.subscribe(Project_Utilities._apply_logged)
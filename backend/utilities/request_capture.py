@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import threading
+import urllib.parse
+
+class Request_Capture:
+    """
+    Append-only capture of the requests served, for replaying production traffic offline
+    with benchmarks/replay_benchmark.py.
+
+    Capture is off unless CAPTURE_FILE is set, in which case main.py adds a middleware that
+    records every request with one JSON line appended to the file: its arrival time, method,
+    route template, path, query string and body, and its status, duration, and the length
+    and digest of its response, so a replay can check that it gets the same responses.
+    Passwords in the query string are redacted and headers are not recorded, so the
+    capture holds no credentials. Lines are appended with a single write on a file opened
+    with O_APPEND, so the workers of one server can share the file.
+
+    Attributes:
+        CAPTURE_FILE (str): The file requests are appended to, or "" for no capture (HONEYDUE_CAPTURE_FILE).
+        SKIPPED_PATHS (tuple): The paths that are not captured.
+        REDACTED (str): The value written in place of a password.
+
+    Methods:
+        enabled(): Return whether requests are captured.
+        record(...): Append a served request to the capture file.
+        read(path): Return the requests of a capture file.
+        redact(query): Return a query string with its passwords redacted.
+        digest(body): Return the digest of a response body.
+        stop(): Close the capture file.
+        stats(): Return the capture counters.
+    """
+
+    CAPTURE_FILE = os.environ.get("HONEYDUE_CAPTURE_FILE", "")
+    SKIPPED_PATHS = ("/__internal/stats", "/__internal/metrics")
+    REDACTED = "<redacted>"
+
+    _lock = threading.Lock()
+    _fd = None
+    _counters = {"captured": 0, "bytes": 0}
+
+    @classmethod
+    def enabled(cls):
+        """
+        Return whether requests are captured.
+
+        Returns:
+            bool: True if CAPTURE_FILE is set, False otherwise.
+        """
+        return bool(cls.CAPTURE_FILE)
+
+    @classmethod
+    def record(cls, started: float, method: str, route: str, path: str, query: str, body: bytes, status: int, duration_ms: float, response_body: bytes):
+        """
+        Append a served request to the capture file, opening the file on first use.
+
+        Args:
+            started (float): The arrival time of the request as a Unix timestamp.
+            method (str): The HTTP method.
+            route (str): The path template of the endpoint that served it, such as /{username}/{project_name}/task.
+            path (str): The path of the request.
+            query (str): The query string of the request.
+            body (bytes): The body of the request.
+            status (int): The status code of the response.
+            duration_ms (float): The time taken to serve the request in milliseconds.
+            response_body (bytes): The body of the response.
+        """
+        entry = {
+            "t": round(started, 6),
+            "m": method,
+            "r": route,
+            "p": path,
+            "q": Request_Capture.redact(query),
+            "b": body.decode('utf-8', 'replace'),
+            "s": status,
+            "d": round(duration_ms, 3),
+            "n": len(response_body),
+            "h": Request_Capture.digest(response_body),
+        }
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode('utf-8')
+        with cls._lock:
+            if cls._fd is None:
+                cls._fd = os.open(cls.CAPTURE_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            os.write(cls._fd, line)
+            cls._counters["captured"] += 1
+            cls._counters["bytes"] += len(line)
+
+    @staticmethod
+    def read(path: str):
+        """
+        Return the requests of a capture file, in the order they were appended.
+
+        Args:
+            path (str): The capture file.
+
+        Returns:
+            list[dict]: One dictionary per request, with the keys written by record. A
+                        trailing line cut short by a crash is left out.
+        """
+        entries = []
+        with open(path, 'r', encoding='utf-8') as capture:
+            for line in capture:
+                if line.endswith("\n"):
+                    entries.append(json.loads(line))
+        return entries
+
+    @staticmethod
+    def redact(query: str):
+        """
+        Return a query string with the value of every parameter whose name holds "password" redacted.
+
+        Args:
+            query (str): The query string.
+
+        Returns:
+            str: The redacted query string.
+        """
+        if "password" not in query:
+            return query
+        parameters = urllib.parse.parse_qsl(query, keep_blank_values=True)
+        return urllib.parse.urlencode([(name, Request_Capture.REDACTED if "password" in name else value) for name, value in parameters])
+
+    @staticmethod
+    def digest(body: bytes):
+        """
+        Return the digest of a response body, used to compare responses without storing them.
+
+        Args:
+            body (bytes): The response body.
+
+        Returns:
+            str: The first 16 hex digits of its SHA-256.
+        """
+        return hashlib.sha256(body).hexdigest()[:16]
+
+    @classmethod
+    def stop(cls):
+        """
+        Close the capture file. It is opened again by the next record.
+        """
+        with cls._lock:
+            if cls._fd is not None:
+                os.close(cls._fd)
+                cls._fd = None
+
+    @classmethod
+    def stats(cls):
+        """
+        Return the capture counters.
+
+        Returns:
+            dict: Whether capture is enabled, and the number of requests and bytes captured.
+        """
+        with cls._lock:
+            return {"enabled": cls.enabled(), **cls._counters}
@@ -0,0 +1,99 @@
+import hashlib
+import hmac
+import os
+import threading
+
+from utilities.storage_manager import Storage_Manager
+
+class Server_Secret:
+    """
+    The secret key of the server, used to derive the keys of HMAC fingerprints and signatures.
+
+    The key is read from HONEYDUE_SECRET_KEY, or from the file named by
+    HONEYDUE_SECRET_KEY_FILE, and the server refuses to start with neither. The key file
+    must not be inside the database directory: that directory is shared with the frontend
+    container, and anyone holding both the key and the account store could test guesses
+    against the password fingerprints and forge session tokens. Every user of the secret
+    derives its own key with derive, so a value computed for one purpose can never be
+    accepted for another.
+
+    Attributes:
+        KEY_ENV (str): The environment variable holding the key.
+        KEY_FILE_ENV (str): The environment variable holding the path of a file holding the key.
+
+    Methods:
+        start(): Load the secret key, failing if none is configured.
+        get(): Return the secret key.
+        derive(purpose): Return a key derived from the secret for one purpose.
+    """
+
+    KEY_ENV = "HONEYDUE_SECRET_KEY"
+    KEY_FILE_ENV = "HONEYDUE_SECRET_KEY_FILE"
+
+    _lock = threading.Lock()
+    _key = None
+
+    @classmethod
+    def start(cls):
+        """
+        Load the secret key, so the server refuses to start without one.
+
+        Raises:
+            RuntimeError: If no key is configured, or the key file is inside the database directory.
+        """
+        cls.get()
+
+    @classmethod
+    def get(cls):
+        """
+        Return the secret key, loading it on first use.
+
+        Returns:
+            bytes: The secret key.
+
+        Raises:
+            RuntimeError: If no key is configured, or the key file is inside the database directory.
+        """
+        with cls._lock:
+            if cls._key is None:
+                cls._key = cls._load()
+            return cls._key
+
+    @classmethod
+    def derive(cls, purpose: str):
+        """
+        Return a key derived from the secret for one purpose.
+
+        Args:
+            purpose (str): The name of the purpose, such as 'password-index'.
+
+        Returns:
+            bytes: The derived key.
+        """
+        return hmac.new(cls.get(), purpose.encode('utf-8'), hashlib.sha256).digest()
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @classmethod
+    def _load(cls):
+        """
+        Read the key from the environment or the key file.
+        """
+        configured = os.environ.get(cls.KEY_ENV)
+        if configured:
+            return configured.encode('utf-8')
+
+        path = os.environ.get(cls.KEY_FILE_ENV)
+        if not path:
+            raise RuntimeError(f"No secret key is configured: set {cls.KEY_ENV}, or {cls.KEY_FILE_ENV} to a file outside the database directory")
+        path = os.path.realpath(path)
+        database_dir = os.path.realpath(Storage_Manager.DATABASE_DIR)
+        if os.path.commonpath([path, database_dir]) == database_dir:
+            raise RuntimeError(f"The secret key file {path} is inside the database directory {database_dir}")
+        with open(path, 'rb') as key_file:
+            key = key_file.read().strip()
+        if not key:
+            raise RuntimeError(f"The secret key file {path} is empty")
+        return key
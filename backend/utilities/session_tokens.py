@@ -0,0 +1,329 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+from collections import OrderedDict
+
+from utilities.server_secret import Server_Secret
+from utilities.storage_manager import Storage_Manager
+from utilities.worker_coordinator import Worker_Coordinator
+
+class Session_Tokens:
+    """
+    Signed, expiring session tokens issued at login.
+
+    A token is the base64 JSON payload {"sub": username, "sid": session id, "exp": expiry}
+    followed by an HMAC-SHA256 signature of the payload, keyed with a key derived from the
+    Server_Secret. Checking a token therefore costs one HMAC instead of a bcrypt check, and
+    tokens stay valid across restarts as long as the secret does.
+
+    Tokens that passed the signature check are kept in a bounded session cache, so later
+    requests with the same token are a dictionary lookup. Logged out sessions are appended
+    to the revocation file in the database directory, and kept in a revocation set until
+    they expire. The file is shared by the worker processes as the 'sessions' resource of
+    the Worker_Coordinator: a worker that finds its epoch moved reads the revocations
+    appended since it last looked, and drops their tokens from its session cache, before
+    it checks a token. A revoked session therefore stays revoked in every worker and
+    across restarts. The file is rewritten without the expired revocations once they
+    make up most of it.
+
+    Attributes:
+        TOKEN_TTL (int): The lifetime of a token in seconds (HONEYDUE_SESSION_TTL).
+        CACHE_SIZE (int): The maximum number of tokens in the session cache (HONEYDUE_SESSION_CACHE_SIZE).
+        REVOCATION_FILE (str): The name of the revocation file inside the database directory.
+
+    Methods:
+        issue(username): Issue a token for a user.
+        validate(token, username): Check that a token is valid for a user.
+        revoke(token): Revoke the session of a token.
+        clear(): Drop the session cache and the revocations.
+        stats(): Return the issue and validation counters.
+    """
+
+    TOKEN_TTL = int(os.environ.get("HONEYDUE_SESSION_TTL", 12 * 60 * 60))
+    CACHE_SIZE = int(os.environ.get("HONEYDUE_SESSION_CACHE_SIZE", 10000))
+    REVOCATION_FILE = "session_revocations"
+
+    _RESOURCE = "sessions"
+    _PRUNE_LINES = 1000
+
+    _lock = threading.Lock()
+    _file_lock = threading.Lock()
+    _key = None
+    _sessions = OrderedDict()
+    _revoked = {}
+    _revocations_inode = None
+    _revocations_read = 0
+    _revocation_lines = 0
+    _counters = {"issued": 0, "revoked": 0, "validated": 0, "rejected": 0, "cache_hits": 0, "validate_ms_total": 0.0, "validate_ms_max": 0.0}
+
+    @classmethod
+    def issue(cls, username: str):
+        """
+        Issue a token for a user.
+
+        Args:
+            username (str): The username of the user who logged in.
+
+        Returns:
+            tuple: The token and its expiry as a Unix timestamp.
+        """
+        expires = int(time.time()) + cls.TOKEN_TTL
+        payload = json.dumps({"sub": username, "sid": secrets.token_urlsafe(16), "exp": expires}, separators=(",", ":"))
+        encoded = cls._encode(payload.encode('utf-8'))
+        token = f"{encoded}.{cls._sign(encoded)}"
+        with cls._lock:
+            cls._counters["issued"] += 1
+            cls._cache(token, username, expires)
+        return token, expires
+
+    @classmethod
+    def validate(cls, token: str, username: str):
+        """
+        Check that a token is valid for a user: its signature matches, it has not expired,
+        its session has not been revoked and it was issued to that user.
+
+        Args:
+            token (str): The token sent with the request.
+            username (str): The username the request acts for.
+
+        Returns:
+            bool: True if the token is valid for the user, False otherwise.
+        """
+        started = time.perf_counter()
+        valid = cls._check(token, username)
+        elapsed = (time.perf_counter() - started) * 1000
+        with cls._lock:
+            cls._counters["validated" if valid else "rejected"] += 1
+            cls._counters["validate_ms_total"] += elapsed
+            cls._counters["validate_ms_max"] = max(cls._counters["validate_ms_max"], elapsed)
+        return valid
+
+    @classmethod
+    def revoke(cls, token: str):
+        """
+        Revoke the session of a token, so the token is rejected by every worker until it
+        expires.
+
+        Args:
+            token (str): A valid token.
+        """
+        claims = cls._verify(token)
+        if claims is None:
+            return
+        line = f"{claims['sid']} {claims['exp']}\n".encode('utf-8')
+        with cls._file_lock:
+            with Worker_Coordinator.hold(cls._RESOURCE, True):
+                os.makedirs(Storage_Manager.DATABASE_DIR, exist_ok=True)
+                descriptor = os.open(cls._revocation_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                try:
+                    os.write(descriptor, line)
+                finally:
+                    os.close(descriptor)
+                Worker_Coordinator.changed(cls._RESOURCE)
+                cls._read_revocations()
+                if cls._revocation_lines > max(cls._PRUNE_LINES, 2 * len(cls._revoked)):
+                    cls._prune_revocations()
+        with cls._lock:
+            cls._counters["revoked"] += 1
+
+    @classmethod
+    def clear(cls):
+        """
+        Drop the session cache and the revocations, including the revocation file.
+        """
+        with cls._file_lock:
+            with Worker_Coordinator.hold(cls._RESOURCE, True):
+                try:
+                    os.remove(cls._revocation_path())
+                except FileNotFoundError:
+                    pass
+                Worker_Coordinator.changed(cls._RESOURCE)
+                with cls._lock:
+                    cls._sessions.clear()
+                    cls._revoked.clear()
+                    cls._revocations_inode = None
+                    cls._revocations_read = 0
+                    cls._revocation_lines = 0
+
+    @classmethod
+    def stats(cls):
+        """
+        Return the issue and validation counters.
+
+        Returns:
+            dict: The number of tokens issued, revoked, validated and rejected, the number of
+                  validations answered by the session cache, the total and maximum validation
+                  time in milliseconds, and the size of the session cache and revocation set.
+        """
+        with cls._lock:
+            stats = dict(cls._counters)
+            stats["sessions"] = len(cls._sessions)
+            stats["revocations"] = len(cls._revoked)
+            return stats
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @classmethod
+    def _check(cls, token: str, username: str):
+        """
+        Check a token against the session cache, falling back to its signature, after
+        reading the revocations of the other workers.
+        """
+        if not token:
+            return False
+        cls._sync()
+        now = time.time()
+        with cls._lock:
+            cached = cls._sessions.get(token)
+            if cached is not None:
+                cls._counters["cache_hits"] += 1
+                cls._sessions.move_to_end(token)
+                if cached[1] <= now:
+                    del cls._sessions[token]
+                    return False
+                return cached[0] == username
+
+        claims = cls._verify(token)
+        if claims is None or claims["exp"] <= now:
+            return False
+        with cls._lock:
+            if claims["sid"] in cls._revoked:
+                return False
+            cls._cache(token, claims["sub"], claims["exp"])
+        return claims["sub"] == username
+
+    @classmethod
+    def _sync(cls):
+        """
+        Read the revocation file on first use, and the revocations appended since whenever
+        another worker revoked a session. Costs a read of the epoch file otherwise.
+        """
+        if cls._revocations_inode is not None and not Worker_Coordinator.stale(cls._RESOURCE):
+            return
+        with cls._file_lock:
+            with Worker_Coordinator.hold(cls._RESOURCE, False):
+                cls._read_revocations()
+
+    @classmethod
+    def _read_revocations(cls):
+        """
+        Read the revocations appended to the file since it was last read, or the whole file
+        if it was rewritten, and drop the revoked sessions from the session cache. Must be
+        called with the file lock and the 'sessions' resource held.
+        """
+        try:
+            with open(cls._revocation_path(), 'rb') as revocation_file:
+                inode = os.fstat(revocation_file.fileno()).st_ino
+                if inode != cls._revocations_inode:
+                    with cls._lock:
+                        cls._revoked.clear()
+                    cls._revocations_read = 0
+                    cls._revocation_lines = 0
+                revocation_file.seek(cls._revocations_read)
+                data = revocation_file.read()
+        except FileNotFoundError:
+            inode, data = 0, b""
+        cls._revocations_inode = inode
+        # A line cut short by a crash is skipped, and so is a line still being appended
+        complete = data[:data.rfind(b"\n") + 1]
+        cls._revocations_read += len(complete)
+        now = time.time()
+        revoked = {}
+        for line in complete.decode('utf-8', 'replace').splitlines():
+            sid, _, expiry = line.partition(" ")
+            cls._revocation_lines += 1
+            if expiry.isdigit() and int(expiry) > now:
+                revoked[sid] = int(expiry)
+        if revoked:
+            with cls._lock:
+                cls._revoked.update(revoked)
+                for token in [token for token in cls._sessions if cls._session_id(token) in revoked]:
+                    del cls._sessions[token]
+
+    @classmethod
+    def _prune_revocations(cls):
+        """
+        Rewrite the revocation file with only the revocations that have not expired. Must
+        be called with the file lock and the 'sessions' resource held exclusive.
+        """
+        now = time.time()
+        with cls._lock:
+            live = {sid: expiry for sid, expiry in cls._revoked.items() if expiry > now}
+        path = cls._revocation_path()
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'wb') as revocation_file:
+            revocation_file.write("".join(f"{sid} {expiry}\n" for sid, expiry in live.items()).encode('utf-8'))
+            revocation_file.flush()
+            os.fsync(revocation_file.fileno())
+        os.replace(temporary_path, path)
+        cls._read_revocations()
+
+    @classmethod
+    def _revocation_path(cls):
+        """
+        Return the path of the revocation file.
+        """
+        return os.path.join(Storage_Manager.DATABASE_DIR, cls.REVOCATION_FILE)
+
+    @classmethod
+    def _session_id(cls, token: str):
+        """
+        Return the session id of a token whose signature was already checked.
+        """
+        encoded = token.partition(".")[0]
+        try:
+            return str(json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))["sid"])
+        except (ValueError, TypeError, KeyError):
+            return None
+
+    @classmethod
+    def _verify(cls, token: str):
+        """
+        Return the claims of a token if its signature matches, None otherwise.
+        """
+        encoded, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(signature.encode('utf-8'), cls._sign(encoded).encode('utf-8')):
+            return None
+        try:
+            claims = json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+            return {"sub": str(claims["sub"]), "sid": str(claims["sid"]), "exp": int(claims["exp"])}
+        except (ValueError, TypeError, KeyError):
+            return None
+
+    @classmethod
+    def _cache(cls, token: str, username: str, expires: int):
+        """
+        Add a token to the session cache, evicting the least recently used tokens and the
+        expired revocations when the cache is full. Must be called with the lock held.
+        """
+        cls._sessions[token] = (username, expires)
+        if len(cls._sessions) > cls.CACHE_SIZE:
+            now = time.time()
+            for sid in [sid for sid, expiry in cls._revoked.items() if expiry <= now]:
+                del cls._revoked[sid]
+            while len(cls._sessions) > cls.CACHE_SIZE:
+                cls._sessions.popitem(last=False)
+
+    @classmethod
+    def _sign(cls, encoded: str):
+        """
+        Return the signature of an encoded payload.
+        """
+        if cls._key is None:
+            cls._key = Server_Secret.derive("session-token")
+        return cls._encode(hmac.new(cls._key, encoded.encode('utf-8'), hashlib.sha256).digest())
+
+    @staticmethod
+    def _encode(data: bytes):
+        """
+        Encode bytes as unpadded URL-safe base64.
+        """
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode('ascii')
@@ -0,0 +1,484 @@
+import h5py
+import os
+import re
+import shutil
+import threading
+import zlib
+
+from contextlib import contextmanager
+
+from utilities.metrics import Metrics
+from utilities.worker_coordinator import Worker_Coordinator
+
+def _shard_files(shards: int):
+    """
+    Return the file name of each project shard store for a shard count. A single shard is
+    the original project_data.hdf5.
+    """
+    if shards == 1:
+        return {"project": "project_data.hdf5"}
+    return {f"project-{shard}": f"project_data-{shard}.hdf5" for shard in range(shards)}
+
+class Storage_Manager:
+    """
+    Keeps the HDF5 stores open for the lifetime of the application.
+
+    Each store is opened once, lazily, on first use and its handle is shared by every
+    request. Access is serialized per store with a re-entrant lock, so a utility that
+    holds a write handle can call another utility that reads the same store. Writes to
+    the project stores are flushed to disk after FLUSH_WRITES writes, every FLUSH_INTERVAL
+    seconds by a background thread, and when the manager is stopped, since every change
+    to them is first made durable in the Operation_Log. The stores of SYNC_STORES have no
+    log, so they are flushed and fsynced at the end of every outermost write instead: a
+    write that returned survives a crash or a power loss, and only a crash in the middle
+    of a write can leave its file partly written.
+
+    When several worker processes share the stores (see Worker_Coordinator), each read
+    and write also holds the store's file lock. Reads then use a read-only handle, which
+    is reopened when another process changed the store, and writes open a writable handle
+    that is flushed and closed before the lock is released: HDF5 cuts a file back to the
+    size it knows when a writable handle is closed, so a writable handle must never outlive
+    the lock. Caches built from a store compare generation(store) to know when to drop
+    their entries.
+
+    Projects are spread over PROJECT_SHARDS project stores, each project living in the
+    shard picked by the CRC-32 of its name (project_store), so each file only holds the
+    metadata of its own projects. Each shard also has its own Operation_Log, so writes to
+    projects in different shards take different log and store locks and fsync different
+    files. The chunk cache budget is split between the shards. The shard count of the
+    files on disk is checked at start; tools/reshard_projects.py moves the projects of an
+    offline database to another shard count.
+
+    Attributes:
+        DATABASE_DIR (str): The directory holding the HDF5 files (HONEYDUE_DATABASE_DIR).
+        PROJECT_SHARDS (int): The number of project stores (HONEYDUE_PROJECT_SHARDS).
+        PROJECT_STORES (dict): The file name of each project store.
+        STORES (dict): The file name of each store.
+        CHUNK_CACHE_BYTES (int): The size of the raw data chunk cache of the account store,
+                                 and of all the project stores together.
+        CHUNK_CACHE_SLOTS (int): The number of hash table slots of the chunk cache.
+        FLUSH_INTERVAL (float): The maximum number of seconds between a write and its flush.
+        FLUSH_WRITES (int): The number of writes after which a store is flushed immediately.
+        SYNC_STORES (tuple): The stores fsynced at the end of every write, as no log covers them.
+
+    Methods:
+        start(): Check the project shards on disk and start the background flusher.
+        stop(): Flush and close every store and stop the background flusher.
+        read(store): Context manager yielding the open file of a store for reading.
+        write(store): Context manager yielding the open file of a store for writing.
+        truncate(store): Empty a store.
+        flush(store): Flush one store, or every store, to disk.
+        sync(store): Flush a store and fsync its file.
+        path(store): Return the path of the file backing a store.
+        generation(store): Return how often another process was seen changing a store.
+        version(store): Return a counter moved by every change to a store.
+        swap(store, path): Replace the file of a store with another file.
+        restore(store, path): Replace the contents of a store with a copy of a file.
+        project_store(project_name, shards): Return the store holding a project.
+        project_stores(): Return the names of the project stores.
+        shard_files(shards): Return the file name of each project store for a shard count.
+        set_project_shards(shards): Change the number of project stores.
+    """
+
+    DATABASE_DIR = os.environ.get("HONEYDUE_DATABASE_DIR", "/app/database")
+    PROJECT_SHARDS = int(os.environ.get("HONEYDUE_PROJECT_SHARDS", 1))
+    PROJECT_STORES = _shard_files(PROJECT_SHARDS)
+    STORES = {"account": "account_data.hdf5", **PROJECT_STORES}
+    CHUNK_CACHE_BYTES = int(os.environ.get("HONEYDUE_CHUNK_CACHE_BYTES", 16 * 1024 * 1024))
+    CHUNK_CACHE_SLOTS = int(os.environ.get("HONEYDUE_CHUNK_CACHE_SLOTS", 10007))
+    FLUSH_INTERVAL = float(os.environ.get("HONEYDUE_FLUSH_INTERVAL", 1.0))
+    FLUSH_WRITES = int(os.environ.get("HONEYDUE_FLUSH_WRITES", 64))
+    SYNC_STORES = ("account",)
+
+    _files = {}
+    _locks = {store: threading.RLock() for store in STORES}
+    _pending_writes = {store: 0 for store in STORES}
+    _generations = {store: 0 for store in STORES}
+    _depth = {store: 0 for store in STORES}
+    _versions = {store: 0 for store in STORES}
+    _flusher = None
+    _stop_event = threading.Event()
+
+    ###########################
+    ### LIFECYCLE FUNCTIONS ###
+    ###########################
+
+    @classmethod
+    def start(cls):
+        """
+        Check that the project files on disk were written for PROJECT_SHARDS shards, and
+        start the background thread that flushes stores with pending writes.
+
+        Raises:
+            RuntimeError: If the project files on disk belong to another shard count.
+        """
+        cls._check_shards()
+        if cls._flusher is not None and cls._flusher.is_alive():
+            return
+        cls._stop_event.clear()
+        cls._flusher = threading.Thread(target=cls._flush_loop, name="storage-flusher", daemon=True)
+        cls._flusher.start()
+
+    @classmethod
+    def stop(cls):
+        """
+        Stop the background flusher, then flush and close every open store.
+        """
+        cls._stop_event.set()
+        if cls._flusher is not None:
+            cls._flusher.join()
+            cls._flusher = None
+        for store in cls.STORES:
+            with cls._locks[store]:
+                open_file = cls._files.pop(store, None)
+                if open_file is not None:
+                    open_file.close()
+                cls._pending_writes[store] = 0
+
+    ########################
+    ### HANDLE FUNCTIONS ###
+    ########################
+
+    @classmethod
+    @contextmanager
+    def read(cls, store: str):
+        """
+        Yield the open file of a store for reading.
+
+        Args:
+            store (str): The name of the store ('account' or a project store).
+
+        Yields:
+            h5py.File: The open file.
+        """
+        with cls._hold(store, False):
+            yield cls._open(store, writable=False)
+
+    @classmethod
+    @contextmanager
+    def write(cls, store: str):
+        """
+        Yield the open file of a store for writing. The store is flushed according to
+        the flush policy when the write finishes, and fsynced if it is one of SYNC_STORES
+        and the write is not nested in another.
+
+        Args:
+            store (str): The name of the store ('account' or a project store).
+
+        Yields:
+            h5py.File: The open file.
+        """
+        with cls._hold(store, True):
+            try:
+                yield cls._open(store)
+            finally:
+                cls._pending_writes[store] += 1
+                cls._versions[store] += 1
+                if store in cls.SYNC_STORES and cls._depth[store] == 1:
+                    cls.sync(store)
+                elif cls._pending_writes[store] >= cls.FLUSH_WRITES:
+                    cls.flush(store)
+                Worker_Coordinator.changed(store)
+
+    @classmethod
+    def truncate(cls, store: str):
+        """
+        Empty a store by recreating its file.
+
+        Args:
+            store (str): The name of the store ('account' or a project store).
+        """
+        with cls._hold(store, True):
+            open_file = cls._files.pop(store, None)
+            if open_file is not None:
+                open_file.close()
+            cls._files[store] = cls._open_file(store, 'w')
+            if store in cls.PROJECT_STORES:
+                cls._files[store].attrs["shards"] = cls.PROJECT_SHARDS
+            cls._pending_writes[store] = 0
+            cls._generations[store] += 1
+            cls._versions[store] += 1
+            Worker_Coordinator.changed(store)
+
+    @classmethod
+    def flush(cls, store: str = None):
+        """
+        Flush a store to disk.
+
+        Args:
+            store (str, optional): The name of the store. Every store is flushed if omitted.
+        """
+        stores = cls.STORES if store is None else [store]
+        for name in stores:
+            with cls._locks[name]:
+                open_file = cls._files.get(name)
+                if open_file is not None and cls._pending_writes[name] > 0:
+                    open_file.flush()
+                cls._pending_writes[name] = 0
+
+    @classmethod
+    def sync(cls, store: str):
+        """
+        Flush a store and fsync its file, so its writes survive a power loss and not only
+        a crash of the process. Flushing only hands the writes to the operating system.
+
+        Args:
+            store (str): The name of the store ('account' or a project store).
+        """
+        with cls._locks[store]:
+            open_file = cls._files.get(store)
+            if open_file is not None and open_file.mode != 'r':
+                open_file.flush()
+                os.fsync(open_file.id.get_vfd_handle())
+            cls._pending_writes[store] = 0
+
+    @classmethod
+    def path(cls, store: str):
+        """
+        Return the path of the file backing a store.
+
+        Args:
+            store (str): The name of the store ('account' or a project store).
+
+        Returns:
+            str: The path of the HDF5 file.
+        """
+        return os.path.join(cls.DATABASE_DIR, cls.STORES[store])
+
+    @classmethod
+    def generation(cls, store: str):
+        """
+        Return the number of times the store was found changed by another worker process,
+        or truncated. A cache built from the store is stale once the generation moves.
+        Checking is a read of the shared epoch file unless the store did change.
+
+        Args:
+            store (str): The name of the store ('account' or a project store).
+
+        Returns:
+            int: The generation of the store.
+        """
+        if Worker_Coordinator.stale(store):
+            with cls.read(store):
+                pass
+        return cls._generations[store]
+
+    @classmethod
+    def version(cls, store: str):
+        """
+        Return a counter moved by every write to a store, by this process or, once it has
+        been noticed, by another. Comparing versions taken under the store lock tells
+        whether the store changed in between.
+
+        Args:
+            store (str): The name of the store ('account' or a project store).
+
+        Returns:
+            int: The version of the store.
+        """
+        with cls._locks[store]:
+            return cls._versions[store]
+
+    @classmethod
+    def swap(cls, store: str, path: str):
+        """
+        Atomically replace the file of a store with another file holding the same data,
+        such as a rewritten copy. Must be called inside write(store), so nothing changes
+        the store between the copy and the swap. Objects taken from the old file must not
+        be used afterwards.
+
+        Args:
+            store (str): The name of the store ('account' or a project store).
+            path (str): The path of the new file, in the database directory.
+        """
+        with cls._hold(store, True):
+            open_file = cls._files.pop(store, None)
+            if open_file is not None:
+                open_file.close()
+            os.replace(path, cls.path(store))
+            cls._pending_writes[store] = 0
+            Worker_Coordinator.changed(store)
+
+    @classmethod
+    def restore(cls, store: str, path: str):
+        """
+        Replace the contents of a store with a copy of another file, such as a snapshot of
+        sample data. The file is copied as a whole next to the store and swapped in, and
+        caches built from the store are invalidated as for truncate.
+
+        Args:
+            store (str): The name of the store ('account' or a project store).
+            path (str): The path of the file to copy.
+        """
+        os.makedirs(cls.DATABASE_DIR, exist_ok=True)
+        # Named after the process, since several workers may restore the same store in turn
+        temporary_path = f"{cls.path(store)}.{os.getpid()}.restore"
+        shutil.copyfile(path, temporary_path)
+        try:
+            with cls._hold(store, True):
+                cls.swap(store, temporary_path)
+                cls._generations[store] += 1
+                cls._versions[store] += 1
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    #######################
+    ### SHARD FUNCTIONS ###
+    #######################
+
+    @classmethod
+    def project_store(cls, project_name: str, shards: int = None):
+        """
+        Return the store holding a project. The shard is picked by the CRC-32 of the name,
+        which is the same in every process and across restarts.
+
+        Args:
+            project_name (str): The name of the project.
+            shards (int, optional): The shard count. Defaults to PROJECT_SHARDS.
+
+        Returns:
+            str: The name of the project store.
+        """
+        shards = cls.PROJECT_SHARDS if shards is None else shards
+        if shards == 1:
+            return "project"
+        return f"project-{zlib.crc32(project_name.encode('utf-8')) % shards}"
+
+    @classmethod
+    def project_stores(cls):
+        """
+        Return the names of the project stores.
+
+        Returns:
+            list: The store names, in shard order.
+        """
+        return list(cls.PROJECT_STORES)
+
+    @staticmethod
+    def shard_files(shards: int):
+        """
+        Return the file name of each project store for a shard count.
+
+        Args:
+            shards (int): The shard count.
+
+        Returns:
+            dict: The file name of each project store, in shard order.
+        """
+        return _shard_files(shards)
+
+    @classmethod
+    def set_project_shards(cls, shards: int):
+        """
+        Change the number of project stores. Every store must be closed; only offline
+        tools do this.
+
+        Args:
+            shards (int): The new shard count.
+        """
+        cls.PROJECT_SHARDS = shards
+        cls.PROJECT_STORES = _shard_files(shards)
+        cls.STORES = {"account": cls.STORES["account"], **cls.PROJECT_STORES}
+        for store in cls.STORES:
+            cls._locks.setdefault(store, threading.RLock())
+            cls._pending_writes.setdefault(store, 0)
+            cls._generations.setdefault(store, 0)
+            cls._depth.setdefault(store, 0)
+            cls._versions.setdefault(store, 0)
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @classmethod
+    @contextmanager
+    def _hold(cls, store: str, exclusive: bool):
+        """
+        Hold the store lock and, with several workers, the store's file lock, closing a
+        writable handle when the outermost hold is released.
+        """
+        with cls._locks[store]:
+            with Worker_Coordinator.hold(store, exclusive, lambda: cls._refresh(store)):
+                cls._depth[store] += 1
+                try:
+                    yield
+                finally:
+                    cls._depth[store] -= 1
+                    open_file = cls._files.get(store)
+                    if Worker_Coordinator.ENABLED and cls._depth[store] == 0 and open_file is not None and open_file.mode != 'r':
+                        del cls._files[store]
+                        open_file.close()
+                        cls._pending_writes[store] = 0
+
+    @classmethod
+    def _open(cls, store: str, writable: bool = True):
+        """
+        Return the open file of a store, opening it on first use. With several workers a
+        read opens the file read-only, and a write replaces a read-only handle with a
+        writable one. Must be called with the store lock held.
+        """
+        open_file = cls._files.get(store)
+        if open_file is not None and writable and open_file.mode == 'r':
+            del cls._files[store]
+            open_file.close()
+            open_file = None
+        if open_file is None:
+            read_only = Worker_Coordinator.ENABLED and not writable and os.path.exists(cls.path(store))
+            open_file = cls._open_file(store, 'r' if read_only else 'a')
+            if not read_only and store in cls.PROJECT_STORES and "shards" not in open_file.attrs:
+                open_file.attrs["shards"] = cls.PROJECT_SHARDS
+            cls._files[store] = open_file
+        return open_file
+
+    @classmethod
+    def _open_file(cls, store: str, mode: str):
+        """
+        Open the file backing a store with the tuned chunk cache.
+        """
+        os.makedirs(cls.DATABASE_DIR, exist_ok=True)
+        # HDF5's own file lock would stop a second worker from opening the file; Worker_Coordinator locks it instead
+        locking = False if Worker_Coordinator.ENABLED else None
+        cache_bytes = cls.CHUNK_CACHE_BYTES // cls.PROJECT_SHARDS if store in cls.PROJECT_STORES else cls.CHUNK_CACHE_BYTES
+        Metrics.increment("honeydue_hdf5_opens_total", labels=(("store", store),))
+        return h5py.File(cls.path(store), mode, rdcc_nbytes=cache_bytes, rdcc_nslots=cls.CHUNK_CACHE_SLOTS, locking=locking)
+
+    @classmethod
+    def _check_shards(cls):
+        """
+        Raise a RuntimeError if the database directory holds project files of another
+        shard count, which would leave their projects unreachable.
+        """
+        if not os.path.isdir(cls.DATABASE_DIR):
+            return
+        expected = set(cls.PROJECT_STORES.values())
+        for file_name in sorted(os.listdir(cls.DATABASE_DIR)):
+            if re.fullmatch(r"project_data(-\d+)?\.hdf5", file_name) and file_name not in expected:
+                raise RuntimeError(f"Found {file_name}, which does not belong to {cls.PROJECT_SHARDS} project shard(s). Run tools/reshard_projects.py.")
+        for store in cls.PROJECT_STORES:
+            if os.path.exists(cls.path(store)):
+                with cls.read(store) as project_data:
+                    shards = int(project_data.attrs.get("shards", cls.PROJECT_SHARDS))
+                if shards != cls.PROJECT_SHARDS:
+                    raise RuntimeError(f"{cls.STORES[store]} was written for {shards} project shards, not {cls.PROJECT_SHARDS}. Run tools/reshard_projects.py.")
+
+    @classmethod
+    def _refresh(cls, store: str):
+        """
+        Close the handle of a store another process changed, so it is reopened with the
+        new contents, and move the store's generation. Must be called with the store lock held.
+        """
+        open_file = cls._files.pop(store, None)
+        if open_file is not None:
+            open_file.close()
+        cls._pending_writes[store] = 0
+        cls._generations[store] += 1
+        cls._versions[store] += 1
+
+    @classmethod
+    def _flush_loop(cls):
+        """
+        Flush stores with pending writes every FLUSH_INTERVAL seconds until stopped.
+        """
+        while not cls._stop_event.wait(cls.FLUSH_INTERVAL):
+            cls.flush()
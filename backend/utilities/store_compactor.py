@@ -0,0 +1,261 @@
+import h5py
+import logging
+import os
+import threading
+import time
+
+from h5py import h5o
+
+from utilities.metrics import Metrics
+from utilities.storage_manager import Storage_Manager
+
+logger = logging.getLogger(__name__)
+
+class Store_Compactor:
+    """
+    Reclaims the space HDF5 leaves behind in the store files.
+
+    HDF5 does not give back the space of deleted or rewritten objects once a file has been
+    closed, so the stores grow with every edit and their data scatters. The compactor
+    measures the fragmentation of each store, the share of the file not holding live
+    objects, and rewrites a store whose fragmentation is above THRESHOLD into a fresh file,
+    which is then swapped in. It is unrelated to the compaction of the Operation_Log, which
+    folds log records into the project stores.
+
+    The live size of a store is the sum of the object headers, group and attribute indexes
+    and dataset storage of every object. Variable-length strings live in heaps this sum does
+    not see, so it is scaled by the ratio of the rewritten file's size to the estimate,
+    measured at the last rewrite and kept in the store's 'live_factor' attribute.
+
+    A store is copied one top-level object at a time, each under a short read of the store,
+    so requests keep being served. The copy is swapped in under a write of the store; if
+    the store changed during the copy, it is copied again under that write first.
+
+    Attributes:
+        THRESHOLD (float): The fragmentation above which a store is rewritten (HONEYDUE_RECLAIM_THRESHOLD).
+        MIN_BYTES (int): The file size below which a store is left alone (HONEYDUE_RECLAIM_MIN_BYTES).
+        INTERVAL (float): The number of seconds between checks (HONEYDUE_RECLAIM_INTERVAL).
+
+    Methods:
+        start(): Start the background checker.
+        stop(): Stop the background checker.
+        measure(store): Return the file size, live size and fragmentation of a store.
+        compact(store): Rewrite a store into a fresh file and swap it in.
+        check(): Rewrite every store whose fragmentation is above the threshold.
+        stats(): Return the last measurements and the bytes reclaimed.
+    """
+
+    THRESHOLD = float(os.environ.get("HONEYDUE_RECLAIM_THRESHOLD", 0.5))
+    MIN_BYTES = int(os.environ.get("HONEYDUE_RECLAIM_MIN_BYTES", 1024 * 1024))
+    INTERVAL = float(os.environ.get("HONEYDUE_RECLAIM_INTERVAL", 300.0))
+
+    _lock = threading.Lock()
+    _compact_lock = threading.Lock()
+    _checker = None
+    _stop_event = threading.Event()
+    _measurements = {}
+    _counters = {"checks": 0, "compactions": 0, "bytes_reclaimed": 0, "compact_ms_total": 0.0, "errors": 0}
+
+    ###########################
+    ### LIFECYCLE FUNCTIONS ###
+    ###########################
+
+    @classmethod
+    def start(cls):
+        """
+        Start the background thread that checks the stores every INTERVAL seconds.
+        """
+        if cls._checker is not None and cls._checker.is_alive():
+            return
+        cls._stop_event.clear()
+        cls._checker = threading.Thread(target=cls._check_loop, name="store-compactor", daemon=True)
+        cls._checker.start()
+
+    @classmethod
+    def stop(cls):
+        """
+        Stop the background checker, waiting for a running rewrite to finish.
+        """
+        cls._stop_event.set()
+        if cls._checker is not None:
+            cls._checker.join()
+            cls._checker = None
+
+    #########################
+    ### RECLAIM FUNCTIONS ###
+    #########################
+
+    @classmethod
+    def measure(cls, store: str):
+        """
+        Measure the fragmentation of a store.
+
+        Args:
+            store (str): The name of the store.
+
+        Returns:
+            dict: The file size and estimated live size in bytes, and the fragmentation,
+                  1 - live size / file size.
+        """
+        if not os.path.exists(Storage_Manager.path(store)):
+            return {"file_bytes": 0, "live_bytes": 0, "fragmentation": 0.0}
+        Storage_Manager.flush(store)
+        with Storage_Manager.read(store) as store_data:
+            names = list(store_data.keys())
+            live_bytes = Store_Compactor._object_bytes(store_data)
+            factor = float(store_data.attrs.get("live_factor", 1.0))
+            file_bytes = os.path.getsize(Storage_Manager.path(store))
+        for name in names:
+            with Storage_Manager.read(store) as store_data:
+                if name in store_data:
+                    live_bytes += Store_Compactor._tree_bytes(store_data[name])
+        live_bytes = min(file_bytes, int(live_bytes * factor))
+        measurement = {
+            "file_bytes": file_bytes,
+            "live_bytes": live_bytes,
+            "fragmentation": 1 - live_bytes / file_bytes if file_bytes else 0.0,
+        }
+        with cls._lock:
+            cls._measurements[store] = measurement
+        return measurement
+
+    @classmethod
+    def compact(cls, store: str):
+        """
+        Rewrite a store into a fresh file and swap it in, while the store keeps being served.
+
+        Args:
+            store (str): The name of the store.
+
+        Returns:
+            dict: The file size before and after, the bytes reclaimed, whether the copy had
+                  to be redone because the store changed, and the duration in milliseconds.
+        """
+        with cls._compact_lock:
+            started = time.perf_counter()
+            # Named after the process, since several workers may rewrite the same store in turn
+            temporary_path = f"{Storage_Manager.path(store)}.{os.getpid()}.compact"
+            Storage_Manager.flush(store)
+            before = os.path.getsize(Storage_Manager.path(store))
+
+            try:
+                version = Storage_Manager.version(store)
+                with h5py.File(temporary_path, 'w') as target:
+                    with Storage_Manager.read(store) as store_data:
+                        names = list(store_data.keys())
+                    for name in names:
+                        with Storage_Manager.read(store) as store_data:
+                            if name in store_data:
+                                store_data.copy(store_data[name], target, name=name)
+
+                live_factor = Store_Compactor._live_factor(temporary_path)
+
+                with Storage_Manager.write(store) as store_data:
+                    recopied = Storage_Manager.version(store) != version
+                    if recopied:
+                        with h5py.File(temporary_path, 'w') as target:
+                            for name in store_data:
+                                store_data.copy(store_data[name], target, name=name)
+                        live_factor = Store_Compactor._live_factor(temporary_path)
+                    with h5py.File(temporary_path, 'a') as target:
+                        for key, value in store_data.attrs.items():
+                            target.attrs[key] = value
+                        target.attrs["live_factor"] = live_factor
+                    with open(temporary_path, 'rb+') as compacted_file:
+                        os.fsync(compacted_file.fileno())
+                    Storage_Manager.swap(store, temporary_path)
+                    after = os.path.getsize(Storage_Manager.path(store))
+            finally:
+                if os.path.exists(temporary_path):
+                    os.remove(temporary_path)
+
+            elapsed = (time.perf_counter() - started) * 1000
+            result = {"before_bytes": before, "after_bytes": after, "reclaimed_bytes": max(0, before - after), "recopied": recopied, "ms": elapsed}
+            with cls._lock:
+                cls._counters["compactions"] += 1
+                cls._counters["bytes_reclaimed"] += result["reclaimed_bytes"]
+                cls._counters["compact_ms_total"] += elapsed
+                cls._measurements[store] = {"file_bytes": after, "live_bytes": after, "fragmentation": 0.0, "last_compaction": result}
+            return result
+
+    @classmethod
+    def check(cls):
+        """
+        Measure every store and rewrite the ones larger than MIN_BYTES whose fragmentation
+        is above THRESHOLD.
+
+        Returns:
+            dict: The result of each rewrite, by store.
+        """
+        with cls._lock:
+            cls._counters["checks"] += 1
+        results = {}
+        for store in Storage_Manager.STORES:
+            measurement = cls.measure(store)
+            if measurement["file_bytes"] >= cls.MIN_BYTES and measurement["fragmentation"] > cls.THRESHOLD:
+                results[store] = cls.compact(store)
+        return results
+
+    @classmethod
+    def stats(cls):
+        """
+        Return the last measurement of each store and the compaction counters.
+
+        Returns:
+            dict: The number of checks, rewrites and failed checks, the total bytes reclaimed
+                  and time spent rewriting, and the last measurement of each store.
+        """
+        with cls._lock:
+            stats = dict(cls._counters)
+            stats["stores"] = {store: dict(measurement) for store, measurement in cls._measurements.items()}
+            return stats
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @staticmethod
+    def _object_bytes(h5_object):
+        """
+        Return the bytes of an object's header, group and attribute indexes, and storage.
+        """
+        info = h5o.get_info(h5_object.id)
+        size = info.hdr.space.total
+        size += info.meta_size.obj.index_size + info.meta_size.obj.heap_size
+        size += info.meta_size.attr.index_size + info.meta_size.attr.heap_size
+        if isinstance(h5_object, h5py.Dataset):
+            size += h5_object.id.get_storage_size()
+        return size
+
+    @staticmethod
+    def _tree_bytes(h5_object):
+        """
+        Return the bytes of an object and of every object below it.
+        """
+        sizes = [Store_Compactor._object_bytes(h5_object)]
+        if isinstance(h5_object, h5py.Group):
+            h5_object.visititems(lambda name, child: sizes.append(Store_Compactor._object_bytes(child)))
+        return sum(sizes)
+
+    @staticmethod
+    def _live_factor(path: str):
+        """
+        Return the ratio of a freshly written file's size to its estimated live size.
+        """
+        with h5py.File(path, 'r') as h5_file:
+            estimate = Store_Compactor._object_bytes(h5_file) + sum(Store_Compactor._tree_bytes(h5_file[name]) for name in h5_file)
+        return os.path.getsize(path) / estimate if estimate else 1.0
+
+    @classmethod
+    def _check_loop(cls):
+        """
+        Check the stores every INTERVAL seconds until stopped.
+        """
+        while not cls._stop_event.wait(cls.INTERVAL):
+            try:
+                cls.check()
+            except Exception:
+                with cls._lock:
+                    cls._counters["errors"] += 1
+                Metrics.increment("honeydue_background_errors_total", labels=(("task", "store_reclaim"),))
+                logger.exception("Error reclaiming store space")
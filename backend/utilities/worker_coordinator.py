@@ -0,0 +1,236 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+from contextlib import contextmanager
+
+class Worker_Coordinator:
+    """
+    Coordinates the backend worker processes that share the database directory, so uvicorn
+    can run with more than one worker (HONEYDUE_WORKERS).
+
+    Each shared resource (every store of the Storage_Manager, the operation log of each
+    project store, and the session revocations of Session_Tokens) has an advisory file
+    lock and an epoch counter. A
+    process holds the lock shared while it reads the resource and exclusive while it writes
+    it, and bumps the epoch when it releases the lock after a write. The epochs live in a
+    small memory-mapped file, so a process can check whether another process changed a
+    resource without a system call. When a process takes the lock of a resource whose epoch
+    moved since it last held it, the refresh function passed to hold is called first, so
+    open handles and in-memory caches are brought up to date before the resource is used.
+
+    The lock of a resource is only taken while the thread lock guarding the resource in
+    this process is held, so the process-local state of this class needs no lock of its
+    own. A shared hold cannot be upgraded to an exclusive one. With a single worker every
+    function is a no-op.
+
+    Attributes:
+        WORKERS (int): The number of backend worker processes (HONEYDUE_WORKERS).
+        ENABLED (bool): Whether the workers are coordinated, that is WORKERS > 1.
+        EPOCH_FILE (str): The name of the epoch file inside the database directory.
+
+    Methods:
+        hold(resource, exclusive, refresh): Context manager holding the lock of a resource.
+        changed(resource): Record that the held resource was written.
+        stale(resource): Check if another process changed a resource since this one last held it.
+        once(name, function): Run a function once per start of the server.
+    """
+
+    WORKERS = int(os.environ.get("HONEYDUE_WORKERS", 1))
+    ENABLED = WORKERS > 1
+    EPOCH_FILE = "coordination.epochs"
+
+    _EPOCH = struct.Struct("<Q")
+
+    _setup_lock = threading.Lock()
+    _directory = None
+    _lock_files = {}
+    _epochs = None
+    _resources = ()
+    _seen = {}
+    _depth = {}
+    _exclusive = {}
+    _dirty = {}
+
+    @classmethod
+    @contextmanager
+    def hold(cls, resource: str, exclusive: bool, refresh=None):
+        """
+        Hold the lock of a resource, shared or exclusive. Re-entrant: only the outermost
+        hold takes and releases the lock. Must be called with the thread lock guarding the
+        resource in this process held.
+
+        Args:
+            resource (str): The name of the resource.
+            exclusive (bool): Whether the resource will be written.
+            refresh (callable, optional): Called when the lock is taken if another process
+                                          changed the resource since this one last held it.
+
+        Raises:
+            RuntimeError: If an exclusive hold is requested inside a shared one.
+        """
+        if not cls.ENABLED:
+            yield
+            return
+
+        if cls._depth.get(resource, 0) > 0:
+            if exclusive and not cls._exclusive[resource]:
+                raise RuntimeError(f"Cannot write the {resource} store while reading it.")
+            cls._depth[resource] += 1
+            try:
+                yield
+            finally:
+                cls._depth[resource] -= 1
+            return
+
+        lock_file = cls._setup(resource)
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        cls._depth[resource] = 1
+        cls._exclusive[resource] = exclusive
+        cls._dirty[resource] = False
+        try:
+            epoch = cls._read_epoch(resource)
+            if epoch != cls._seen[resource]:
+                if refresh is not None:
+                    refresh()
+                cls._seen[resource] = epoch
+            yield
+        finally:
+            try:
+                if cls._dirty[resource]:
+                    epoch = cls._read_epoch(resource) + 1
+                    cls._EPOCH.pack_into(cls._epochs, cls._offset(resource), epoch)
+                    cls._seen[resource] = epoch
+            finally:
+                cls._depth[resource] = 0
+                cls._dirty[resource] = False
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @classmethod
+    def changed(cls, resource: str):
+        """
+        Record that the resource was written, so its epoch is bumped when the outermost
+        exclusive hold is released.
+
+        Args:
+            resource (str): The name of the resource.
+        """
+        if cls.ENABLED and cls._depth.get(resource, 0) > 0:
+            cls._dirty[resource] = True
+
+    @classmethod
+    def stale(cls, resource: str):
+        """
+        Check if another process changed a resource since this one last held its lock.
+        Costs a read of the memory-mapped epoch file.
+
+        Args:
+            resource (str): The name of the resource.
+
+        Returns:
+            bool: True if the resource must be refreshed before its cached state is used.
+        """
+        if not cls.ENABLED:
+            return False
+        cls._setup(resource)
+        return cls._read_epoch(resource) != cls._seen[resource]
+
+    @classmethod
+    def once(cls, name: str, function):
+        """
+        Run a function once per start of the server: with several workers, the first
+        worker to get here runs it while the others wait, and the others skip it. A start
+        is identified by the pid and start time of the parent (uvicorn) process.
+
+        Args:
+            name (str): The name of the task, used to name its marker file.
+            function (callable): The function to run.
+        """
+        if not cls.ENABLED:
+            function()
+            return
+
+        from utilities.storage_manager import Storage_Manager  # The Storage_Manager imports this module
+        directory = Storage_Manager.DATABASE_DIR
+        os.makedirs(directory, exist_ok=True)
+        token = cls._server_token()
+        with open(os.path.join(directory, f"{name}.once"), 'a+') as marker:
+            fcntl.flock(marker, fcntl.LOCK_EX)
+            try:
+                marker.seek(0)
+                if marker.read() == token:
+                    return
+                function()
+                marker.seek(0)
+                marker.truncate()
+                marker.write(token)
+                marker.flush()
+            finally:
+                fcntl.flock(marker, fcntl.LOCK_UN)
+
+    ########################
+    ### HELPER FUNCTIONS ###
+    ########################
+
+    @classmethod
+    def _setup(cls, resource: str):
+        """
+        Open the lock file of a resource and map the epoch file on first use, and return
+        the lock file. The resources are the stores of the Storage_Manager, the operation
+        log of each project store and the session revocations, which every worker lists in
+        the same order. The epochs already recorded are taken as seen, since nothing has
+        been cached yet.
+        """
+        lock_file = cls._lock_files.get(resource)
+        if lock_file is not None:
+            return lock_file
+        with cls._setup_lock:
+            if cls._epochs is None:
+                from utilities.storage_manager import Storage_Manager  # The Storage_Manager imports this module
+                cls._directory = Storage_Manager.DATABASE_DIR
+                # The resource of the log of a project store is named as in Operation_Log._resource
+                cls._resources = tuple(Storage_Manager.STORES) + tuple(f"{store}.log" for store in Storage_Manager.PROJECT_STORES) + ("sessions",)
+                os.makedirs(cls._directory, exist_ok=True)
+                size = cls._EPOCH.size * len(cls._resources)
+                descriptor = os.open(os.path.join(cls._directory, cls.EPOCH_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    if os.fstat(descriptor).st_size < size:
+                        os.ftruncate(descriptor, size)
+                    cls._epochs = mmap.mmap(descriptor, size)
+                finally:
+                    os.close(descriptor)
+                for name in cls._resources:
+                    cls._seen[name] = cls._read_epoch(name)
+            if resource not in cls._lock_files:
+                cls._lock_files[resource] = open(os.path.join(cls._directory, f"{resource}.lock"), 'a')
+            return cls._lock_files[resource]
+
+    @classmethod
+    def _read_epoch(cls, resource: str):
+        """
+        Return the current epoch of a resource.
+        """
+        return cls._EPOCH.unpack_from(cls._epochs, cls._offset(resource))[0]
+
+    @classmethod
+    def _offset(cls, resource: str):
+        """
+        Return the offset of the epoch of a resource in the epoch file.
+        """
+        return cls._resources.index(resource) * cls._EPOCH.size
+
+    @staticmethod
+    def _server_token():
+        """
+        Return a token identifying the current start of the server: the pid and start time
+        of the parent process.
+        """
+        parent = os.getppid()
+        try:
+            with open(f"/proc/{parent}/stat") as stat_file:
+                started = stat_file.read().rsplit(")", 1)[1].split()[19]
+        except (OSError, IndexError):
+            started = ""
+        return f"{parent}:{started}"
@@ -4,7 +4,7 @@ from streamlit_calendar import calendar
 import pandas as pd
 import requests
 import pathlib
-from datetime import datetime
+from datetime import date
 
 import streamlit as st
 st.set_page_config(layout="wide")
@@ -25,16 +25,43 @@ load_css(css_path)
 # Display the web app logo 
 st.logo("https://i.pinimg.com/originals/fe/be/ca/febeca2f63bd56c127069bac2fff9323.jpg", size="large")
 
-# Function to handle user login
+# Function to handle user login, keeping the session token the backend issues
 def login(username, password):
     response = requests.post(f"{API_URL}/login", params={"username": username, "password": password})
+    if response.ok:
+        st.session_state.session_token = response.json()["token"]
     return response.ok
 
+# Function to end the session on the backend and clear the session state
+def logout():
+    requests.post(f"{API_URL}/{st.session_state.username}/logout", headers=auth_headers())
+    st.session_state.clear()
+
+# Function to build the headers that authenticate a request with the session token
+def auth_headers():
+    return {"Authorization": f"Bearer {st.session_state.get('session_token', '')}"}
+
 # Function to handle user signup
 def signup(username, password, verify_password):
     response = requests.post(f"{API_URL}/signup", params={"username": username, "password": password, "verify password": verify_password})
     return response
 
+# Function to build the patch sent when the task table is saved: only changed cells, new rows and removed ids
+def build_task_patch(original_df, edited_df):
+    original_tasks = {int(task["id"]): task for task in original_df.to_dict(orient="records")}
+    updates, inserts, seen = [], [], set()
+    for task in edited_df.to_dict(orient="records"):
+        if pd.isna(task.get("id")):
+            inserts.append({field: value for field, value in task.items() if field != "id"})
+            continue
+        task_id = int(task["id"])
+        seen.add(task_id)
+        changes = {field: value for field, value in task.items() if field != "id" and value != original_tasks[task_id].get(field)}
+        if changes:
+            updates.append({"id": task_id, **changes})
+    deletes = [task_id for task_id in original_tasks if task_id not in seen]
+    return {"updates": updates, "inserts": inserts, "deletes": deletes}
+
 # Function to display login form and handle login logic
 def display_login():
 
@@ -117,7 +144,7 @@ def display_project_list():
             # If "Create Project" button is selected
             if st.form_submit_button("Create Project"):
                 if project_name:
-                    response = requests.post(f"{API_URL}/{st.session_state.username}", params={"username": st.session_state.username, "project_name": project_name})
+                    response = requests.post(f"{API_URL}/{st.session_state.username}", params={"username": st.session_state.username, "project_name": project_name}, headers=auth_headers())
                     if response.status_code == 200:
                         st.rerun()
                         st.success(f"Project {project_name} added!")
@@ -128,7 +155,7 @@ def display_project_list():
    
    # If logout button is selected, return to the login/signup page 
     if st.sidebar.button("Logout", key = 'Logout'):
-        st.session_state.clear()
+        logout()
         st.rerun()
 
     st.sidebar.markdown("---")
@@ -137,7 +164,7 @@ def display_project_list():
         # Fetch current projects
         st.subheader("Your Projects")
 
-        response = requests.get(f"{API_URL}/{st.session_state.username}", params={"username": st.session_state.username})
+        response = requests.get(f"{API_URL}/{st.session_state.username}", params={"username": st.session_state.username}, headers=auth_headers())
         if response.status_code == 200:
             project_list = response.json()
             i = 1
@@ -150,20 +177,29 @@ def display_project_list():
 
 # Function to display project view 
 
-def display_calendar():
-    # Initialize state to avoid UnboundLocalError
-    state = {}
-
-    # Fetch tasks from the backend
-    response = requests.get(
-        f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/task",
-        params={"project_name": st.session_state.project_name},
-    )
-
-    if response.status_code == 200:
-        tasks = response.json()
-        events = []
-
+# Function to return the first day of the month a day is in, moved by a number of months
+def month_start(day, months=0):
+    years, month = divmod(day.month - 1 + months, 12)
+    return day.replace(year=day.year + years, month=month + 1, day=1)
+
+# Function to return the calendar events of the visible month and the months around it.
+# Months are fetched from the backend by deadline range and cached, so navigating to an adjacent month needs no request.
+def get_calendar_events(visible_month):
+    cache = st.session_state.get("calendar_cache")
+    if cache is None or cache["project"] != st.session_state.project_name:
+        cache = {"project": st.session_state.project_name, "months": {}}
+        st.session_state["calendar_cache"] = cache
+
+    months = [month_start(visible_month, offset) for offset in (-1, 0, 1)]
+    missing = [month for month in months if month not in cache["months"]]
+    if missing:
+        response = requests.get(
+            f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/calendar",
+            params={"start": min(missing).isoformat(), "end": month_start(max(missing), 1).isoformat()},
+            headers=auth_headers(),
+        )
+        if response.status_code != 200:
+            return None
 
         priority_color_map  = {
             1: "#FF0000",  # Red for priority 1 (highest)
@@ -173,37 +209,48 @@ def display_calendar():
             5: "#F601FF",  # Green for priority 5 (lowest)
         }
 
-
-        for task in tasks:
-            if not task.get("deadline"):
-                st.error(f"Task '{task['name']}' is missing a deadline.")
-                return
-
-            # Convert deadline to ISO 8601 format if not already
+        for month in missing:
+            cache["months"][month] = []
+        for task in response.json():
+            # Deadlines are already stored as ISO 8601 dates (YYYY-MM-DD)
             try:
-                start_date = datetime.strptime(task["deadline"], "%Y-%m-%d").isoformat()
+                month = month_start(date.fromisoformat(task["deadline"]))
             except ValueError:
-                st.error(f"Task '{task['name']}' has an invalid deadline format.")
-                return
+                continue
+            if month not in cache["months"]:
+                continue
 
             # Fetch the priority of the task and assign the corresponding color
-            priority = int(task.get("priority", 5))  # Default to priority 5 if not specified
+            try:
+                priority = int(task.get("priority") or 5)  # Default to priority 5 if not specified
+            except ValueError:
+                priority = None
             color = priority_color_map.get(priority, "#3D9DF3")  # Default to blue if priority is invalid
 
-            event = {
+            cache["months"][month].append({
                 "title": task["name"],
-                "start": start_date,
-                "end": start_date,
+                "start": task["deadline"],
+                "end": task["deadline"],
                 "color": color,
-            }
-            events.append(event)
-    else:
+            })
+
+    return [event for month in months for event in cache["months"][month]]
+
+def display_calendar():
+    # Initialize state to avoid UnboundLocalError
+    state = {}
+
+    # Only the visible month and its neighbours are loaded
+    visible_month = st.session_state.get("calendar_month") or month_start(date.today())
+    events = get_calendar_events(visible_month)
+    if events is None:
         st.error("Could not fetch tasks.")
         return
 
     # Set up calendar options
     calendar_options = {
         "initialView": "dayGridMonth",
+        "initialDate": visible_month.isoformat(),
         "editable": True,
         "navLinks": True,
         "displayEventTime": False,  # Disables time display
@@ -212,7 +259,7 @@ def display_calendar():
 
     # Render the calendar
     try:
-        state = calendar(events=events, options=calendar_options, key="tasks_calendar")
+        state = calendar(events=events, options=calendar_options, callbacks=["datesSet", "eventsSet"], key="tasks_calendar")
     except Exception as e:
         st.error(f"Calendar rendering failed: {e}")
 
@@ -224,6 +271,14 @@ def display_calendar():
         if state.get("eventsSet"):
             st.session_state["events"] = state["eventsSet"]
 
+        # Load the tasks of the month the user navigated to
+        if state.get("datesSet"):
+            view = state["datesSet"].get("view", {})
+            shown_month = month_start(date.fromisoformat((view.get("currentStart") or state["datesSet"]["start"])[:10]))
+            if shown_month != visible_month:
+                st.session_state["calendar_month"] = shown_month
+                st.rerun()
+
         # Debugging output for state
         # st.write("Calendar State:", state)
 
@@ -324,7 +379,7 @@ def display_project_home():
 
     # Logout button 
     if st.sidebar.button("Logout", key= 'Logout'):
-        st.session_state.clear()
+        logout()
         st.rerun()
 
     st.sidebar.markdown("---")
@@ -348,7 +403,7 @@ def display_project_home():
     
     display_priority_color_code()
 
-    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/role", params={"project_name": st.session_state.project_name, "username": st.session_state.username})
+    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/role", params={"project_name": st.session_state.project_name, "username": st.session_state.username}, headers=auth_headers())
     if response.status_code == 200:
         user_role = response.json()
     else:
@@ -359,7 +414,7 @@ def display_project_home():
         st.sidebar.markdown("---")
 
         if st.sidebar.button("Delete Project"):
-            response = requests.post(f"{API_URL}/{st.session_state.username}/delete_project", params={"project_name": st.session_state.project_name})
+            response = requests.post(f"{API_URL}/{st.session_state.username}/delete_project", params={"project_name": st.session_state.project_name}, headers=auth_headers())
             if response.status_code == 200:
                 st.sidebar.success(f'Project "{st.session_state.project_name}" has been deleted.')
                 del st.session_state.project_name
@@ -374,7 +429,7 @@ def display_task_management():
 
     # Log out button
     if st.sidebar.button("Logout", key= 'Logout'):
-        st.session_state.clear()
+        logout()
         st.rerun()
     
     st.sidebar.markdown("---")
@@ -386,12 +441,12 @@ def display_task_management():
     
     col1, col2 = st.columns(2)
 
-    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/role", params={"project_name": st.session_state.project_name})
+    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/role", params={"project_name": st.session_state.project_name}, headers=auth_headers())
     if response.status_code == 200:
         role = response.json()
 
     # Get category list
-    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/category", params={"project_name": st.session_state.project_name})
+    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/category", params={"project_name": st.session_state.project_name}, headers=auth_headers())
     if response.status_code == 200:
         category_list = response.json()
         filtered_category_list = category_list.copy()
@@ -408,7 +463,7 @@ def display_task_management():
                     if category_entry in category_list:
                         st.error(f"Category '{category_entry}' already exists")
                     else:
-                        response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/category", params={"project_name": st.session_state.project_name, "category_name": category_entry})
+                        response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/category", params={"project_name": st.session_state.project_name, "category_name": category_entry}, headers=auth_headers())
                         if response.status_code == 200:
                             st.rerun()
                             st.success(f'Category "{category_entry}" added!')
@@ -432,7 +487,7 @@ def display_task_management():
                     selected_category = st.selectbox(f"Remove Category", filtered_category_list, index=None, placeholder="Category to Remove", label_visibility="collapsed")
                     if st.form_submit_button("Remove"):
                         if selected_category != 'Select a category':
-                            response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/remove_category", params={"project_name": st.session_state.project_name, "category": selected_category})
+                            response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/remove_category", params={"project_name": st.session_state.project_name, "category": selected_category}, headers=auth_headers())
                             if response.status_code == 200:
                                 st.rerun()
                                 st.success(f"Category has been removed.")
@@ -455,7 +510,7 @@ def display_task_management():
                     deadline = st.date_input("Deadline")
                     #status = "TODO"
 
-                    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/category", params={"project_name": st.session_state.project_name})
+                    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/category", params={"project_name": st.session_state.project_name}, headers=auth_headers())
                     if response.status_code == 200:
                         category_list = response.json()
                         category = st.selectbox(f"Category", category_list, index=None, placeholder="Category", label_visibility="collapsed")
@@ -463,7 +518,7 @@ def display_task_management():
                     
                     status = st.selectbox("Task Status", options=["TODO", "DOING", "DONE"], index=None, placeholder="Task Status", label_visibility= "collapsed")
 
-                    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"project_name": st.session_state.project_name})
+                    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"project_name": st.session_state.project_name}, headers=auth_headers())
                     if response.status_code == 200:
                         collaborator_dict = response.json()
                         collaborator_list = list(collaborator_dict.keys())
@@ -491,15 +546,16 @@ def display_task_management():
                                 "assignee": assignee
                             }
 
-                        response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/task", json=task_data)
+                        response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/task", json=task_data, headers=auth_headers())
                         if response.status_code == 200:
+                            st.session_state.pop("calendar_cache", None)
                             st.rerun()
                             st.success(f'Task "{task_name}" added!')
                         else:
                             st.error(f"Error: {response.text}")
 
         # Get task list
-        response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/task", params={"project_name": st.session_state.project_name})
+        response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/task", params={"project_name": st.session_state.project_name}, headers=auth_headers())
         if response.status_code == 200:
             task_list = response.json()
 
@@ -509,7 +565,7 @@ def display_task_management():
         if role != "Guest":
 
             # List of Assignees
-            response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"project_name": st.session_state.project_name})
+            response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"project_name": st.session_state.project_name}, headers=auth_headers())
             if response.status_code == 200:
                 collaborator_dict = response.json()
                 collaborator_list = list(collaborator_dict.keys())
@@ -521,6 +577,7 @@ def display_task_management():
             df["deadline"] = pd.to_datetime(df["deadline"])
             
             column_config = {
+                "id": None,
                 "priority": st.column_config.SelectboxColumn(label="Task Priority", options=["1", "2", "3", "4", "5"],),
                 "category": st.column_config.SelectboxColumn(label="Category", options=category_list,),
                 "status": st.column_config.SelectboxColumn(label="Status", options=status_order),
@@ -528,7 +585,7 @@ def display_task_management():
                 "deadline": st.column_config.DateColumn(label="Deadline"),
             }
 
-            sort_by = st.selectbox("Sort Tasks", placeholder="Sort Tasks", options=df.columns.tolist(), index=0, label_visibility="collapsed")
+            sort_by = st.selectbox("Sort Tasks", placeholder="Sort Tasks", options=[column for column in df.columns.tolist() if column != "id"], index=0, label_visibility="collapsed")
             sort_order = st.radio("Task order", options=["Ascending", "Descending"], index=0, key='Radio')
             ascending = True if sort_order == "Ascending" else False
             df_sorted = df.sort_values(by=sort_by, ascending=ascending)
@@ -539,17 +596,20 @@ def display_task_management():
             # Update button
             if st.button("Save"):
                 if edited_df is not None and not df_sorted_reset.equals(edited_df):
-                    if edited_df.isnull().values.any() or (edited_df == "").values.any():
+                    task_fields = edited_df.drop(columns=["id"])
+                    if task_fields.isnull().values.any() or (task_fields == "").values.any():
                         st.error("All fields must be filled before updating")
                     else:
-                        edited_df["deadline"] = edited_df["deadline"].dt.strftime('%Y-%m-%d')
-                        payload = {
-                            "updated_tasks": edited_df.to_dict(orient="records"),
-                            "project_name": st.session_state.project_name
-                        }
+                        original_df = df_sorted_reset.copy()
+                        original_df["deadline"] = original_df["deadline"].dt.strftime('%Y-%m-%d')
+                        edited_df["deadline"] = pd.to_datetime(edited_df["deadline"]).dt.strftime('%Y-%m-%d')
+                        edited_df["status"] = edited_df["status"].astype(str)
+                        original_df["status"] = original_df["status"].astype(str)
+                        payload = build_task_patch(original_df, edited_df)
                         
-                        update_response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/task_updates", json=payload)
+                        update_response = requests.patch(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/task", json=payload, headers=auth_headers())
                         if update_response.status_code == 200:
+                            st.session_state.pop("calendar_cache", None)
                             st.rerun()
                             st.success("Data update saved successfully")
                         else:
@@ -562,7 +622,7 @@ def display_task_management():
 
 # Function to display team settings
 def display_team_settings():
-    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"project_name": st.session_state.project_name})
+    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"project_name": st.session_state.project_name}, headers=auth_headers())
     if response.status_code == 200:
         collaborator_dict = response.json()
 
@@ -574,7 +634,7 @@ def display_team_settings():
     
     # Logout button 
     if st.sidebar.button("Logout", key= 'Logout'):
-        st.session_state.clear()
+        logout()
         st.rerun()
 
     st.sidebar.markdown("---")
@@ -590,7 +650,7 @@ def display_team_settings():
             st.write(f"{collaborator} : {role}")
     
     # Collaborator management (OWNER ONLY)
-    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/role", params={"project_name": st.session_state.project_name})
+    response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/role", params={"project_name": st.session_state.project_name}, headers=auth_headers())
     if response.status_code == 200:
         role = response.json()
 
@@ -612,7 +672,7 @@ def display_team_settings():
                 if st.form_submit_button("Add"):
                     if user_role != 'Select a role':
                         if username_entry:
-                            response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"collaborator_name": username_entry, "role": user_role, "project_name": st.session_state.project_name})
+                            response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"collaborator_name": username_entry, "role": user_role, "project_name": st.session_state.project_name}, headers=auth_headers())
                             if response.status_code == 200:
                                 st.rerun()
                                 st.success(f'User "{username_entry}" added!')
@@ -631,7 +691,7 @@ def display_team_settings():
 
             with col1:
                 # Fetch collaborators 
-                response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"project_name": st.session_state.project_name})
+                response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"project_name": st.session_state.project_name}, headers=auth_headers())
                 if response.status_code == 200:
                     collaborator_dict = response.json()
                     collaborator_list = list(collaborator_dict.keys())
@@ -647,7 +707,7 @@ def display_team_settings():
                 if st.form_submit_button(f'Update'):
                     if new_role != 'Select a role':
                         if collaborator != 'Select a collaborator':
-                            response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/role", params={"project_name": st.session_state.project_name, "collaborator": collaborator, "new_role": new_role})
+                            response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/role", params={"project_name": st.session_state.project_name, "collaborator": collaborator, "new_role": new_role}, headers=auth_headers())
                             if response.status_code == 200:
                                 st.rerun()
                                 st.success(f"Role has been updated.")
@@ -663,7 +723,7 @@ def display_team_settings():
         col1, col2 = st.columns(2)
 
         with col1:
-            response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"project_name": st.session_state.project_name})
+            response = requests.get(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/collaborators", params={"project_name": st.session_state.project_name}, headers=auth_headers())
             if response.status_code == 200:
                 collaborator_dict = response.json()
                 collaborator_list = list(collaborator_dict.keys())
@@ -674,7 +734,7 @@ def display_team_settings():
             # Button to remove a collaborator 
             if st.button("Remove"):
                 if collaborator != 'Select a collaborator':
-                    response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/remove_collaborator", params={"project_name": st.session_state.project_name, "collaborator": collaborator})
+                    response = requests.post(f"{API_URL}/{st.session_state.username}/{st.session_state.project_name}/remove_collaborator", params={"project_name": st.session_state.project_name, "collaborator": collaborator}, headers=auth_headers())
                     if response.status_code == 200:
                         st.rerun()
                         st.success(f"User has been removed.")